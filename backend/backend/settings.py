@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -76,10 +78,44 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# SQLite runs in WAL mode: readers don't wait for the writer and the writer
+# doesn't wait for readers, but there is still one writer at a time.
+# Transactions take the write lock when they begin (IMMEDIATE), so one that
+# has already read can't fail to upgrade to a writer halfway through, and a
+# connection waiting for the lock gives up after SQLITE_BUSY_TIMEOUT seconds.
+# Connections are kept for SQLITE_CONN_MAX_AGE seconds so the pragmas aren't
+# rerun on every request.
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 20))
+SQLITE_CONN_MAX_AGE = int(os.environ.get("SQLITE_CONN_MAX_AGE", 600))
+SQLITE_PRAGMAS = {
+    # persists in the db file, the rest are per connection
+    "journal_mode": "WAL",
+    # in WAL mode a power loss can lose the last commits but can't corrupt
+    # the db, and commits skip the fsync
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -64 * 1024,  # KiB
+    "mmap_size": 256 * 1024 * 1024,
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            "init_command": "; ".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": SQLITE_BUSY_TIMEOUT,
+        },
+        "CONN_MAX_AGE": SQLITE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        # an on-disk test db locks like the real one: concurrent writers
+        # (jobs, sweeps) wait their turn instead of failing as they do on
+        # sqlite's shared-cache in-memory db. It lives in the temp dir, out of
+        # the source tree
+        "TEST": {"NAME": Path(tempfile.gettempdir()) / "maskgen_test_db.sqlite3"},
     }
 }
 
@@ -137,5 +173,58 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Catalog uploads
+# .obj/CSV uploads of at least CATALOG_PARALLEL_THRESHOLD bytes are parsed in a
+# pool of CATALOG_PARSE_WORKERS processes, smaller ones stay single-process
+CATALOG_PARSE_WORKERS = int(os.environ.get("CATALOG_PARSE_WORKERS", os.cpu_count()))
+CATALOG_PARALLEL_THRESHOLD = int(
+    os.environ.get("CATALOG_PARALLEL_THRESHOLD", 64 * 1024 * 1024)
+)
+
+# maskgen/maskcut runs are killed after MASKGEN_IDLE_TIMEOUT seconds without
+# output or MASKGEN_TIMEOUT seconds overall
+MASKGEN_IDLE_TIMEOUT = int(os.environ.get("MASKGEN_IDLE_TIMEOUT", 60))
+MASKGEN_TIMEOUT = int(os.environ.get("MASKGEN_TIMEOUT", 600))
+
+# Maskgen result cache
+# successful maskgen runs are reused for identical .obs/.obj inputs; set the
+# size to 0 to disable
+MASKGEN_CACHE_DIR = Path(
+    os.environ.get("MASKGEN_CACHE_DIR", Path(tempfile.gettempdir()) / "maskgen_cache")
+)
+MASKGEN_CACHE_MAX_BYTES = int(
+    os.environ.get("MASKGEN_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+)
+
+# Mask generation jobs
+# generate requests with "async": true run on a pool of MASKGEN_JOB_WORKERS
+# threads (0 runs them inline); /api/jobs/wait/ blocks for at most
+# MASKGEN_JOB_WAIT_MAX seconds
+MASKGEN_JOB_WORKERS = int(os.environ.get("MASKGEN_JOB_WORKERS", 4))
+MASKGEN_JOB_WAIT_MAX = 60
+
+# Parameter sweeps
+# the setups of a "sweep" (and vary_rotator_range) request run on
+# MASKGEN_SWEEP_WORKERS threads; a sweep can make at most
+# MASKGEN_SWEEP_MAX_CONFIGS setups
+MASKGEN_SWEEP_WORKERS = int(os.environ.get("MASKGEN_SWEEP_WORKERS", 4))
+MASKGEN_SWEEP_MAX_CONFIGS = 64
+
+# Mask previews
+# /api/masks/{name}/features/ pages hold MASK_FEATURES_PAGE_SIZE features by
+# default and at most MASK_FEATURES_PAGE_MAX
+MASK_FEATURES_PAGE_SIZE = 500
+MASK_FEATURES_PAGE_MAX = 5000
+
+# Instrument configs are cached in memory, see maskgen_api.instrument_configs;
+# a process rereads an instrument's latest version after this many seconds
+# in case another process uploaded a newer one
+INSTRUMENT_CONFIG_LATEST_TTL = 60
+
+# List endpoints (object lists, projects, masks) return LIST_PAGE_SIZE rows
+# per page by default and at most LIST_PAGE_MAX, see maskgen_api.pagination
+LIST_PAGE_SIZE = 1000
+LIST_PAGE_MAX = 10000
+
 # Test paths
 TEST_OBJ_FILE_PATH = BASE_DIR / "tests/data/DCM5V5E.obj"
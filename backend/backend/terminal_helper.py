@@ -1,60 +1,274 @@
+import asyncio
+import codecs
+import selectors
 import subprocess
-from threading import Timer
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
 import os
 
+# prompts maskgen/maskcut stop at before overwriting files or going on past a
+# warning, answered when the caller asks to override
+OVERRIDE_ANSWERS = {"Do you wish to continue": "yes", "Overwrite?": "yes"}
+MAX_ANSWERS = 5  # stop answering a prompt that keeps coming back
 
-def run_with_input(command, input_text=None):
-    proc = subprocess.Popen(
-        command.split(" "),
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
-    timer = Timer(5, proc.kill)  # kill if hung
+IDLE_TIMEOUT = 60  # seconds without output before a run is killed
+TOTAL_TIMEOUT = 600  # seconds a run may take overall
+
+
+def _reply(pending, answers):
+    # answer to the first prompt seen in the output since the last answer
+    return next((a for p, a in answers.items() if p in pending), None)
+
+
+def _killed(command, output, timed_out):
+    reason = "took too long" if timed_out else "hung"
+    message = f"{command.split(' ')[0]} {reason}, killed"
+    return False, f"{''.join(output).strip()}\n{message}".strip()
+
+
+def run_interactive(
+    command,
+    answers=None,
+    cwd=None,
+    env=None,
+    idle_timeout=IDLE_TIMEOUT,
+    total_timeout=TOTAL_TIMEOUT,
+    on_output=None,
+):
+    """
+    Runs command once, answering its prompts as they show up.
+
+    stdout and stderr are read as they're written (prompts don't end in a
+    newline), and whenever the text since the last answer contains one of
+    the prompts in answers, the answer is written to stdin. With no answers
+    stdin is closed up front, so a prompt reads EOF as before.
+
+    Args:
+        command (str): space separated command
+        answers (dict): prompt text -> reply, sent followed by a newline
+        idle_timeout (float): kill the run after this many seconds without
+            output
+        total_timeout (float): kill the run after this many seconds
+        on_output (callable): called with each chunk of output text
+
+    Returns:
+        (bool, str): (success, output or error message)
+    """
+    answers = answers or {}
     try:
-        timer.start()
-        stdout, stderr = proc.communicate(input=input_text)
-        if proc.returncode == 0:
-            return True, stdout.strip()
-        else:
-            return False, (stdout + "\n" + stderr).strip()
-    except Exception as e:
+        proc = subprocess.Popen(
+            command.split(" "),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            env=env,
+        )
+    except OSError as e:
         return False, str(e)
+
+    if not answers:
+        proc.stdin.close()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    output = []
+    pending = ""  # output since the last answer
+    answered = 0
+    start = last_output = time.monotonic()
+    try:
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ)
+            while True:
+                now = time.monotonic()
+                if now - start >= total_timeout or now - last_output >= idle_timeout:
+                    return _killed(command, output, now - start >= total_timeout)
+                wait = min(start + total_timeout, last_output + idle_timeout) - now
+                if not selector.select(wait):
+                    continue
+
+                chunk = os.read(proc.stdout.fileno(), 4096)
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                last_output = time.monotonic()
+                output.append(text)
+                if on_output:
+                    on_output(text)
+
+                if proc.stdin.closed:
+                    continue
+                pending += text
+                reply = _reply(pending, answers)
+                if reply is not None:
+                    pending = ""
+                    answered += 1
+                    try:
+                        proc.stdin.write(f"{reply}\n".encode())
+                        proc.stdin.flush()
+                    except BrokenPipeError:
+                        pass
+                    if answered >= MAX_ANSWERS:
+                        proc.stdin.close()
+
+        if not proc.stdin.closed:
+            proc.stdin.close()
+        returncode = proc.wait()
+    finally:
+        # timed out, or on_output (or anything else here) raised
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        if not proc.stdin.closed:
+            proc.stdin.close()
+        proc.stdout.close()
+    return returncode == 0, "".join(output).strip()
+
+
+async def arun_interactive(
+    command,
+    answers=None,
+    cwd=None,
+    env=None,
+    idle_timeout=IDLE_TIMEOUT,
+    total_timeout=TOTAL_TIMEOUT,
+    on_output=None,
+):
+    """
+    asyncio version of run_interactive, so one event loop can supervise
+    many runs without a thread each. Same arguments and return value.
+    """
+    answers = answers or {}
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command.split(" "),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,
+            env=env,
+        )
+    except OSError as e:
+        return False, str(e)
+
+    if not answers:
+        proc.stdin.close()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    output = []
+    pending = ""  # output since the last answer
+    answered = 0
+    start = last_output = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            if now - start >= total_timeout or now - last_output >= idle_timeout:
+                return _killed(command, output, now - start >= total_timeout)
+            wait = min(start + total_timeout, last_output + idle_timeout) - now
+            try:
+                chunk = await asyncio.wait_for(proc.stdout.read(4096), wait)
+            except TimeoutError:
+                continue
+            if not chunk:
+                break
+            text = decoder.decode(chunk)
+            last_output = time.monotonic()
+            output.append(text)
+            if on_output:
+                on_output(text)
+
+            if proc.stdin.is_closing():
+                continue
+            pending += text
+            reply = _reply(pending, answers)
+            if reply is not None:
+                pending = ""
+                answered += 1
+                proc.stdin.write(f"{reply}\n".encode())
+                try:
+                    await proc.stdin.drain()
+                except ConnectionError:
+                    pass
+                if answered >= MAX_ANSWERS:
+                    proc.stdin.close()
+
+        if not proc.stdin.is_closing():
+            proc.stdin.close()
+        returncode = await proc.wait()
+    finally:
+        # timed out, or the caller was cancelled (ex: its request went away)
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    return returncode == 0, "".join(output).strip()
+
+
+def run_maskgen(command, override, cwd=None, env=None, **kwargs):
+    """
+    Runs maskgen (or maskcut, which prompts the same way), answering its
+    prompts with OVERRIDE_ANSWERS if override. kwargs go to run_interactive.
+    """
+    return run_interactive(
+        command, OVERRIDE_ANSWERS if override else None, cwd=cwd, env=env, **kwargs
+    )
+
+
+async def arun_maskgen(command, override, cwd=None, env=None, **kwargs):
+    """
+    asyncio version of run_maskgen
+    """
+    return await arun_interactive(
+        command, OVERRIDE_ANSWERS if override else None, cwd=cwd, env=env, **kwargs
+    )
+
+
+run_maskcut = run_maskgen
+arun_maskcut = arun_maskgen
+
+
+@contextmanager
+def maskgen_sandbox(maskgen_dir, inputs=()):
+    """
+    Private working directory for one maskgen/maskcut run, removed on exit.
+
+    maskgen writes its outputs (.SMF, .obw, .nc, .loc_* files) to the working
+    directory and reads its data files from $MGPATH, so each run gets a temp
+    dir holding copies of its inputs and symlinks to everything in
+    maskgen_dir, and uses it as both. Concurrent runs never share files or
+    touch os.environ.
+
+    Args:
+        maskgen_dir (str): maskgen install directory
+        inputs (iterable): paths copied into the sandbox under their own names
+
+    Yields:
+        (str, dict): (sandbox path, environment to run maskgen with)
+    """
+    work_dir = tempfile.mkdtemp(prefix="maskgen-")
+    try:
+        names = set()
+        for path in inputs:
+            names.add(os.path.basename(path))
+            shutil.copy(path, work_dir)
+        if os.path.isdir(maskgen_dir):
+            for entry in os.scandir(maskgen_dir):
+                if entry.name not in names:
+                    os.symlink(entry.path, os.path.join(work_dir, entry.name))
+        yield work_dir, os.environ | {"MGPATH": work_dir + os.sep}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+@asynccontextmanager
+async def amaskgen_sandbox(maskgen_dir, inputs=()):
+    """
+    maskgen_sandbox for async code, copies and cleanup run off the event loop
+    """
+    sandbox = maskgen_sandbox(maskgen_dir, inputs)
+    entered = await asyncio.to_thread(sandbox.__enter__)
+    try:
+        yield entered
     finally:
-        timer.cancel()
-
-
-def run_maskgen(command, override):
-    success, output = run_with_input(command)
-    max_retries = 0
-    while (
-        override
-        and ("Do you wish to continue" in output or "Overwrite?" in output)
-        and max_retries < 5
-    ):
-        success, output = run_with_input(command, input_text="yes\n")
-        if "Writing object file with use counts to" in output:
-            break
-        max_retries += 1
-
-    return success, output
-
-
-def run_maskcut(command, override):
-    success, output = run_with_input(command)
-    max_retries = 0
-    while (
-        override
-        and ("Do you wish to continue" in output or "Overwrite?" in output)
-        and max_retries < 0
-    ):
-        success, output = run_with_input(command, input_text="yes\n")
-        if "Estimated cutting time" in output:
-            break
-        max_retries += 1
-
-    return success, output
+        await asyncio.to_thread(sandbox.__exit__, None, None, None)
 
 
 def remove_file(file_path):
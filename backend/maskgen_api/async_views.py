@@ -0,0 +1,285 @@
+# maskgen_api/async_views.py
+#
+# Async versions of the mask and machine code generate endpoints for ASGI
+# deployments. maskgen/maskcut run as asyncio subprocesses, so one worker can
+# supervise many runs at once; only the db work goes through sync_to_async.
+# DRF viewsets are sync only, so these are plain Django views that reuse the
+# viewsets' steps around the subprocess.
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework.response import Response
+
+from backend.terminal_helper import amaskgen_sandbox, arun_maskcut, arun_maskgen
+from . import maskgen_cache
+from .sweep import arun_sweep, sweep_configs
+from .views import MASKGEN_DIRECTORY, MachineViewSet, MaskViewSet
+
+
+def _json(response):
+    # DRF Response from the viewset helpers -> JsonResponse
+    return JsonResponse(response.data, status=response.status_code, safe=False)
+
+
+def _line_events(on_event, filename):
+    # maskgen output arrives in chunks, report it a line at a time
+    pending = ""
+
+    def on_output(text):
+        nonlocal pending
+        *lines, pending = (pending + text).split("\n")
+        for line in lines:
+            on_event("maskgen_output", {"filename": filename, "line": line})
+
+    def flush():
+        if pending:
+            on_event("maskgen_output", {"filename": filename, "line": pending})
+
+    return on_output, flush
+
+
+async def _generate_single_mask(view, user_id, proj_name, data, project, on_event=None):
+    run = await sync_to_async(view._prepare_mask)(user_id, proj_name, data, on_event)
+    async with amaskgen_sandbox(MASKGEN_DIRECTORY, run["inputs"]) as (work_dir, env):
+        feedback = await sync_to_async(maskgen_cache.lookup, thread_sensitive=False)(
+            run["cache_key"], run["filename"], work_dir
+        )
+        run["cached"] = result = feedback is not None
+        if on_event:
+            on_event("maskgen_started", {"filename": run["filename"], "cached": result})
+        if not result:
+            on_output, flush = (
+                _line_events(on_event, run["filename"]) if on_event else (None, None)
+            )
+            result, feedback = await arun_maskgen(
+                run["command"],
+                data.get("override") == "true",
+                cwd=work_dir,
+                env=env,
+                idle_timeout=settings.MASKGEN_IDLE_TIMEOUT,
+                total_timeout=settings.MASKGEN_TIMEOUT,
+                on_output=on_output,
+            )
+            if flush:
+                flush()
+        if on_event:
+            on_event(
+                "maskgen_finished", {"filename": run["filename"], "success": result}
+            )
+        return await sync_to_async(view._finish_mask)(
+            user_id,
+            proj_name,
+            data,
+            project,
+            run,
+            work_dir,
+            result,
+            feedback,
+            on_event,
+        )
+
+
+async def _generate(view, user_id, proj_name, data, project, on_event=None):
+    # MaskViewSet._generate with maskgen runs awaited instead of blocking
+    filename = data["filename"]
+
+    def on_progress(completed, total=None):
+        if on_event:
+            on_event("progress", {"completed": completed, "total": total})
+
+    async def generate_one(setup):
+        return await _generate_single_mask(
+            view, user_id, proj_name, setup, project, on_event
+        )
+
+    if data.get("vary_rotator_range"):
+        configs = view._rotator_configs(filename, data["vary_rotator_range"])
+        results = await arun_sweep(generate_one, configs, data, on_progress)
+        return view._rotator_response(configs, results)
+    elif data.get("sweep"):
+        configs = sweep_configs(filename, data["sweep"])
+        results = await arun_sweep(
+            generate_one, configs, data, on_progress, return_exceptions=True
+        )
+        return await sync_to_async(view._sweep_response)(user_id, configs, results)
+    elif data.get("generate_until_all_included", False):
+        generated = []
+        excluded_count = 1
+        while excluded_count > 0:
+            data["filename"] = filename + f"_v{len(generated) + 1}"
+            result, response, excluded_count = await generate_one(data)
+            if not result:
+                return response
+            generated.append(data["filename"])
+            if on_event:
+                on_event(
+                    "iteration",
+                    {
+                        "iteration": len(generated),
+                        "filename": data["filename"],
+                        "excluded": excluded_count,
+                    },
+                )
+        return Response({"created": generated}, status=status.HTTP_201_CREATED)
+    else:
+        _, response, _ = await generate_one(data)
+        return response
+
+
+@csrf_exempt
+@require_POST
+async def generate_masks(request):
+    """
+    POST /api/async/masks/generate/, same request and responses as
+    /api/masks/generate/
+    """
+    data = json.loads(request.body)
+    user_id = request.headers.get("user-id")
+    view = MaskViewSet()
+    project, error = await sync_to_async(view._check_generate)(data, user_id)
+    if error:
+        return _json(error)
+
+    if data.get("async") in (True, "true"):
+        return _json(await sync_to_async(view._submit_job)(user_id, data, project))
+
+    return _json(await _generate(view, user_id, data["project_name"], data, project))
+
+
+@csrf_exempt
+@require_POST
+async def generate_machine_code(request):
+    """
+    POST /api/async/machine/generate/, same request and responses as
+    /api/machine/generate/
+    """
+    data = json.loads(request.body)
+    user_id = request.headers.get("user-id")
+    view = MachineViewSet()
+    run, error = await sync_to_async(view._prepare_machine_code)(data, user_id)
+    if error:
+        return _json(error)
+
+    async with amaskgen_sandbox(MASKGEN_DIRECTORY, run["inputs"]) as (work_dir, env):
+        result, feedback = await arun_maskcut(
+            run["command"],
+            run["overwrite"],
+            cwd=work_dir,
+            env=env,
+            idle_timeout=settings.MASKGEN_IDLE_TIMEOUT,
+            total_timeout=settings.MASKGEN_TIMEOUT,
+        )
+        return _json(
+            await sync_to_async(view._finish_machine_code)(
+                run, work_dir, result, feedback
+            )
+        )
+
+
+# (user, project, mask) of streams in progress in this process, so re-sending
+# a generate request while its stream runs doesn't start a second maskgen run
+_streaming = set()
+# running stream generations, kept referenced so one still finishes after
+# its client disconnects or if its stream is never read
+_running = set()
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
+
+
+def _start_generation(view, user_id, data, project, key):
+    # started by the view rather than the stream, so key is released when the
+    # generation finishes even if the response is never read
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(event, payload):
+        # called from the loop and from sync_to_async threads
+        loop.call_soon_threadsafe(events.put_nowait, (event, payload))
+
+    task = asyncio.create_task(
+        _generate(view, user_id, data["project_name"], data, project, on_event)
+    )
+    task.add_done_callback(lambda _: _streaming.discard(key))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return task, events
+
+
+async def _event_stream(data, task, events):
+    next_event = None
+    try:
+        yield _sse("started", {"filename": data["filename"]})
+        while True:
+            next_event = asyncio.ensure_future(events.get())
+            await asyncio.wait({next_event, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_event.done():
+                break
+            yield _sse(*next_event.result())
+        next_event.cancel()
+        while not events.empty():
+            yield _sse(*events.get_nowait())
+
+        try:
+            response = task.result()
+        except Exception as e:
+            body, code = {"error": str(e)}, 500
+        else:
+            body, code = response.data, response.status_code
+        yield _sse("done", {"status": code, "body": body})
+    finally:
+        if next_event:
+            next_event.cancel()
+
+
+@csrf_exempt
+@require_POST
+async def generate_masks_stream(request):
+    """
+    POST /api/async/masks/generate/stream/, same request as
+    /api/masks/generate/ but the response is a text/event-stream of progress
+    events: started, obj_written, obs_written, maskgen_started,
+    maskgen_output (one per line), maskgen_finished, smf_parsed,
+    objects_categorized, iteration (generate_until_all_included), progress
+    (sweeps), and finally done with the status and body /api/masks/generate/
+    would have returned.
+
+    Requests that fail validation get the usual JSON error instead, and a
+    request for a mask that is already being generated gets 409.
+    """
+    data = json.loads(request.body)
+    user_id = request.headers.get("user-id")
+    view = MaskViewSet()
+    key = (user_id, data["project_name"], data["filename"])
+    if key in _streaming:
+        return JsonResponse(
+            {"error": "mask is already being generated"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    _streaming.add(key)
+    try:
+        project, error = await sync_to_async(view._check_generate)(data, user_id)
+    except BaseException:
+        _streaming.discard(key)
+        raise
+    if error:
+        _streaming.discard(key)
+        return _json(error)
+
+    task, events = _start_generation(view, user_id, data, project, key)
+    response = StreamingHttpResponse(
+        _event_stream(data, task, events),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the events
+    return response
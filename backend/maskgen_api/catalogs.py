@@ -0,0 +1,527 @@
+import codecs
+import csv
+import io
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import pandas as pd
+from astropy.io import fits
+
+from .obs_file_formatting import to_deg_columns
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 5000
+CORE_COLUMNS = ("name", "type", "ra", "dec", "priority")
+
+# binary catalogs: our column -> accepted (case-insensitive) source names
+BINARY_COLUMNS = {
+    "name": ("name", "id", "objid", "object"),
+    "type": ("type",),
+    "ra": ("ra", "right_ascension", "raj2000"),
+    "dec": ("dec", "declination", "dej2000", "decj2000"),
+    "priority": ("priority", "pri"),
+    "a_len": ("a_len", "alen"),
+    "b_len": ("b_len", "blen"),
+}
+BINARY_DEFAULTS = {"type": "TARGET", "priority": 0}
+
+OBJ_LINE = re.compile(
+    r"(?P<name>\S+)\s+(?P<ra>\S+)\s+(?P<dec>\S+)\s+Pri=(?P<priority>[-\d\.]+)(?:\s+alen=(?P<a_len>[\d\.]+)\s+blen=(?P<b_len>[\d\.]+))?"
+)
+
+
+def new_batch(columns):
+    """
+    Empty column batch. Every parser yields batches shaped like this: a dict
+    of equal-length lists keyed by column name, plus "labels" naming each row
+    (ex: "line 12") for error messages.
+    """
+    return {column: [] for column in (*columns, "labels")}
+
+
+def iter_chunk_lines(chunks, first_line_no=1, keepends=False):
+    """
+    Yields (line number, line) from an iterable of byte chunks, decoding as
+    it goes so no more than one chunk is held as text at a time
+
+    Args:
+        chunks (iterable): bytes objects, split anywhere
+        first_line_no (int): number of the first line in chunks
+        keepends (bool): keep each line's newline, ex: for csv.reader, which
+            needs them to keep newlines inside quoted fields
+
+    Yields:
+        (int, str): line number and line, without its newline unless keepends
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    line_no = first_line_no - 1
+    tail = ""
+    for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).splitlines(keepends=True)
+        tail = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            line_no += 1
+            yield line_no, line if keepends else line.rstrip("\r\n")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield line_no + 1, tail
+
+
+def iter_lines(uploaded_file, chunk_size=CHUNK_SIZE, keepends=False):
+    """
+    Yields (line number, line) from an upload without decoding it all at once
+
+    Args:
+        uploaded_file: django UploadedFile or any binary file object
+        chunk_size (int): bytes read per chunk
+        keepends (bool): as in iter_chunk_lines
+
+    Yields:
+        (int, str): 1-based line number and line, as in iter_chunk_lines
+    """
+    if hasattr(uploaded_file, "chunks"):
+        chunks = uploaded_file.chunks(chunk_size)
+    else:
+        chunks = iter(lambda: uploaded_file.read(chunk_size), b"")
+    return iter_chunk_lines(chunks, keepends=keepends)
+
+
+def parse_obj_lines(lines, errors, batch_size=BATCH_SIZE):
+    """
+    Parses numbered .obj lines into column batches
+
+    Directives (&), comments (# or !) and blank lines are skipped. Any other
+    line that is not a valid @target or *alignment star is reported in errors
+    with its line number instead of being dropped.
+
+    Args:
+        lines (iterable): (line number, line) pairs
+        errors (list): malformed lines are appended here
+        batch_size (int): rows per yielded batch
+
+    Yields:
+        dict: column batch (see new_batch)
+    """
+    columns = ("name", "type", "ra", "dec", "priority", "a_len", "b_len")
+    batch = new_batch(columns)
+    for line_no, line in lines:
+        line = line.strip()
+        if not line or line[0] in "&#!":
+            continue
+
+        if line.startswith("@"):
+            obj_type = "TARGET"
+        elif line.startswith("*"):
+            obj_type = "ALIGN"
+        else:
+            errors.append(f"line {line_no}: object lines must start with @ or *")
+            continue
+
+        match = OBJ_LINE.match(line[1:])
+        if not match:
+            errors.append(f"line {line_no}: could not parse '{line}'")
+            continue
+
+        batch["name"].append(match.group("name"))
+        batch["type"].append(obj_type)
+        batch["ra"].append(match.group("ra"))
+        batch["dec"].append(match.group("dec"))
+        batch["priority"].append(match.group("priority"))
+        batch["a_len"].append(match.group("a_len") and float(match.group("a_len")))
+        batch["b_len"].append(match.group("b_len") and float(match.group("b_len")))
+        batch["labels"].append(f"line {line_no}")
+        if len(batch["labels"]) >= batch_size:
+            yield batch
+            batch = new_batch(columns)
+
+    if batch["labels"]:
+        yield batch
+
+
+def iter_obj_batches(uploaded_file, errors, batch_size=BATCH_SIZE):
+    """
+    Streams an uploaded .obj file as column batches (see parse_obj_lines)
+    """
+    return parse_obj_lines(iter_lines(uploaded_file), errors, batch_size)
+
+
+def _typed_column(values):
+    # numeric if every non-empty value parses as a number, else strings;
+    # empty cells become None either way
+    strings = pd.Series(values, dtype="string").str.strip().replace("", pd.NA)
+    numbers = pd.to_numeric(strings, errors="coerce")
+    column = numbers if numbers.isna().equals(strings.isna()) else strings
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _typed_batch(batch, typed_columns):
+    for column in typed_columns:
+        batch[column] = _typed_column(batch[column])
+    return batch
+
+
+def _csv_data_lines(lines, position):
+    # skip blanks and comments, remembering the line number of the last line
+    # handed to the csv reader so rows can be labelled. A line that continues
+    # a quoted field (odd number of quotes so far) is data, whatever it holds.
+    quoted = False
+    for position["line_no"], line in lines:
+        if quoted or (line.strip() and not line.lstrip().startswith("#")):
+            quoted ^= line.count('"') % 2 == 1
+            yield line
+
+
+def parse_csv_lines(lines, errors, batch_size=BATCH_SIZE, header=None):
+    """
+    Parses numbered CSV lines into column batches
+
+    Rows are split with the csv module straight into per-column lists; aux
+    columns are typed per batch, core columns are converted by bulk_ingest.
+
+    Args:
+        lines (iterable): (line number, line) pairs, lines with their newlines
+            so quoted fields can span lines
+        errors (list): rows with the wrong number of fields or that csv can't
+            read (ex: a NUL byte, an oversized field) are appended here
+        batch_size (int): rows per yielded batch
+        header (list): column names, read from the first row when None
+
+    Yields:
+        dict: column batch (see new_batch)
+    """
+    position = {"line_no": 0}
+    reader = csv.reader(_csv_data_lines(lines, position))
+    if header is None:
+        try:
+            header = [column.strip() for column in next(reader, [])]
+        except csv.Error as e:
+            errors.append(f"line {position['line_no']}: {e}")
+            return
+    typed_columns = [column for column in header if column not in CORE_COLUMNS]
+    batch = new_batch(header)
+    columns = [batch[column] for column in header]
+    while True:
+        try:
+            fields = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            # the reader starts over on the next line
+            errors.append(f"line {position['line_no']}: {e}")
+            continue
+        if len(fields) != len(header):
+            errors.append(
+                f"line {position['line_no']}: expected {len(header)} fields, "
+                f"got {len(fields)}"
+            )
+            continue
+        for column, value in zip(columns, fields):
+            column.append(value)
+        batch["labels"].append(f"line {position['line_no']}")
+        if len(batch["labels"]) >= batch_size:
+            yield _typed_batch(batch, typed_columns)
+            batch = new_batch(header)
+            columns = [batch[column] for column in header]
+
+    if batch["labels"]:
+        yield _typed_batch(batch, typed_columns)
+
+
+def iter_csv_batches(uploaded_file, errors, batch_size=BATCH_SIZE):
+    """
+    Streams an uploaded CSV catalog as column batches (see parse_csv_lines)
+
+    The header row names the columns (name,type,ra,dec,priority + any aux
+    columns like a_len,b_len, see tests/test_files/test_objs.csv).
+    """
+    return parse_csv_lines(iter_lines(uploaded_file, keepends=True), errors, batch_size)
+
+
+def iter_row_batches(rows, batch_size=BATCH_SIZE):
+    """
+    Turns already-parsed rows (ex: a JSON upload) into column batches. Keys
+    other than name/type/ra/dec/priority become aux columns.
+    """
+    batch = new_batch(())
+    count = 0
+    for row in rows:
+        size = len(batch["labels"])
+        for key, value in row.items():
+            # backfill columns that first appear partway through a batch
+            batch.setdefault(key, [None] * size).append(value)
+        count += 1
+        batch["labels"].append(f"row {count}")
+        for column in batch.values():
+            if len(column) == size:
+                column.append(None)
+        if len(batch["labels"]) >= batch_size:
+            yield batch
+            batch = new_batch(())
+
+    if batch["labels"]:
+        yield batch
+
+
+def _map_binary_columns(names):
+    lookup = {name.lower(): name for name in names}
+    mapping = {}
+    for column, aliases in BINARY_COLUMNS.items():
+        for alias in aliases:
+            if alias in lookup:
+                mapping[column] = lookup[alias]
+                break
+    return mapping
+
+
+def _binary_batch(read_column, mapping, start, stop):
+    # ra/dec/priority stay numpy arrays for the vectorized conversion in
+    # bulk_ingest, everything else becomes plain python values for the model
+    batch = {"labels": [f"row {i}" for i in range(start + 1, stop + 1)]}
+    for column in BINARY_COLUMNS:
+        if column in mapping:
+            values = read_column(mapping[column])
+            if column in ("ra", "dec", "priority"):
+                batch[column] = values
+            else:
+                batch[column] = values.tolist()
+        elif column in BINARY_DEFAULTS:
+            batch[column] = [BINARY_DEFAULTS[column]] * (stop - start)
+    return batch
+
+
+def iter_fits_batches(uploaded_file, errors, batch_size=BATCH_SIZE):
+    """
+    Streams the first binary table of an uploaded FITS file as column batches
+
+    Uploads django spooled to disk are memory-mapped, so each batch only pages
+    in its own slice of rows. Columns are matched by BINARY_COLUMNS; type and
+    priority default to TARGET and 0 when absent.
+
+    Args:
+        uploaded_file: django UploadedFile or any binary file object
+        errors (list): unused, kept so every parser has the same signature
+        batch_size (int): rows per yielded batch
+
+    Yields:
+        dict: column batch (see new_batch)
+    """
+    if hasattr(uploaded_file, "temporary_file_path"):
+        source = uploaded_file.temporary_file_path()
+    else:
+        source = uploaded_file
+
+    with fits.open(source, memmap=True) as hdul:
+        table = next((hdu for hdu in hdul if isinstance(hdu, fits.BinTableHDU)), None)
+        if table is None:
+            raise ValueError("no binary table found in FITS file")
+
+        data = table.data
+        mapping = _map_binary_columns(data.columns.names)
+        for start in range(0, len(data), batch_size):
+            stop = min(start + batch_size, len(data))
+            yield _binary_batch(
+                lambda name: data.field(name)[start:stop], mapping, start, stop
+            )
+
+
+def iter_parquet_batches(uploaded_file, errors, batch_size=BATCH_SIZE):
+    """
+    Streams an uploaded Parquet file as column batches
+
+    Needs the optional pyarrow package. Only the mapped columns are read, one
+    record batch at a time, memory-mapped when django spooled the upload to
+    disk. Columns are matched the same way as iter_fits_batches.
+
+    Args:
+        uploaded_file: django UploadedFile or any binary file object
+        errors (list): unused, kept so every parser has the same signature
+        batch_size (int): rows per yielded batch
+
+    Yields:
+        dict: column batch (see new_batch)
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet uploads need pyarrow installed on the server")
+
+    if hasattr(uploaded_file, "temporary_file_path"):
+        parquet = pq.ParquetFile(uploaded_file.temporary_file_path(), memory_map=True)
+    else:
+        parquet = pq.ParquetFile(uploaded_file)
+
+    mapping = _map_binary_columns(parquet.schema_arrow.names)
+    start = 0
+    for record_batch in parquet.iter_batches(
+        batch_size=batch_size, columns=list(mapping.values())
+    ):
+        stop = start + record_batch.num_rows
+        yield _binary_batch(
+            lambda name: record_batch.column(name).to_numpy(zero_copy_only=False),
+            mapping,
+            start,
+            stop,
+        )
+        start = stop
+
+
+def _read_range(source, start, end, chunk_size=CHUNK_SIZE):
+    if isinstance(source, bytes):
+        yield source[start:end]
+        return
+    with open(source, "rb") as fh:
+        fh.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = fh.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _parse_range(kind, source, start, end, first_line_no, header, batch_size):
+    """
+    Worker side of iter_parallel_batches: parses one line-aligned byte range
+    and converts its coordinates. Returns (batches, errors); batches are
+    dropped if the range had any errors since the upload will fail anyway.
+    """
+    errors = []
+    lines = iter_chunk_lines(
+        _read_range(source, start, end), first_line_no, keepends=kind == "csv"
+    )
+    if kind == "obj":
+        parsed = parse_obj_lines(lines, errors, batch_size)
+    else:
+        parsed = parse_csv_lines(lines, errors, batch_size, header)
+
+    batches = []
+    for batch in parsed:
+        batch["ra"], batch["dec"], coord_errors = to_deg_columns(
+            batch["ra"], batch["dec"], batch["labels"]
+        )
+        errors.extend(coord_errors)
+        batches.append(batch)
+    return ([] if errors else batches), errors
+
+
+def _split_ranges(fh, size, parts, start=0, first_line_no=1):
+    """
+    Splits fh[start:size] into about `parts` line-aligned byte ranges
+
+    Returns:
+        list: (start, end, first line number) per range
+    """
+    step = max((size - start) // parts, 1)
+    bounds = [start]
+    while bounds[-1] + step < size:
+        fh.seek(bounds[-1] + step)
+        fh.readline()
+        if fh.tell() >= size:
+            break
+        bounds.append(fh.tell())
+    bounds.append(size)
+
+    ranges = []
+    line_no = first_line_no
+    fh.seek(start)
+    for range_start, range_end in zip(bounds, bounds[1:]):
+        ranges.append((range_start, range_end, line_no))
+        remaining = range_end - range_start
+        while remaining > 0:
+            data = fh.read(min(CHUNK_SIZE, remaining))
+            remaining -= len(data)
+            line_no += data.count(b"\n")
+    return ranges
+
+
+def _read_csv_header(fh):
+    # header is the first non-blank, non-comment line
+    line_no = 0
+    for raw in iter(fh.readline, b""):
+        line_no += 1
+        line = raw.decode("utf-8")
+        if line.strip() and not line.lstrip().startswith("#"):
+            header = next(csv.reader([line]))
+            return [column.strip() for column in header], fh.tell(), line_no + 1
+    return [], fh.tell(), line_no + 1
+
+
+def iter_parallel_batches(uploaded_file, errors, kind, workers, batch_size=BATCH_SIZE):
+    """
+    Parses a large .obj or CSV upload in a process pool
+
+    The upload is split into line-aligned byte ranges that workers read,
+    parse and coordinate-convert independently (from the temp file when
+    django spooled the upload to disk, so the payload is never pickled).
+    Batches come back in file order with at most 2 ranges per worker in
+    flight, so memory stays bounded while the caller writes to the DB.
+
+    Args:
+        uploaded_file: django UploadedFile or any binary file object
+        errors (list): malformed lines are appended here
+        kind (str): "obj" or "csv"
+        workers (int): number of worker processes
+        batch_size (int): rows per yielded batch
+
+    Yields:
+        dict: column batch (see new_batch) with ra/dec already in degrees
+    """
+    if hasattr(uploaded_file, "temporary_file_path"):
+        source = uploaded_file.temporary_file_path()
+        fh = open(source, "rb")
+    else:
+        source = uploaded_file.read()
+        fh = io.BytesIO(source)
+
+    with fh:
+        fh.seek(0, io.SEEK_END)
+        size = fh.tell()
+        fh.seek(0)
+        header, start, first_line_no = None, 0, 1
+        if kind == "csv":
+            header, start, first_line_no = _read_csv_header(fh)
+        ranges = _split_ranges(fh, size, workers * 4, start, first_line_no)
+
+    # never fork the (multi-threaded) server process itself; workers run
+    # django.setup so they can import maskgen_api
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=django.setup
+    ) as pool:
+        pending = deque()
+        for range_start, range_end, line_no in ranges:
+            if isinstance(source, bytes):
+                # only ship each worker its own slice
+                task_source = source[range_start:range_end]
+                range_start, range_end = 0, len(task_source)
+            else:
+                task_source = source
+            pending.append(
+                pool.submit(
+                    _parse_range,
+                    kind,
+                    task_source,
+                    range_start,
+                    range_end,
+                    line_no,
+                    header,
+                    batch_size,
+                )
+            )
+            if len(pending) < workers * 2:
+                continue
+            batches, range_errors = pending.popleft().result()
+            errors.extend(range_errors)
+            yield from batches
+
+        while pending:
+            batches, range_errors = pending.popleft().result()
+            errors.extend(range_errors)
+            yield from batches
@@ -0,0 +1,191 @@
+from io import BytesIO
+
+import numpy as np
+
+# Slits and holes of a mask are kept as one NumPy structured array, stored on
+# Mask.feature_table in .npy format: parsed from the SMF once, loaded without
+# per-feature Python objects, and filtered with vectorized comparisons.
+FEATURE_TYPES = ("SLIT", "HOLE")
+NO_SHAPE = -1  # shape_code of slits, only holes have one
+
+# SMF columns after the keyword, per feature type
+SLIT_COLUMNS = ("id", "ra", "dec", "x", "y", "width", "a_len", "b_len", "angle")
+HOLE_COLUMNS = (
+    "id",
+    "ra",
+    "dec",
+    "x",
+    "y",
+    "width",
+    "shape_code",
+    "a_len",
+    "b_len",
+    "angle",
+)
+FLOAT_COLUMNS = ("x", "y", "width", "a_len", "b_len", "angle")
+TEXT_COLUMNS = ("id", "ra", "dec")
+
+
+def _dtype(id_len=1, ra_len=1, dec_len=1):
+    # text columns are utf-8 bytes sized to the longest value
+    return np.dtype(
+        [
+            ("type", "u1"),  # index into FEATURE_TYPES
+            ("id", f"S{id_len}"),
+            ("ra", f"S{ra_len}"),
+            ("dec", f"S{dec_len}"),
+            ("x", "f8"),
+            ("y", "f8"),
+            ("width", "f8"),
+            ("shape_code", "i2"),
+            ("a_len", "f8"),
+            ("b_len", "f8"),
+            ("angle", "f8"),
+        ]
+    )
+
+
+def _build(types, columns):
+    text = {name: [str(v).encode() for v in columns[name]] for name in TEXT_COLUMNS}
+    table = np.empty(
+        len(types),
+        dtype=_dtype(*(max(map(len, text[name]), default=1) for name in TEXT_COLUMNS)),
+    )
+    table["type"] = types
+    for name in TEXT_COLUMNS:
+        table[name] = text[name]
+    for name in FLOAT_COLUMNS:
+        table[name] = columns[name]
+    table["shape_code"] = columns["shape_code"]
+    return table
+
+
+def _empty_columns():
+    return {name: [] for name in TEXT_COLUMNS + FLOAT_COLUMNS + ("shape_code",)}
+
+
+def parse_smf(path):
+    """
+    Reads the SLIT and HOLE lines of a .SMF file, a line at a time
+
+    Returns:
+        np.ndarray: structured array with one row per feature, in file order
+    """
+    types = []
+    columns = _empty_columns()
+    with open(path, "rb") as fh:
+        for line in fh:
+            parts = line.decode("utf-8").split()
+            if not parts or parts[0] not in FEATURE_TYPES:
+                continue
+            if parts[0] == "SLIT":
+                names = SLIT_COLUMNS
+                columns["shape_code"].append(NO_SHAPE)
+            else:
+                names = HOLE_COLUMNS
+            types.append(FEATURE_TYPES.index(parts[0]))
+            for name, value in zip(names, parts[1:]):
+                if name in FLOAT_COLUMNS:
+                    value = float(value)
+                elif name == "shape_code":
+                    value = int(value)
+                columns[name].append(value)
+    return _build(types, columns)
+
+
+def from_dicts(features):
+    """
+    Feature table from the old Mask.features list of dicts
+    """
+    columns = _empty_columns()
+    for feature in features:
+        for name in TEXT_COLUMNS + FLOAT_COLUMNS:
+            columns[name].append(feature[name])
+        columns["shape_code"].append(feature.get("shape_code", NO_SHAPE))
+    return _build([FEATURE_TYPES.index(f["type"]) for f in features], columns)
+
+
+def pack(table):
+    buffer = BytesIO()
+    np.save(buffer, table, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def unpack(blob):
+    if not blob:
+        return _build([], _empty_columns())
+    return np.load(BytesIO(bytes(blob)), allow_pickle=False)
+
+
+def matches(table, feature_type=None, ids=None, region=None):
+    """
+    Which rows of a feature table match every filter given
+
+    Args:
+        feature_type (str): SLIT or HOLE
+        ids (iterable): feature ids to keep
+        region (tuple): (x_min, x_max, y_min, y_max) in mask coordinates,
+            features whose center is inside are kept
+
+    Returns:
+        np.ndarray: bool per row
+    """
+    keep = np.ones(len(table), dtype=bool)
+    if feature_type is not None:
+        keep &= table["type"] == FEATURE_TYPES.index(feature_type)
+    if ids is not None:
+        keep &= np.isin(table["id"], [str(i).encode() for i in ids])
+    if region is not None:
+        x_min, x_max, y_min, y_max = region
+        x, y = table["x"], table["y"]
+        keep &= (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max)
+    return keep
+
+
+def select(table, feature_type=None, ids=None, region=None):
+    """
+    Rows of a feature table matching every filter given, in table order.
+    Filters are as in matches.
+    """
+    return table[matches(table, feature_type, ids, region)]
+
+
+def decimate(table, max_features):
+    """
+    Thins a feature table out for a wide view: the x/y extent is cut into a
+    grid of at most max_features cells and the first feature in each
+    occupied cell is kept
+
+    Returns:
+        np.ndarray: indices of the kept rows, in table order
+    """
+    if len(table) <= max_features:
+        return np.arange(len(table))
+    side = max(int(np.sqrt(max_features)), 1)
+    cells = []
+    for axis in ("x", "y"):
+        values = table[axis]
+        span = values.max() - values.min() or 1.0
+        cells.append(
+            np.minimum(((values - values.min()) / span * side).astype(int), side - 1)
+        )
+    _, first = np.unique(cells[0] * side + cells[1], return_index=True)
+    return np.sort(first)
+
+
+def to_dicts(table):
+    """
+    Feature table as the list of dicts the API returns, SLITs without a
+    shape_code
+    """
+    columns = {name: table[name] for name in FLOAT_COLUMNS + ("shape_code",)}
+    columns = {name: values.tolist() for name, values in columns.items()}
+    for name in TEXT_COLUMNS:
+        columns[name] = np.char.decode(table[name], "utf-8").tolist()
+    features = []
+    for i, kind in enumerate(table["type"].tolist()):
+        names = SLIT_COLUMNS if kind == 0 else HOLE_COLUMNS
+        features.append(
+            {"type": FEATURE_TYPES[kind]} | {name: columns[name][i] for name in names}
+        )
+    return features
@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .models import Object, ObjectList
+from .obs_file_formatting import to_deg_columns
+from .catalogs import CORE_COLUMNS
+from .sky_index import sky_cells
+
+BULK_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+
+
+def format_errors(errors):
+    message = "; ".join(errors[:MAX_REPORTED_ERRORS])
+    if len(errors) > MAX_REPORTED_ERRORS:
+        message += f"; ... and {len(errors) - MAX_REPORTED_ERRORS} more"
+    return message
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def bulk_ingest(obj_list, user_id, batches, errors=None, batch_size=BULK_BATCH_SIZE):
+    """
+    Inserts catalog column batches as Objects and links them to obj_list
+
+    Meant to be called inside writes.serialized_write() with the creation of
+    obj_list, so the list commits whole: readers never see it half filled,
+    and a failure (or a crash) rolls back the list along with every batch
+    written before it. Once an error is seen the remaining batches are still
+    parsed, so every bad row gets reported, but nothing more is written.
+
+    Args:
+        obj_list (ObjectList): list the new objects are added to
+        user_id (str): owner of the new objects
+        batches (iterable): column batches from maskgen_api.catalogs
+        errors (list): errors already reported by the parser, if any
+        batch_size (int): number of rows written per INSERT
+
+    Returns:
+        int: number of objects created
+
+    Raises:
+        ValueError: listing malformed rows or missing columns
+    """
+    errors = [] if errors is None else errors
+    through = ObjectList.objects_list.through
+    count = 0
+    for batch in batches:
+        missing = [column for column in CORE_COLUMNS if column not in batch]
+        if missing:
+            raise ValueError(f"missing column(s): {', '.join(missing)}")
+
+        labels = batch["labels"]
+        # convert hours to degs if in hrs, whole batch at once
+        ra, dec, coord_errors = to_deg_columns(batch["ra"], batch["dec"], labels)
+        errors.extend(coord_errors)
+        priority = pd.to_numeric(
+            pd.Series(np.asarray(batch["priority"])), errors="coerce"
+        ).to_numpy(np.float64)
+        for i in np.flatnonzero(~np.isfinite(priority)):
+            errors.append(f"{labels[i]}: invalid priority '{batch['priority'][i]}'")
+        if errors:
+            continue
+
+        aux_columns = {
+            column: values
+            for column, values in batch.items()
+            if column not in CORE_COLUMNS and column != "labels"
+        }
+        objs = [
+            Object(
+                name=str(name),
+                user_id=user_id,
+                type=str(obj_type),
+                right_ascension=row_ra,
+                declination=row_dec,
+                priority=row_priority,
+                aux={
+                    column: values[i]
+                    for column, values in aux_columns.items()
+                    if not _is_missing(values[i])
+                },
+                sky_cell=cell,
+            )
+            for i, (name, obj_type, row_ra, row_dec, row_priority, cell) in enumerate(
+                zip(
+                    batch["name"],
+                    batch["type"],
+                    ra.tolist(),
+                    dec.tolist(),
+                    np.trunc(priority).astype(np.int64).tolist(),
+                    sky_cells(ra, dec).tolist(),
+                )
+            )
+        ]
+        objs = Object.objects.bulk_create(objs, batch_size=batch_size)
+        through.objects.bulk_create(
+            [through(objectlist_id=obj_list.id, object_id=obj.id) for obj in objs],
+            batch_size=batch_size,
+        )
+        count += len(objs)
+
+    if errors:
+        raise ValueError(format_errors(errors))
+    return count
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .models import InstrumentConfig
+
+# Configs don't change once uploaded, so they're kept in memory for every
+# request handler and job thread of the process: a version for good, an
+# instrument's latest version until InstrumentViewSet.upload adds a newer
+# one. Other processes don't see that upload's invalidate(), so they also
+# recheck the latest version after INSTRUMENT_CONFIG_LATEST_TTL seconds.
+_lock = threading.Lock()
+_versions = {}  # (instrument, version) -> InstrumentConfig
+_latest = {}  # instrument -> (InstrumentConfig, when it was read)
+
+
+def get_config(instrument, version=None):
+    """
+    An instrument's config, from memory after the first read
+
+    Args:
+        instrument (str): instrument name, ex: "IMACS_sc"
+        version (int): config version, the latest one if None
+
+    Returns:
+        InstrumentConfig: the config, or None if there isn't one. Shared
+        between threads, don't modify it.
+    """
+    now = time.monotonic()
+    with _lock:
+        if version is None:
+            config, read_at = _latest.get(instrument, (None, None))
+            if config and now - read_at < settings.INSTRUMENT_CONFIG_LATEST_TTL:
+                return config
+        elif (instrument, version) in _versions:
+            return _versions[instrument, version]
+
+    configs = InstrumentConfig.objects.filter(instrument=instrument)
+    if version is None:
+        config = configs.order_by("-version").first()
+    else:
+        config = configs.filter(version=version).first()
+    # misses aren't kept, the config may be uploaded next
+    if config:
+        with _lock:
+            _versions[instrument, config.version] = config
+            if version is None:
+                _latest[instrument] = (config, now)
+    return config
+
+
+def invalidate(instrument=None):
+    """
+    Forgets an instrument's latest config after a new version is uploaded,
+    or everything kept if instrument is None
+    """
+    with _lock:
+        if instrument is None:
+            _versions.clear()
+            _latest.clear()
+        else:
+            _latest.pop(instrument, None)
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import JobStatus, MaskJob
+
+# Jobs run on a pool of threads in the web process: the work is maskgen
+# subprocesses and db writes, and each maskgen run has its own sandbox
+# directory, so jobs don't need separate processes.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.MASKGEN_JOB_WORKERS,
+                thread_name_prefix="maskgen-job",
+            )
+        return _executor
+
+
+def _run(job_id, target, inline=False):
+    jobs = MaskJob.objects.filter(id=job_id)
+    try:
+        jobs.update(status=JobStatus.RUNNING, started_at=timezone.now())
+
+        def on_progress(completed, total=None):
+            jobs.update(completed=completed, total=total)
+
+        try:
+            response = target(on_progress)
+        except Exception as e:
+            job_status, result = JobStatus.FAILED, {"error": str(e)}
+        else:
+            job_status = (
+                JobStatus.SUCCEEDED if response.status_code < 400 else JobStatus.FAILED
+            )
+            result = response.data
+        jobs.update(status=job_status, result=result, finished_at=timezone.now())
+    finally:
+        if not inline:
+            # worker threads get their own db connection, don't leak it
+            connection.close()
+
+
+def submit(job, target):
+    """
+    Runs target on the job pool and records its outcome on job
+
+    Args:
+        job (MaskJob): saved job, still queued
+        target (callable): takes an on_progress(completed, total) callback
+            and returns a Response; its data becomes job.result
+
+    MASKGEN_JOB_WORKERS = 0 runs the job before returning instead.
+    """
+    if settings.MASKGEN_JOB_WORKERS <= 0:
+        _run(job.id, target, inline=True)
+    else:
+        _pool().submit(_run, job.id, target)
+
+
+def wait(jobs, timeout, poll_interval=0.5):
+    """
+    Blocks until every job in the queryset has finished or timeout seconds
+    have passed. Polls the db, so it also sees jobs run by other processes.
+
+    Returns:
+        (bool, list): (whether all finished, jobs as last read)
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        current = list(jobs.all())
+        done = all(job.finished for job in current)
+        if done or time.monotonic() >= deadline:
+            return done, current
+        time.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
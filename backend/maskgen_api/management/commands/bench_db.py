@@ -0,0 +1,242 @@
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from maskgen_api.catalogs import iter_row_batches
+from maskgen_api.ingest import bulk_ingest
+from maskgen_api.models import Mask, Object, ObjectList, Project, Status
+from maskgen_api.writes import serialized_write
+
+CENTER_RA, CENTER_DEC = 150.0, 2.2
+UPLOAD_ROWS = 100
+
+
+def _catalog(prefix, count, rng):
+    return [
+        {
+            "name": f"{prefix}{i:06d}",
+            "type": "TARGET",
+            "ra": CENTER_RA + rng.uniform(-0.2, 0.2),
+            "dec": CENTER_DEC + rng.uniform(-0.2, 0.2),
+            "priority": rng.randint(0, 9),
+        }
+        for i in range(count)
+    ]
+
+
+def _host():
+    # requests go through the whole middleware stack, host check included;
+    # with DEBUG on and no ALLOWED_HOSTS Django accepts localhost
+    for host in settings.ALLOWED_HOSTS:
+        if host not in ("*", "") and not host.startswith("."):
+            return host
+    return "localhost"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures API throughput under mixed read/write traffic from "
+        "concurrent workers against the configured database. Everything it "
+        "makes belongs to a throwaway user and is deleted at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--requests", type=int, default=200, help="requests per worker"
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="share of requests that write, 0 to 1",
+        )
+        parser.add_argument(
+            "--objects", type=int, default=2000, help="objects in the seeded list"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["requests"] < 1:
+            raise CommandError("--workers and --requests must be at least 1")
+        if not 0 <= options["write_ratio"] <= 1:
+            raise CommandError("--write-ratio must be between 0 and 1")
+
+        self.user_id = f"bench-{uuid.uuid4().hex[:8]}"
+        self.uploads = itertools.count()
+        rng = random.Random(options["seed"])
+        self.names = self._seed(options["objects"], rng)
+        try:
+            timings, elapsed = self._run(options, rng)
+        finally:
+            self._clean_up()
+        self._report(timings, elapsed, options)
+
+    def _seed(self, count, rng):
+        project = Project.objects.create(
+            name="bench",
+            user_id=self.user_id,
+            center_ra=CENTER_RA,
+            center_dec=CENTER_DEC,
+        )
+        with serialized_write():
+            obj_list = ObjectList.objects.create(
+                name="bench", user_id=self.user_id, project_name="bench"
+            )
+            bulk_ingest(
+                obj_list, self.user_id, iter_row_batches(_catalog("obj", count, rng))
+            )
+            project.obj_list = obj_list
+            project.save()
+            mask = Mask.objects.create(
+                name="bench",
+                user_id=self.user_id,
+                status=Status.DRAFT,
+                center_ra="10:00:00",
+                center_dec="02:12:00",
+                instrument_version=1,
+                instrument_setup={},
+            )
+            mask.objects_list.add(*obj_list.objects_list.all()[:200])
+            project.masks.add(mask)
+        return list(obj_list.objects_list.values_list("name", flat=True))
+
+    def _clean_up(self):
+        for model in (Mask, Object, ObjectList, Project):
+            model.objects.filter(user_id=self.user_id).delete()
+
+    def _requests(self, client, rng):
+        # (kind, send) pairs, picked from at random
+        list_name = "bench"
+        reads = [
+            ("project list", lambda: client.get("/api/project/list/")),
+            (
+                "list page",
+                lambda: client.get(
+                    "/api/objects/viewlist/",
+                    {"list_name": list_name, "limit": 100, "sort": "priority"},
+                ),
+            ),
+            (
+                "cone search",
+                lambda: client.get(
+                    "/api/objects/cone/",
+                    {
+                        "list_name": list_name,
+                        "ra": CENTER_RA,
+                        "dec": CENTER_DEC,
+                        "radius": 3,
+                    },
+                ),
+            ),
+            (
+                "mask detail",
+                lambda: client.get(
+                    "/api/masks/bench/", {"project_name": "bench", "features": "false"}
+                ),
+            ),
+        ]
+        writes = [
+            (
+                "edit object",
+                lambda: client.patch(
+                    "/api/objects/edit/",
+                    {
+                        "list_name": list_name,
+                        "obj_name": rng.choice(self.names),
+                        "priority": rng.randint(0, 9),
+                    },
+                    format="json",
+                ),
+            ),
+            (
+                "mask status",
+                lambda: client.post(
+                    f"/api/masks/{rng.choice(['draft', 'complete'])}/",
+                    {"project_name": "bench", "mask_name": "bench"},
+                    format="json",
+                ),
+            ),
+            ("upload list", lambda: self._upload(client, rng)),
+        ]
+        return reads, writes
+
+    def _upload(self, client, rng):
+        name = f"upload{next(self.uploads)}"
+        rows = _catalog(f"{name}_", UPLOAD_ROWS, rng)
+        upload = SimpleUploadedFile(f"{name}.json", json.dumps(rows).encode())
+        return client.post(
+            "/api/objects/upload/",
+            {"file": upload, "list_name": name, "project_name": "bench"},
+            format="multipart",
+        )
+
+    def _worker(self, options, seed, timings, start):
+        # the uploads repoint the project's list, the reads stay on "bench"
+        rng = random.Random(seed)
+        client = APIClient(SERVER_NAME=_host(), HTTP_USER_ID=self.user_id)
+        reads, writes = self._requests(client, rng)
+        start.wait()
+        try:
+            for _ in range(options["requests"]):
+                is_write = rng.random() < options["write_ratio"]
+                kind, send = rng.choice(writes if is_write else reads)
+                began = time.perf_counter()
+                try:
+                    error = None
+                    response = send()
+                    if response.status_code >= 400:
+                        error = f"{response.status_code} {response.content[:200]}"
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                timings.append((kind, time.perf_counter() - began, error))
+        finally:
+            connection.close()
+
+    def _run(self, options, rng):
+        timings = []
+        start = threading.Barrier(options["workers"] + 1)
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [
+                pool.submit(self._worker, options, rng.random(), timings, start)
+                for _ in range(options["workers"])
+            ]
+            start.wait()
+            began = time.perf_counter()
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - began
+        return timings, elapsed
+
+    def _report(self, timings, elapsed, options):
+        total = len(timings)
+        self.stdout.write(
+            f"{options['workers']} workers, {total} requests, "
+            f"{options['write_ratio']:.0%} writes: {total / elapsed:.1f} req/s "
+            f"over {elapsed:.2f}s"
+        )
+        self.stdout.write(
+            f"{'request':<14}{'count':>7}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}"
+        )
+        for kind in sorted({kind for kind, _, _ in timings}):
+            rows = [(seconds, error) for k, seconds, error in timings if k == kind]
+            ms = np.array([seconds for seconds, _ in rows]) * 1000
+            errors = sum(error is not None for _, error in rows)
+            self.stdout.write(
+                f"{kind:<14}{len(rows):>7}{errors:>8}"
+                f"{np.percentile(ms, 50):>9.1f}{np.percentile(ms, 95):>9.1f}"
+            )
+        errors = [error for _, _, error in timings if error]
+        if errors:
+            self.stdout.write(f"{len(errors)} failed requests, first: {errors[0]}")
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+# stands in for the mask filename in cached files so a resubmission under a
+# new mask name can reuse them
+PLACEHOLDER = "{{maskgen_cache_filename}}"
+OUTPUTS = ("SMF", "obw")
+
+
+@lru_cache
+def maskgen_version(maskgen_path):
+    """
+    Hash of the maskgen binary, so upgrading maskgen invalidates the cache
+    """
+    try:
+        with open(maskgen_path, "rb") as fh:
+            return hashlib.file_digest(fh, "sha256").hexdigest()
+    except OSError:
+        return "unknown"
+
+
+# where the mask filename is written: the .obs and .SMF header lines naming
+# the mask, and the names of the files of a run. An object or slit that happens
+# to share the mask's name stays as it is.
+HEADERS = ("NAME", "FILENAME", "!.OC")
+EXTENSIONS = ("obs", "obj", "obw", "SMF")
+
+
+def _normalize(text, filename):
+    name = re.escape(filename)
+    headers = "|".join(map(re.escape, HEADERS))
+    text = re.sub(
+        rf"^({headers})([ \t]+){name}(?![\w.-])",
+        rf"\1\2{PLACEHOLDER}",
+        text,
+        flags=re.MULTILINE,
+    )
+    return re.sub(
+        rf"(?<![\w.-]){name}(?=\.(?:{'|'.join(EXTENSIONS)})\b)", PLACEHOLDER, text
+    )
+
+
+def cache_key(filename, obs_path, obj_path, maskgen_path):
+    """
+    Content hash of a maskgen run: the .obs and .obj inputs (with the mask
+    filename factored out) plus the maskgen version
+    """
+    digest = hashlib.sha256(maskgen_version(maskgen_path).encode())
+    for path in (obs_path, obj_path):
+        digest.update(b"\0")
+        digest.update(_normalize(Path(path).read_text(), filename).encode())
+    return digest.hexdigest()
+
+
+def _entry(key):
+    return Path(settings.MASKGEN_CACHE_DIR) / key
+
+
+def _enabled():
+    return settings.MASKGEN_CACHE_MAX_BYTES > 0
+
+
+def lookup(key, filename, out_dir):
+    """
+    On a hit, writes {filename}.SMF and {filename}.obw to out_dir as maskgen
+    would have and returns maskgen's original output.
+
+    Returns:
+        str or None: cached maskgen output, None on a miss
+    """
+    entry = _entry(key)
+    if not _enabled() or not (entry / "output").exists():
+        return None
+
+    try:
+        for ext in OUTPUTS:
+            text = (entry / ext).read_text().replace(PLACEHOLDER, filename)
+            Path(out_dir, f"{filename}.{ext}").write_text(text)
+        feedback = (entry / "output").read_text().replace(PLACEHOLDER, filename)
+        os.utime(entry)  # most recently used, see _evict
+    except OSError:
+        # evicted while we were reading it
+        return None
+    return feedback
+
+
+def store(key, filename, out_dir, feedback):
+    """
+    Saves a successful run's {filename}.SMF/.obw from out_dir and its output
+    """
+    if not _enabled():
+        return
+    cache_dir = Path(settings.MASKGEN_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=cache_dir, prefix=".staging-"))
+    try:
+        for ext in OUTPUTS:
+            text = Path(out_dir, f"{filename}.{ext}").read_text()
+            (staging / ext).write_text(_normalize(text, filename))
+        (staging / "output").write_text(_normalize(feedback, filename))
+        # rename is atomic, a concurrent store of the same key just loses
+        os.rename(staging, _entry(key))
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+    _evict(cache_dir)
+
+
+def _evict(cache_dir):
+    # drop least recently used entries until under MASKGEN_CACHE_MAX_BYTES
+    entries = []
+    total = 0
+    for entry in cache_dir.iterdir():
+        if entry.name.startswith("."):
+            continue
+        try:
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+        except OSError:
+            continue
+        total += size
+
+    for _, size, entry in sorted(entries):
+        if total <= settings.MASKGEN_CACHE_MAX_BYTES:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+from maskgen_api.sky_index import sky_cells
+
+
+def backfill_sky_cells(apps, schema_editor):
+    Object = apps.get_model("maskgen_api", "Object")
+    objs = list(Object.objects.only("id", "right_ascension", "declination"))
+    if not objs:
+        return
+    cells = sky_cells(
+        [obj.right_ascension for obj in objs], [obj.declination for obj in objs]
+    )
+    for obj, cell in zip(objs, cells.tolist()):
+        obj.sky_cell = cell
+    Object.objects.bulk_update(objs, ["sky_cell"], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="object",
+            name="sky_cell",
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name="object",
+            index=models.Index(
+                fields=["user_id", "sky_cell"], name="object_user_sky_cell"
+            ),
+        ),
+        migrations.RunPython(backfill_sky_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+from maskgen_api.features import from_dicts, pack, to_dicts, unpack
+
+
+def pack_features(apps, schema_editor):
+    Mask = apps.get_model("maskgen_api", "Mask")
+    for mask in Mask.objects.only("id", "features").iterator():
+        mask.feature_table = pack(from_dicts(mask.features or []))
+        mask.save(update_fields=["feature_table"])
+
+
+def unpack_features(apps, schema_editor):
+    Mask = apps.get_model("maskgen_api", "Mask")
+    for mask in Mask.objects.only("id", "feature_table").iterator():
+        mask.features = to_dicts(unpack(mask.feature_table))
+        mask.save(update_fields=["features"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0003_maskjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mask",
+            name="feature_table",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="mask",
+            name="features",
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(pack_features, unpack_features),
+        migrations.RemoveField(
+            model_name="mask",
+            name="features",
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0004_mask_feature_table"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaskDetail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("with_features", models.BooleanField()),
+                ("body", models.BinaryField()),
+                ("etag", models.CharField(max_length=64)),
+                (
+                    "mask",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="details",
+                        to="maskgen_api.mask",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("mask", "with_features"), name="unique_mask_detail"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0005_maskdetail"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mask",
+            index=models.Index(fields=["status", "name"], name="mask_status_name"),
+        ),
+    ]
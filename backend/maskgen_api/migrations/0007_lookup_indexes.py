@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maskgen_api", "0006_list_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="maskjob",
+            index=models.Index(fields=["user_id"], name="maskjob_user"),
+        ),
+        migrations.AddIndex(
+            model_name="object",
+            index=models.Index(fields=["user_id", "name"], name="object_user_name"),
+        ),
+        migrations.AddIndex(
+            model_name="objectlist",
+            index=models.Index(fields=["user_id", "name"], name="objectlist_user_name"),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(fields=["user_id", "name"], name="project_user_name"),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 
+from .features import to_dicts, unpack
+from .sky_index import sky_cells
+
 
 class Instrument(models.TextChoices):
     IMACS_F4 = "IMACS f/4"
@@ -12,6 +15,13 @@ class Status(models.TextChoices):
     COMPLETED = "completed", "Completed (mask has been cut successfully)"
 
 
+class JobStatus(models.TextChoices):
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+
+
 # Models
 class Project(models.Model):
     name = models.CharField()
@@ -30,6 +40,10 @@ class Project(models.Model):
                 fields=["name", "user_id"], name="unique_project_per_user"
             )
         ]
+        indexes = [
+            # a user's projects, by name (the unique constraint leads with name)
+            models.Index(fields=["user_id", "name"], name="project_user_name")
+        ]
 
 
 class Image(models.Model):
@@ -63,7 +77,7 @@ class Mask(models.Model):
     status = models.CharField(
         max_length=100, choices=Status.choices, default=Status.DRAFT
     )
-    features = models.JSONField()  # slits and holes
+    feature_table = models.BinaryField(null=True)  # slits and holes, see features
     objects_list = models.ManyToManyField(
         "Object", blank=True, related_name="objs_on_mask"
     )  # guide and alignment stars
@@ -76,10 +90,60 @@ class Mask(models.Model):
     def __str__(self):
         return f"Mask {self.name}"
 
+    @property
+    def feature_array(self):
+        return unpack(self.feature_table)
+
+    @property
+    def features(self):
+        return to_dicts(self.feature_array)
+
+    def save(self, *args, **kwargs):
+        # status and other field changes go through here. m2m add()/remove()
+        # don't call save(): categorize_objs, which writes the object links,
+        # drops the stored details itself
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            MaskDetail.objects.filter(mask=self).delete()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["user_id", "name"], name="unique_mask_name")
         ]
+        indexes = [
+            # technician lists, sorted by name or by id through the status prefix
+            models.Index(fields=["status", "name"], name="mask_status_name"),
+        ]
+
+
+# GET /api/masks/{name}/ body of a mask, rendered on first read and served as
+# is until the mask or one of its objects changes (see Mask.save, Object.save
+# and Object.delete)
+class MaskDetail(models.Model):
+    mask = models.ForeignKey("Mask", on_delete=models.CASCADE, related_name="details")
+    with_features = models.BooleanField()
+    body = models.BinaryField()  # encoded JSON
+    etag = models.CharField(max_length=64)
+
+    @staticmethod
+    def invalidate_objects(objects):
+        # masks with any of these objects on them or left off, found from the
+        # objects' side of the mask tables
+        masks = [
+            through.objects.filter(object__in=objects).values("mask_id")
+            for through in (Mask.objects_list.through, Mask.excluded_obj_list.through)
+        ]
+        MaskDetail.objects.filter(
+            models.Q(mask__in=masks[0]) | models.Q(mask__in=masks[1])
+        ).delete()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mask", "with_features"], name="unique_mask_detail"
+            )
+        ]
 
 
 class Object(models.Model):
@@ -96,10 +160,29 @@ class Object(models.Model):
     declination = models.FloatField()
     priority = models.IntegerField(default=0.0)
     aux = models.JSONField(null=True)  # a_len, b_len
+    sky_cell = models.BigIntegerField(null=True)  # see sky_index.sky_cells
 
     def __str__(self):
         return f"{self.type} Object {self.name}"
 
+    def save(self, *args, **kwargs):
+        # bulk_create skips this, ingest sets sky_cell itself
+        self.sky_cell = int(sky_cells(self.right_ascension, self.declination))
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            MaskDetail.invalidate_objects([self.pk])
+
+    def delete(self, *args, **kwargs):
+        MaskDetail.invalidate_objects([self.pk])
+        return super().delete(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "sky_cell"], name="object_user_sky_cell"),
+            models.Index(fields=["user_id", "name"], name="object_user_name"),
+        ]
+
 
 # object list: user_id, name, id, objects
 class ObjectList(models.Model):
@@ -114,3 +197,36 @@ class ObjectList(models.Model):
                 fields=["name", "project_name"], name="unique_obj_list_per_project"
             )
         ]
+        indexes = [
+            # lists are looked up by (name, user_id) and listed per user
+            models.Index(fields=["user_id", "name"], name="objectlist_user_name")
+        ]
+
+
+# asynchronous mask generation request, see maskgen_api.jobs
+class MaskJob(models.Model):
+    user_id = models.CharField(max_length=100)
+    project_name = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=20, choices=JobStatus.choices, default=JobStatus.QUEUED
+    )
+    request = models.JSONField()  # body of the generate request
+    total = models.IntegerField(null=True)  # masks to generate, if known
+    completed = models.IntegerField(default=0)  # masks generated so far
+    result = models.JSONField(null=True)  # response body once finished
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Job {self.id} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    class Meta:
+        indexes = [
+            # a user's jobs, newest first
+            models.Index(fields=["user_id"], name="maskjob_user")
+        ]
@@ -1,97 +1,212 @@
-from .models import Object, ObjectList
+from .models import Instrument, Mask, MaskDetail, Object, ObjectList
+from .sky_index import cone_filter, angular_separation
+from .writes import serialized_write
 import re
+from itertools import islice
 from pathlib import Path
 import os
-from astropy.coordinates import Angle
-import astropy.units as u
+import numpy as np
+import pandas as pd
+
+
+def _sexagesimal_to_float(values):
+    # split "[+-]dd:mm:ss.s" columns into their parts in one pass; missing
+    # minutes/seconds count as 0, anything unparsable comes back as NaN
+    values = values.str.strip()
+    negative = values.str.startswith("-").fillna(False).to_numpy(dtype=bool)
+    parts = values.str.lstrip("+-").str.split(":", expand=True)
+    if parts.shape[1] > 3:
+        # more than 3 fields (ex: 02:22:04:00) is never a valid angle
+        too_long = parts.iloc[:, 3:].notna().any(axis=1).to_numpy()
+        parts = parts.iloc[:, :3]
+    else:
+        too_long = np.zeros(len(values), dtype=bool)
+    parts = parts.reindex(columns=range(3))
+    nums = np.column_stack(
+        [pd.to_numeric(parts[i], errors="coerce").to_numpy(float) for i in range(3)]
+    )
+    minutes = np.nan_to_num(nums[:, 1], nan=0.0)
+    seconds = np.nan_to_num(nums[:, 2], nan=0.0)
+    bad = (
+        too_long
+        | (parts[1].isna().to_numpy() & parts[2].notna().to_numpy())
+        | (parts[1].notna().to_numpy() & np.isnan(nums[:, 1]))
+        | (parts[2].notna().to_numpy() & np.isnan(nums[:, 2]))
+        | (minutes < 0)
+        | (minutes >= 60)
+        | (seconds < 0)
+        | (seconds >= 60)
+    )
+    result = np.abs(nums[:, 0]) + minutes / 60.0 + seconds / 3600.0
+    result[negative] *= -1
+    result[bad] = np.nan
+    return result
+
+
+def _column_to_deg(values, sexagesimal_scale):
+    if values.dtype.kind in "iuf":
+        return values.astype(np.float64)
+
+    strings = pd.Series(values.astype(str), dtype="string")
+    result = pd.to_numeric(strings, errors="coerce").to_numpy(np.float64)
+    sexagesimal = strings.str.contains(":", regex=False).fillna(False).to_numpy()
+    if sexagesimal.any():
+        result[sexagesimal] = (
+            _sexagesimal_to_float(strings[sexagesimal]) * sexagesimal_scale
+        )
+    return result
 
 
-def to_deg(ra, dec):
-    if ":" in str(ra):
-        ra = Angle(ra, unit=u.hourangle).degree
-    else:
-        ra = float(ra)
-    if ":" in str(dec):
-        dec = Angle(dec, unit=u.degree).degree
-    else:
-        dec = float(dec)
-    return ra, dec
+def to_deg_columns(ra, dec, labels=None):
+    """
+    Converts whole RA/Dec columns to decimal degrees in one vectorized pass
+
+    Values containing ":" are read as sexagesimal (hours for RA, degrees for
+    Dec), anything else as decimal degrees. Columns may mix both.
+
+    Args:
+        ra (sequence): right ascension values (str or number)
+        dec (sequence): declination values (str or number)
+        labels (sequence): optional row labels used in error messages,
+            defaults to 1-based row numbers
+
+    Returns:
+        (ndarray, ndarray, list): float64 ra and dec in degrees (NaN for
+        malformed values) and a list of per-row error messages
+    """
+    ra, dec = np.asarray(ra), np.asarray(dec)
+    ra_deg = _column_to_deg(ra, 15.0)
+    dec_deg = _column_to_deg(dec, 1.0)
+    if len(ra_deg) != len(dec_deg):
+        raise ValueError("ra and dec columns must be the same length")
+
+    errors = []
+    bad_ra = ~np.isfinite(ra_deg) | (ra_deg < 0) | (ra_deg >= 360)
+    bad_dec = ~np.isfinite(dec_deg) | (np.abs(dec_deg) > 90)
+    for i in np.flatnonzero(bad_ra | bad_dec):
+        label = labels[i] if labels is not None else f"row {i + 1}"
+        if bad_ra[i]:
+            errors.append(f"{label}: invalid ra '{ra[i]}'")
+        if bad_dec[i]:
+            errors.append(f"{label}: invalid dec '{dec[i]}'")
+    return ra_deg, dec_deg, errors
 
 
 def categorize_objs(mask, file_path, obj_list_name, proj_name):
+    """
+    Puts the objects maskgen placed (the .obw lines with a Use=N count) on
+    mask.objects_list and the rest on mask.excluded_obj_list
+
+    Names are resolved with one query for the whole list and the
+    memberships written with one bulk insert per side, so the number of
+    queries doesn't grow with the catalog.
+
+    Returns:
+        (bool, str): (whether every object was found, feedback). The mask
+        is deleted if one wasn't.
+    """
     obj_list = ObjectList.objects.get(name=obj_list_name, project_name=proj_name)
 
+    placed, excluded = {}, {}  # names in file order, without repeats
     lines = Path(file_path).read_text().splitlines()
     for line in lines:
         # get obj name
         match = re.match(r"[@\*](\S+)", line)
         if match:
-            try:
-                obj = obj_list.objects_list.get(name=match.group(1))
-                if re.search(r"Use=\d+", line):
-                    mask.objects_list.add(obj)
-                else:
-                    mask.excluded_obj_list.add(obj)
-                mask.save()
-            except Object.DoesNotExist:
-                mask.delete()
-                return False, f"warning: object with name '{match.group(1)}' not found."
+            side = placed if re.search(r"Use=\d+", line) else excluded
+            side[match.group(1)] = None
+
+    ids = dict(obj_list.objects_list.values_list("name", "id"))
+    for name in [*placed, *excluded]:
+        if name not in ids:
+            mask.delete()
+            return False, f"warning: object with name '{name}' not found."
+
+    with serialized_write():
+        for field, names in (("objects_list", placed), ("excluded_obj_list", excluded)):
+            through = getattr(Mask, field).through
+            through.objects.bulk_create(
+                [through(mask_id=mask.id, object_id=ids[name]) for name in names],
+                ignore_conflicts=True,
+            )
+        # bulk inserts skip Mask.save, drop stored details here instead
+        MaskDetail.objects.filter(mask=mask).delete()
     return True, "yay it worked"
 
 
-def obj_to_json(file_bytes):
-    text = file_bytes.decode("utf-8")
-    lines = text.splitlines()
-    objects = []
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        if line.startswith("@"):
-            obj_type = "TARGET"
-            line = line[1:]
-        elif line.startswith("*"):
-            obj_type = "ALIGN"
-            line = line[1:]
-        else:
-            continue  # skip invalid or unmarked lines
-
-        match = re.match(
-            r"(?P<name>\S+)\s+(?P<ra>[\d\.]+)\s+(?P<dec>[-\d\.]+)\s+Pri=(?P<priority>[-\d\.]+)(?:\s+alen=(?P<a_len>[\d\.]+)\s+blen=(?P<b_len>[\d\.]+))?",
-            line,
-        )
-
-        if match:
-            obj = {
-                "name": match.group("name"),
-                "type": obj_type,
-                "ra": float(match.group("ra")),
-                "dec": float(match.group("dec")),
-                "priority": float(match.group("priority")),
-            }
-            if match.group("a_len") and match.group("b_len"):
-                obj["a_len"] = float(match.group("a_len"))
-                obj["b_len"] = float(match.group("b_len"))
-            objects.append(obj)
-
-    return objects
+# radius (arcmin) of a circle enclosing each camera's field: IMACS f/2 has a
+# 27.4' diameter field, f/4 a 15.4' square. Keyed by both the Instrument
+# choices and the maskgen instrument names used in instrument setups.
+FIELD_RADIUS_ARCMIN = {
+    Instrument.IMACS_F2: 13.7,
+    "IMACS_sc": 13.7,
+    Instrument.IMACS_F4: 10.9,
+    "IMACS_lc": 10.9,
+}
 
 
-"""
-# === Example Usage ===
-obj_file_path = "/Users/maylinchen/Downloads/DCM5V5E.obj"
-output_path = Path("/Users/maylinchen/Downloads/mask/backend/mask/maskgen_api/test_files/DCM5V5E.json")
-
-parsed_objects = parse_obj_file(obj_file_path)
-
-print(json.dumps(parsed_objects, indent=2))
-output_path.write_text(json.dumps(parsed_objects, indent=2))
-"""
+def instrument_field(instrument_setup):
+    """
+    Field of view used to prefilter objects before maskgen runs
 
+    Only used when the setup asks for it with "fov_prefilter": true and the
+    instrument has a known footprint. validate() checks the center first.
 
-def generate_obj_file(user_id, proj_name, filename, objects):
+    Returns:
+        (float, float, float) or None: center ra, dec and radius in degrees
+    """
+    if not instrument_setup.get("fov_prefilter"):
+        return None
+    radius = FIELD_RADIUS_ARCMIN.get(instrument_setup["instrument"])
+    if radius is None:
+        return None
+    ra, dec, _ = to_deg_columns(
+        [instrument_setup["center_ra"]], [instrument_setup["center_dec"]]
+    )
+    return ra[0], dec[0], radius / 60
+
+
+OBJ_FILE_CHUNK_SIZE = 2000
+
+
+def _chunked(rows, size=OBJ_FILE_CHUNK_SIZE):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _obj_line(obj):
+    if obj["type"] == "GUIDE":
+        return ""
+    new_line = f"{obj['name']} {obj['right_ascension']} {obj['declination']} Pri={float(obj['priority'])}"
+    aux = obj["aux"]
+    if aux:
+        if hasattr(aux, "use"):
+            new_line += f" use={aux.use}"
+        if hasattr(aux, "width"):
+            new_line += f" width={aux.width}"
+        if hasattr(aux, "shape"):
+            new_line += f" shape={aux.shape}"
+        if hasattr(aux, "a_len"):
+            new_line += f" a_len={aux.a_len}"
+        if hasattr(aux, "b_len"):
+            new_line += f" b_len={aux.b_len}"
+        if hasattr(aux, "tilt"):
+            new_line += f" tilt={aux.tilt}"
+        if hasattr(aux, "pa"):
+            new_line += f" pa={aux.pa}"
+
+    if obj["type"] == "ALIGN":
+        new_line = "*" + new_line
+    elif obj["type"] == "TARGET":
+        new_line = "@" + new_line
+
+    return new_line + "\n"
+
+
+def generate_obj_file(
+    user_id, proj_name, filename, objects, field=None, files_dir=None
+):
     """
     Generates a .obj file following Carnegie OBS formatting
 
@@ -100,56 +215,55 @@ def generate_obj_file(user_id, proj_name, filename, objects):
     Args:
         filename (str): name of the ob
         objects (str): list of json objects of all the objects
+        field (tuple): optional (ra, dec, radius) in degrees, see
+            instrument_field. Objects outside it are left out of the file
+        files_dir (str): folder holding obj_files, this package's by default
 
     Returns:
-        str: path to obj file
+        (str, int): path to obj file, relative to files_dir, and number of
+        objects pruned by field
     """
-    script_dir = os.path.dirname(__file__)
-    path = os.path.join(script_dir, "obj_files", user_id, proj_name, f"{filename}.obj")
-    os.makedirs(os.path.join(script_dir, "obj_files", user_id), exist_ok=True)
-    os.makedirs(
-        os.path.join(script_dir, "obj_files", user_id, proj_name), exist_ok=True
-    )
+    files_dir = files_dir or os.path.dirname(__file__)
+    path = os.path.join(files_dir, "obj_files", user_id, proj_name, f"{filename}.obj")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
 
+    if isinstance(objects, list):
+        queryset = Object.objects.filter(id__in=objects)
+    else:
+        queryset = ObjectList.objects.get(
+            name=objects, project_name=proj_name
+        ).objects_list.all()
+
+    pruned = 0
+    if field:
+        pruned = queryset.count()
+        # sky_cell prefilter through the index, exact circle per chunk below
+        queryset = queryset.filter(cone_filter(*field))
+
+    rows = queryset.order_by("id").values(
+        "name", "type", "right_ascension", "declination", "priority", "aux"
+    )
     with open(path, "w") as file:
         file.write("&RADEGREE\n")
-        if not isinstance(objects, list):
-            objects = list(
-                ObjectList.objects.get(
-                    name=objects, project_name=proj_name
-                ).objects_list.values_list("id", flat=True)
-            )
-        for id in objects:
-            obj = Object.objects.get(id=id)
-            if obj.type != "GUIDE":
-                new_line = f"{obj.name} {obj.right_ascension} {obj.declination} Pri={float(obj.priority)}"
-                if obj.aux:
-                    if hasattr(obj.aux, "use"):
-                        new_line += f" use={obj.aux.use}"
-                    if hasattr(obj.aux, "width"):
-                        new_line += f" width={obj.aux.width}"
-                    if hasattr(obj.aux, "shape"):
-                        new_line += f" shape={obj.aux.shape}"
-                    if hasattr(obj.aux, "a_len"):
-                        new_line += f" a_len={obj.aux.a_len}"
-                    if hasattr(obj.aux, "b_len"):
-                        new_line += f" b_len={obj.aux.b_len}"
-                    if hasattr(obj.aux, "tilt"):
-                        new_line += f" tilt={obj.aux.tilt}"
-                    if hasattr(obj.aux, "pa"):
-                        new_line += f" pa={obj.aux.pa}"
-
-                if obj.type == "ALIGN":
-                    new_line = "*" + new_line
-                elif obj.type == "TARGET":
-                    new_line = "@" + new_line
-
-                file.write(new_line + "\n")
-
-    return f"obj_files/{user_id}/{proj_name}/{filename}.obj"
-
-
-def generate_obs_file(user_id, proj_name, instrument_setup, obj_file_paths):
+        for chunk in _chunked(rows.iterator(chunk_size=OBJ_FILE_CHUNK_SIZE)):
+            if field:
+                ra, dec, radius = field
+                separation = angular_separation(
+                    ra,
+                    dec,
+                    [obj["right_ascension"] for obj in chunk],
+                    [obj["declination"] for obj in chunk],
+                )
+                chunk = [obj for obj, sep in zip(chunk, separation) if sep <= radius]
+                pruned -= len(chunk)
+            file.write("".join(_obj_line(obj) for obj in chunk))
+
+    return f"obj_files/{user_id}/{proj_name}/{filename}.obj", pruned
+
+
+def generate_obs_file(
+    user_id, proj_name, instrument_setup, obj_file_paths, files_dir=None
+):
     """
     Generates a .obs file following Carnegie OBS formatting
 
@@ -158,15 +272,12 @@ def generate_obs_file(user_id, proj_name, instrument_setup, obj_file_paths):
     Args:
         instrument_setup (json): json of all the params needed for instrument setup. See instrum_setup_ex.json for example
         obj_file_paths (str): list of paths to the .obj files
+        files_dir (str): folder holding obs_files, this package's by default
 
     Returns:
         str: path to obs file
     """
-    script_dir = os.path.dirname(__file__)
-    os.makedirs(os.path.join(script_dir, "obs_files", user_id), exist_ok=True)
-    os.makedirs(
-        os.path.join(script_dir, "obs_files", user_id, proj_name), exist_ok=True
-    )
+    files_dir = files_dir or os.path.dirname(__file__)
     obs_header = f"""#Obs file ({instrument_setup['filename']}.obs)
 # Written By:  IntGui 4.70 
 ! Edited {instrument_setup['edit_date']} By Observer Interface GUI version 4.70.31
@@ -229,15 +340,14 @@ DATE {instrument_setup['date']}
                 obs_header += f"{key}  {value}\n"
     for obj_path in obj_file_paths:
         obs_header += f"#  Object file list\nOBJFILE  {obj_path}\n"
-    script_dir = os.path.dirname(__file__)
-
     path = os.path.join(
-        script_dir,
+        files_dir,
         "obs_files",
         user_id,
         proj_name,
         f"{instrument_setup['filename']}.obs",
     )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
 
     with open(path, "w") as file:
         file.write(obs_header)
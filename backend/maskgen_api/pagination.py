@@ -0,0 +1,88 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.response import Response
+
+# List endpoints return a page at a time with the same body as before; the
+# cursor for the next page, if any, comes back in this header
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+
+def keyset_page(queryset, params, sorts=()):
+    """
+    One page of a queryset, ordered by a sort field and then id. The next
+    page starts after the last row's (sort value, id) instead of at an
+    offset, so every page costs the same and rows added or removed between
+    requests don't shift pages.
+
+    Args:
+        queryset (QuerySet): rows to page through, filtered but not ordered
+        params (QueryDict): request query params: limit (page size,
+            LIST_PAGE_SIZE by default, at most LIST_PAGE_MAX), sort (a field
+            from sorts, "-" in front for descending, id by default) and
+            cursor (from NEXT_CURSOR_HEADER of the previous page)
+        sorts (tuple): fields besides id the caller allows sorting on, each
+            should be indexed
+
+    Returns:
+        (list, str, str): (rows, cursor for the next page or None, error or
+        None)
+    """
+    sort = params.get("sort") or "id"
+    field = sort.removeprefix("-")
+    if field != "id" and field not in sorts:
+        return None, None, f"sort must be one of {', '.join(('id',) + sorts)}"
+    try:
+        limit = int(params.get("limit", settings.LIST_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= settings.LIST_PAGE_MAX:
+        return None, None, f"limit must be 1 to {settings.LIST_PAGE_MAX}"
+
+    op = "lt" if sort.startswith("-") else "gt"
+    if field == "id":
+        queryset = queryset.order_by(sort)
+    else:
+        queryset = queryset.order_by(sort, "-id" if op == "lt" else "id")
+
+    cursor = params.get("cursor")
+    if cursor:
+        try:
+            *value, last_id = _decode(cursor)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            return None, None, "invalid cursor"
+        if len(value) != (field != "id"):
+            return None, None, "cursor is from a different sort"
+        after = Q(**{f"id__{op}": last_id})
+        if value:
+            after = Q(**{f"{field}__{op}": value[0]}) | (Q(**{field: value[0]}) & after)
+        queryset = queryset.filter(after)
+
+    rows = list(queryset[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None, None
+    rows = rows[:limit]
+    last = rows[-1]
+    values = [last.id] if field == "id" else [getattr(last, field), last.id]
+    return rows, _encode(values), None
+
+
+def page_response(body, next_cursor):
+    """
+    Response for a keyset_page page, next_cursor in NEXT_CURSOR_HEADER
+    """
+    response = Response(body)
+    if next_cursor:
+        response[NEXT_CURSOR_HEADER] = next_cursor
+    return response
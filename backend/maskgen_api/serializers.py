@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Object, Mask
+from .models import Object, Mask, MaskJob
 
 
 class UploadObjectSerializer(serializers.ModelSerializer):
@@ -32,5 +32,30 @@ class MaskSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "status", "project_name", "user_id"]
 
     def get_project_name(self, obj):
+        # the mask list views annotate it, see MaskViewSet._mask_list
+        if hasattr(obj, "project_name"):
+            return obj.project_name
         project = obj.project_set.first()
         return project.name if project else None
+
+
+class MaskJobSerializer(serializers.ModelSerializer):
+    filename = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MaskJob
+        fields = [
+            "id",
+            "filename",
+            "project_name",
+            "status",
+            "completed",
+            "total",
+            "result",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_filename(self, obj):
+        return obj.request.get("filename")
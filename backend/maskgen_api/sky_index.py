@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+from django.db.models import Q
+
+# The sky is cut into declination zones CELL_SIZE degrees tall, and each zone
+# into RA cells about CELL_SIZE degrees wide at that declination, so cells
+# are roughly equal-area (like HEALPix, without the extra dependency). Cell
+# ids within a zone are contiguous, so any RA range in a zone is one indexed
+# BETWEEN on Object.sky_cell.
+CELL_SIZE = 0.1  # degrees
+ZONES = int(round(180 / CELL_SIZE))
+RA_CELLS_MAX = int(round(360 / CELL_SIZE))
+
+
+def _zone(dec):
+    return np.clip(np.floor((np.asarray(dec) + 90.0) / CELL_SIZE), 0, ZONES - 1)
+
+
+def _ra_cells(zone):
+    # number of RA cells in a zone, from the cos(dec) of its equator-most edge
+    low = zone * CELL_SIZE - 90.0
+    edge = np.minimum(np.abs(low), np.abs(low + CELL_SIZE))
+    cells = np.floor(RA_CELLS_MAX * np.cos(np.radians(edge)))
+    return np.maximum(cells, 1).astype(np.int64)
+
+
+def sky_cells(ra, dec):
+    """
+    Cell ids for ra/dec in degrees (scalars or arrays), stored on
+    Object.sky_cell at ingest
+    """
+    zone = _zone(dec).astype(np.int64)
+    n_ra = _ra_cells(zone)
+    ra_cell = np.floor(np.mod(ra, 360.0) / 360.0 * n_ra).astype(np.int64)
+    return zone * RA_CELLS_MAX + np.minimum(ra_cell, n_ra - 1)
+
+
+def _zone_ranges(dec_min, dec_max, ra_min, ra_max):
+    # inclusive (first cell, last cell) ranges covering an RA/Dec box; RA
+    # boxes with ra_min > ra_max wrap through 0
+    ranges = []
+    for zone in range(int(_zone(dec_min)), int(_zone(dec_max)) + 1):
+        n_ra = int(_ra_cells(zone))
+        base = zone * RA_CELLS_MAX
+        if ra_max - ra_min >= 360:
+            ranges.append((base, base + n_ra - 1))
+            continue
+        first = int(math.floor(ra_min % 360 / 360 * n_ra))
+        last = int(math.floor(ra_max % 360 / 360 * n_ra))
+        if ra_min % 360 <= ra_max % 360:
+            ranges.append((base + first, base + min(last, n_ra - 1)))
+        else:
+            ranges.append((base + first, base + n_ra - 1))
+            ranges.append((base, base + min(last, n_ra - 1)))
+    return ranges
+
+
+def box_filter(ra_min, ra_max, dec_min, dec_max, **fields):
+    """
+    Q object selecting Objects whose cell overlaps an RA/Dec box (degrees).
+    Only a prefilter: callers still check exact coordinates.
+
+    Equality filters in fields (ex: user_id) are repeated in every cell range
+    so sqlite can answer each one from the (user_id, sky_cell) index.
+    """
+    q = Q()
+    for first, last in _zone_ranges(dec_min, dec_max, ra_min, ra_max):
+        q |= Q(sky_cell__range=(first, last), **fields)
+    return q
+
+
+def cone_filter(ra, dec, radius, **fields):
+    """
+    Q object selecting Objects whose cell overlaps a cone (degrees). Only a
+    prefilter: use angular_separation on the results for the exact cut.
+    fields work as in box_filter.
+    """
+    dec_min = max(dec - radius, -90.0)
+    dec_max = min(dec + radius, 90.0)
+    if dec_min <= -90 or dec_max >= 90:
+        return box_filter(0, 360, dec_min, dec_max, **fields)
+    # largest RA offset of any point on the cone
+    half_width = math.degrees(
+        math.asin(min(math.sin(math.radians(radius)) / math.cos(math.radians(dec)), 1))
+    )
+    return box_filter(ra - half_width, ra + half_width, dec_min, dec_max, **fields)
+
+
+def angular_separation(ra1, dec1, ra2, dec2):
+    """
+    Great-circle distance in degrees (haversine), vectorized over arrays
+    """
+    ra1, dec1, ra2, dec2 = map(np.radians, (ra1, dec1, ra2, dec2))
+    a = (
+        np.sin((dec2 - dec1) / 2) ** 2
+        + np.cos(dec1) * np.cos(dec2) * np.sin((ra2 - ra1) / 2) ** 2
+    )
+    return np.degrees(2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))))
+
+
+def in_box(ra, dec, ra_min, ra_max, dec_min, dec_max):
+    """
+    Which ra/dec (degree arrays) are inside a box, ra_min > ra_max wraps
+    through 0
+    """
+    ra, dec = np.mod(ra, 360.0), np.asarray(dec)
+    if ra_max - ra_min >= 360:
+        in_ra = np.ones(len(ra), dtype=bool)
+    elif ra_min % 360 <= ra_max % 360:
+        in_ra = (ra >= ra_min % 360) & (ra <= ra_max % 360)
+    else:
+        in_ra = (ra >= ra_min % 360) | (ra <= ra_max % 360)
+    return in_ra & (dec >= dec_min) & (dec <= dec_max)
@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Mask
+from .validator import validate
+
+# fields a sweep can't vary: they name the mask and pick what goes on it
+FIXED_FIELDS = ("filename", "project_name", "objects", "sweep", "vary_rotator_range")
+
+
+def sweep_configs(filename, grid):
+    """
+    Every combination of the grid's values, in grid order
+
+    Args:
+        filename (str): base mask name, configs are named {filename}_s1, ...
+        grid (dict): setup field -> list of values to try
+
+    Returns:
+        list: (mask name, {field: value}) per combination
+    """
+    fields = list(grid)
+    return [
+        (f"{filename}_s{i}", dict(zip(fields, values)))
+        for i, values in enumerate(itertools.product(*grid.values()), start=1)
+    ]
+
+
+def validate_sweep(instrum_setup):
+    """
+    Checks the "sweep" grid of a generate request and every setup it makes
+
+    Returns:
+        (bool, str): (whether the sweep is valid, feedback)
+    """
+    grid = instrum_setup["sweep"]
+    if not isinstance(grid, dict) or not grid:
+        return False, "sweep must map setup fields to lists of values"
+    for field, values in grid.items():
+        if field in FIXED_FIELDS:
+            return False, f"sweep can't vary '{field}'"
+        if not isinstance(values, list) or not values:
+            return False, f"sweep values for '{field}' must be a non-empty list"
+
+    configs = sweep_configs(instrum_setup["filename"], grid)
+    if len(configs) > settings.MASKGEN_SWEEP_MAX_CONFIGS:
+        return (
+            False,
+            f"sweep makes {len(configs)} setups, the limit is "
+            f"{settings.MASKGEN_SWEEP_MAX_CONFIGS}",
+        )
+    for name, overrides in configs:
+        valid, feedback = validate(instrum_setup | overrides)
+        if not valid:
+            return False, f"{name} {overrides}: {feedback}"
+    return True, "OK"
+
+
+def run_sweep(generate, configs, data, on_progress=None, return_exceptions=False):
+    """
+    Runs generate for each config on a pool of MASKGEN_SWEEP_WORKERS threads.
+    Each run is a maskgen subprocess in its own sandbox, so threads are
+    enough to keep them all busy.
+
+    Args:
+        generate (callable): takes a setup and returns what
+            _generate_single_mask does
+        configs (list): (mask name, overrides) from sweep_configs
+        data (dict): setup the overrides are applied to
+        on_progress (callable): called with (runs finished, total runs)
+        return_exceptions (bool): as for asyncio.gather, a config that raises
+            gets its exception as its result instead of failing the sweep
+
+    Returns:
+        list: generate's result for each config, in config order
+    """
+    setups = [data | overrides | {"filename": name} for name, overrides in configs]
+    workers = min(settings.MASKGEN_SWEEP_WORKERS, len(setups))
+
+    def outcome(target, setup):
+        try:
+            return target(setup)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    if workers <= 1:
+        results = []
+        for setup in setups:
+            results.append(outcome(generate, setup))
+            if on_progress:
+                on_progress(len(results), len(setups))
+        return results
+
+    def run(setup):
+        try:
+            return generate(setup)
+        finally:
+            # each pool thread opened its own db connection
+            connection.close()
+
+    results = [None] * len(setups)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(outcome, run, setup): i for i, setup in enumerate(setups)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress:
+                on_progress(done, len(setups))
+    return results
+
+
+async def arun_sweep(
+    agenerate, configs, data, on_progress=None, return_exceptions=False
+):
+    """
+    run_sweep for async views: runs agenerate (a coroutine function) for each
+    config, at most MASKGEN_SWEEP_WORKERS at a time
+
+    Returns:
+        list: agenerate's result for each config, in config order
+    """
+    setups = [data | overrides | {"filename": name} for name, overrides in configs]
+    limit = asyncio.Semaphore(max(settings.MASKGEN_SWEEP_WORKERS, 1))
+    done = 0
+
+    async def run(setup):
+        nonlocal done
+        try:
+            async with limit:
+                return await agenerate(setup)
+        finally:
+            done += 1
+            if on_progress:
+                on_progress(done, len(setups))
+
+    return await asyncio.gather(
+        *(run(setup) for setup in setups), return_exceptions=return_exceptions
+    )
+
+
+def comparison_table(user_id, configs, results):
+    """
+    One row per config: its overrides, whether the mask was made, and how
+    many objects maskgen placed on it and left out. A config whose run raised
+    (results from run_sweep with return_exceptions) is a failed row with the
+    exception as its error.
+
+    Returns:
+        list: rows in config order
+    """
+    counts = {
+        mask["name"]: mask
+        for mask in Mask.objects.filter(
+            user_id=user_id, name__in=[name for name, _ in configs]
+        ).values(
+            "name",
+            placed=Count("objects_list", distinct=True),
+            excluded=Count("excluded_obj_list", distinct=True),
+        )
+    }
+    rows = []
+    for (name, overrides), outcome in zip(configs, results):
+        if isinstance(outcome, Exception):
+            result, error = False, str(outcome) or type(outcome).__name__
+        else:
+            result, response, _ = outcome
+            error = None if result else response.data.get("error")
+        mask = counts.get(name) if result else None
+        rows.append(
+            {
+                "filename": name,
+                "config": overrides,
+                "created": mask is not None,
+                "placed": mask["placed"] if mask else None,
+                "excluded": mask["excluded"] if mask else None,
+                "error": error,
+            }
+        )
+    return rows
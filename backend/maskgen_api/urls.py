@@ -1,5 +1,7 @@
 # maskgen_api/urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     MaskViewSet,
     ObjectViewSet,
@@ -7,6 +9,7 @@ from .views import (
     ImageViewSet,
     ProjectViewSet,
     MachineViewSet,
+    JobViewSet,
 )
 
 router = DefaultRouter()
@@ -16,5 +19,11 @@ router.register(r"instruments", InstrumentViewSet, basename="instrum")
 router.register(r"images", ImageViewSet, basename="image")
 router.register(r"project", ProjectViewSet, basename="project")
 router.register(r"machine", MachineViewSet, basename="machine")
+router.register(r"jobs", JobViewSet, basename="job")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    # async (ASGI) versions of the generate endpoints
+    path("async/masks/generate/", async_views.generate_masks),
+    path("async/masks/generate/stream/", async_views.generate_masks_stream),
+    path("async/machine/generate/", async_views.generate_machine_code),
+]
@@ -1,21 +1,44 @@
 import math
-from .obs_file_formatting import to_deg
+from .obs_file_formatting import to_deg_columns
 
 pdx_lat = -29.01418  # las campanas coordinate
 
 
 # TODO: figure out what hrf is set to (defaults to 30 but other times is recalculated?)
 def validate(instrum_setup):
+    guide_stars = instrum_setup.get("guide_stars", [])
+    if guide_stars:
+        _, _, errors = to_deg_columns(
+            [gs["ra"] for gs in guide_stars],
+            [gs["dec"] for gs in guide_stars],
+            labels=[f"guide star '{gs['name']}'" for gs in guide_stars],
+        )
+        if errors:
+            return False, "; ".join(errors)
+
+    if instrum_setup.get("fov_prefilter"):
+        # instrument_field needs a usable center to prune objects around
+        _, _, errors = to_deg_columns(
+            [instrum_setup["center_ra"]],
+            [instrum_setup["center_dec"]],
+            labels=["center"],
+        )
+        if errors:
+            return False, "; ".join(errors)
+
     hrf = 30
     if hrf > 24.0:
         return True, "OK"
     else:
         # defc: Dec. field center in degrees
-        defc = instrum_setup["center_dec"]
-        if ":" in defc:
-            _, defc = to_deg("10:00:18.500", instrum_setup["center_dec"])
-        else:
-            defc = float(defc)
+        _, defc, errors = to_deg_columns(
+            [instrum_setup["center_ra"]],
+            [instrum_setup["center_dec"]],
+            labels=["center"],
+        )
+        if errors:
+            return False, "; ".join(errors)
+        defc = defc[0]
 
         hk = gsda(30.0, defc, pdx_lat)
         if math.fabs(hrf) < hk:
@@ -3,26 +3,62 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
-
-from astropy.table import Table
-
-from .models import Object, Mask, ObjectList, InstrumentConfig, Status, Project, Image
-from .serializers import ObjectSerializer, MaskSerializer
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.db import IntegrityError
+from django.utils.http import parse_etags
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
+
+from .models import (
+    Object,
+    Mask,
+    MaskDetail,
+    MaskJob,
+    ObjectList,
+    InstrumentConfig,
+    Status,
+    Project,
+    Image,
+)
+from .serializers import ObjectSerializer, MaskSerializer, MaskJobSerializer
 from .obs_file_formatting import (
     generate_obj_file,
     generate_obs_file,
-    obj_to_json,
     categorize_objs,
-    to_deg,
+    to_deg_columns,
+    instrument_field,
+)
+from backend.terminal_helper import (
+    run_maskgen,
+    run_maskcut,
+    remove_file,
+    maskgen_sandbox,
 )
-from backend.terminal_helper import run_maskgen, run_maskcut, remove_file
 from .validator import validate
+from .sweep import sweep_configs, validate_sweep, run_sweep, comparison_table
+from . import features, maskgen_cache, jobs, instrument_configs
+from .sky_index import cone_filter, box_filter, angular_separation, in_box
+from .ingest import bulk_ingest
+from .writes import serialized_write
+from .pagination import keyset_page, page_response
+from .catalogs import (
+    iter_obj_batches,
+    iter_csv_batches,
+    iter_fits_batches,
+    iter_parquet_batches,
+    iter_row_batches,
+    iter_parallel_batches,
+)
+import hashlib
 import json
 import os
-import io
+import re
 import shutil
+from functools import partial
+
+import numpy as np
 
 MASKGEN_DIRECTORY = "/Users/maylinchen/downloads/maskgen-2.14-Darwin-12.6_arm64/"
 PROJECT_DIRECTORY = os.getcwd() + "/"
@@ -100,30 +136,37 @@ class ProjectViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        projects = Project.objects.filter(user_id=user_id).values("name")
+        projects, next_cursor, error = keyset_page(
+            Project.objects.filter(user_id=user_id).only("id", "name"),
+            request.query_params,
+            sorts=("name",),
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(
-            {"projects": list(projects)},
-            status=status.HTTP_200_OK,
+        return page_response(
+            {"projects": [{"name": project.name} for project in projects]},
+            next_cursor,
         )
 
 
 class InstrumentViewSet(viewsets.ViewSet):
     def retrieve(self, request, pk=None):
         version = request.query_params.get("version")
-        if version:
-            config = get_object_or_404(InstrumentConfig, instrument=pk, version=version)
-        else:
-            config = (
-                InstrumentConfig.objects.filter(instrument=pk)
-                .order_by("-version")
-                .first()
-            )
-            if config:
-                return Response(
-                    {"error": f"No instrument config found with name '{pk}'"},
-                    status=404,
-                )
+        try:
+            config = instrument_configs.get_config(
+                pk, int(version) if version else None
+            )
+        except ValueError:
+            return Response(
+                {"error": "version must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not config:
+            return Response(
+                {"error": f"No instrument config found with name '{pk}'"},
+                status=404,
+            )
 
         return Response(
             {
@@ -154,6 +197,7 @@ class InstrumentViewSet(viewsets.ViewSet):
             aux=json.dumps(data),
             version=version,
         )
+        instrument_configs.invalidate(instrument_config.instrument)
 
         return Response(
             {"created": str(instrument_config)}, status=status.HTTP_201_CREATED
@@ -195,17 +239,32 @@ class ObjectViewSet(viewsets.ViewSet):
         project = Project.objects.get(name=proj_name, user_id=user_id)
 
         uploaded_file = request.data.get("file")
-        uploaded_file_bytes = uploaded_file.read()
-
-        # check if file is .obj or json
-        if uploaded_file.name.endswith(".obj"):
-            data = obj_to_json(uploaded_file_bytes)
-        elif uploaded_file.name.endswith(".csv"):
-            table = Table.read(io.BytesIO(uploaded_file_bytes), format="csv")
-            data = table.to_pandas().to_dict(orient="records")
+        errors = []
+
+        # check if file is .obj, csv, fits, parquet or json
+        file_name = uploaded_file.name.lower()
+        parallel = (
+            settings.CATALOG_PARSE_WORKERS > 1
+            and uploaded_file.size >= settings.CATALOG_PARALLEL_THRESHOLD
+        )
+        if parallel and file_name.endswith((".obj", ".csv")):
+            batches = iter_parallel_batches(
+                uploaded_file,
+                errors,
+                file_name[-3:],
+                settings.CATALOG_PARSE_WORKERS,
+            )
+        elif file_name.endswith(".obj"):
+            batches = iter_obj_batches(uploaded_file, errors)
+        elif file_name.endswith(".csv"):
+            batches = iter_csv_batches(uploaded_file, errors)
+        elif file_name.endswith((".fits", ".fit", ".fts")):
+            batches = iter_fits_batches(uploaded_file, errors)
+        elif file_name.endswith((".parquet", ".pq")):
+            batches = iter_parquet_batches(uploaded_file, errors)
         else:
-            data_str = uploaded_file_bytes.decode("utf-8")
-            data = json.loads(data_str)
+            data_str = uploaded_file.read().decode("utf-8")
+            batches = iter_row_batches(json.loads(data_str))
 
         # Check if a list with the same name and user_id already exists
         existing = ObjectList.objects.filter(name=list_name, user_id=user_id).first()
@@ -215,27 +274,22 @@ class ObjectViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        obj_list = ObjectList.objects.create(
-            name=list_name, user_id=user_id, project_name=proj_name
-        )
-
-        for row in data:
-            # convert hours to degs if in hrs
-            ra, dec = to_deg(row.pop("ra"), row.pop("dec"))
-
-            obj = Object.objects.create(
-                name=row.pop("name"),
-                user_id=request.headers.get("user-id"),
-                type=row.pop("type"),
-                right_ascension=ra,
-                declination=dec,
-                priority=int(row.pop("priority")),
-                aux=row,
+        # one transaction: the list is created, filled and attached whole, any
+        # error rolls all of it back
+        try:
+            with serialized_write():
+                obj_list = ObjectList.objects.create(
+                    name=list_name, user_id=user_id, project_name=proj_name
+                )
+                bulk_ingest(obj_list, user_id, batches, errors)
+                project.obj_list = obj_list
+                project.save()
+        except (KeyError, OSError, TypeError, ValueError) as e:
+            return Response(
+                {"error": f"could not ingest '{uploaded_file.name}': {e}"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            obj_list.objects_list.add(obj)
 
-        project.obj_list = obj_list
-        project.save()
         return Response(
             {"obj_list": obj_list.name},
             status=status.HTTP_201_CREATED,
@@ -253,12 +307,133 @@ class ObjectViewSet(viewsets.ViewSet):
                 {"error": f"No ObjectList found with name '{list_name}'"}, status=404
             )
 
+        params = request.query_params
+        # driven from the list's membership index and sorted afterwards:
+        # walking an index over every user's objects in sort order and
+        # probing membership per row reads the whole table for a short list
+        objs = Object.objects.filter(objectlist=obj_list)
+        if params.get("type"):
+            objs = objs.filter(type=params["type"])
+        try:
+            if params.get("priority_min"):
+                objs = objs.filter(priority__gte=float(params["priority_min"]))
+            if params.get("priority_max"):
+                objs = objs.filter(priority__lte=float(params["priority_max"]))
+        except ValueError:
+            return Response(
+                {"error": "priority_min and priority_max must be numbers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if params.get("name_prefix"):
+            # a range rather than startswith: sqlite's LIKE can't use the index
+            prefix = params["name_prefix"]
+            objs = objs.filter(name__gte=prefix, name__lt=prefix + "\U0010ffff")
+        page, next_cursor, error = keyset_page(objs, params, sorts=("name", "priority"))
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
         results = []
 
-        serialized_objects = ObjectSerializer(obj_list.objects_list.all(), many=True)
+        serialized_objects = ObjectSerializer(page, many=True)
         results.append({"list_name": obj_list.name, "objects": serialized_objects.data})
 
-        return Response(results)
+        return page_response(results, next_cursor)
+
+    @staticmethod
+    def _in_list(obj_list):
+        # correlated EXISTS so sqlite drives the query from the sky_cell index
+        # and only probes list membership per match, instead of walking the
+        # whole list
+        through = ObjectList.objects_list.through
+        return Exists(
+            through.objects.filter(objectlist_id=obj_list.id, object_id=OuterRef("pk"))
+        )
+
+    @action(detail=False, methods=["get"], url_path="cone")
+    def cone_search(self, request):
+        """
+        Objects in a list within `radius` arcmin of ra/dec, nearest first
+        """
+        params = request.query_params
+        user_id = request.headers.get("user-id")
+        ra, dec, errors = to_deg_columns(
+            [params.get("ra")], [params.get("dec")], labels=["center"]
+        )
+        try:
+            radius = float(params.get("radius")) / 60
+        except (TypeError, ValueError):
+            errors.append("radius must be a number of arcmin")
+        if errors:
+            return Response(
+                {"error": "; ".join(errors)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        obj_list = get_object_or_404(
+            ObjectList, name=params.get("list_name"), user_id=user_id
+        )
+        # sky_cell ranges narrow it down through the index, exact cut after
+        candidates = list(
+            Object.objects.filter(
+                cone_filter(ra[0], dec[0], radius, user_id=user_id),
+                self._in_list(obj_list),
+            )
+        )
+        separation = angular_separation(
+            ra[0],
+            dec[0],
+            [obj.right_ascension for obj in candidates],
+            [obj.declination for obj in candidates],
+        )
+        matches = sorted(
+            (
+                (sep, obj)
+                for sep, obj in zip(separation.tolist(), candidates)
+                if sep <= radius
+            ),
+            key=lambda match: match[0],
+        )
+        objects = ObjectSerializer([obj for _, obj in matches], many=True).data
+        for (sep, _), obj in zip(matches, objects):
+            obj["separation"] = sep * 60
+        return Response({"list_name": obj_list.name, "objects": objects})
+
+    @action(detail=False, methods=["get"], url_path="box")
+    def box_search(self, request):
+        """
+        Objects in a list inside an RA/Dec box. ra_min > ra_max wraps through 0
+        """
+        params = request.query_params
+        user_id = request.headers.get("user-id")
+        (ra_min, ra_max), (dec_min, dec_max), errors = to_deg_columns(
+            [params.get("ra_min"), params.get("ra_max")],
+            [params.get("dec_min"), params.get("dec_max")],
+            labels=["min", "max"],
+        )
+        if errors:
+            return Response(
+                {"error": "; ".join(errors)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        obj_list = get_object_or_404(
+            ObjectList, name=params.get("list_name"), user_id=user_id
+        )
+        if ra_min <= ra_max:
+            in_ra = Q(right_ascension__gte=ra_min, right_ascension__lte=ra_max)
+        else:
+            in_ra = Q(right_ascension__gte=ra_min) | Q(right_ascension__lte=ra_max)
+        matches = Object.objects.filter(
+            box_filter(ra_min, ra_max, dec_min, dec_max, user_id=user_id),
+            self._in_list(obj_list),
+            in_ra,
+            declination__gte=dec_min,
+            declination__lte=dec_max,
+        )
+        return Response(
+            {
+                "list_name": obj_list.name,
+                "objects": ObjectSerializer(matches, many=True).data,
+            }
+        )
 
     @action(detail=False, methods=["get"], url_path="list_all")
     def list_obj_lists(self, request):
@@ -269,11 +444,17 @@ class ObjectViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        obj_lists = ObjectList.objects.filter(user_id=user_id).values("name")
+        obj_lists, next_cursor, error = keyset_page(
+            ObjectList.objects.filter(user_id=user_id).only("id", "name"),
+            request.query_params,
+            sorts=("name",),
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(
-            {"object lists": list(obj_lists)},
-            status=status.HTTP_200_OK,
+        return page_response(
+            {"object lists": [{"name": obj_list.name} for obj_list in obj_lists]},
+            next_cursor,
         )
 
     @action(detail=False, methods=["delete"], url_path="delete_obj")
@@ -282,7 +463,7 @@ class ObjectViewSet(viewsets.ViewSet):
         obj_name = request.query_params.get("obj_name")
         user_id = request.headers.get("user-id")
         obj_list = get_object_or_404(ObjectList, name=list_name, user_id=user_id)
-        obj = get_object_or_404(obj_list.objects, name=obj_name)
+        obj = get_object_or_404(obj_list.objects_list, name=obj_name)
         obj_list.objects_list.remove(obj)
         obj.delete()
         return Response(
@@ -329,158 +510,300 @@ class ObjectViewSet(viewsets.ViewSet):
 
 
 class MaskViewSet(viewsets.ViewSet):
+    DETAIL_OBJECT_FIELDS = (
+        "name",
+        "type",
+        "right_ascension",
+        "declination",
+        "priority",
+        "aux",
+    )
+
     @staticmethod
-    def _file_cleanup(filename):
-        # clean up auto generated files
-        remove_file(f"{PROJECT_DIRECTORY}.loc_mgvers.dat")
-        remove_file(f"{PROJECT_DIRECTORY}.loc_ociw214.pem")
-        remove_file(f"{PROJECT_DIRECTORY}{filename}.obw")
+    def _object_details(objs):
+        return [
+            {
+                "name": obj.name,
+                "type": obj.type,
+                "right_ascension": obj.right_ascension,
+                "declination": obj.declination,
+                "priority": obj.priority,
+            }
+            | (obj.aux or {})
+            for obj in objs
+        ]
 
     @staticmethod
-    def _get_features(filepath):
-        features = []
-        with open(filepath, "rb") as f:
-            for line in f:
-                line = line.decode("utf-8").strip()
-                if line.startswith("SLIT"):
-                    parts = line.split()
-                    features.append(
-                        {
-                            "type": "SLIT",
-                            "id": parts[1],
-                            "ra": parts[2],
-                            "dec": parts[3],
-                            "x": float(parts[4]),
-                            "y": float(parts[5]),
-                            "width": float(parts[6]),
-                            "a_len": float(parts[7]),
-                            "b_len": float(parts[8]),
-                            "angle": float(parts[9]),
-                        }
-                    )
-                elif line.startswith("HOLE"):
-                    parts = line.split()
-                    features.append(
-                        {
-                            "type": "HOLE",
-                            "id": parts[1],
-                            "ra": parts[2],
-                            "dec": parts[3],
-                            "x": float(parts[4]),
-                            "y": float(parts[5]),
-                            "width": float(parts[6]),
-                            "shape_code": int(parts[7]),
-                            "a_len": float(parts[8]),
-                            "b_len": float(parts[9]),
-                            "angle": float(parts[10]),
-                        }
-                    )
-        return features
+    def _mask_list(masks):
+        """
+        Masks for MaskSerializer: project names annotated in the same query
+        and the feature tables left in the db
+        """
+        first_project = Project.objects.filter(masks=OuterRef("pk")).order_by("pk")
+        return masks.only("id", "name", "status", "user_id").annotate(
+            project_name=Subquery(first_project.values("name")[:1])
+        )
+
+    def _render_detail(self, proj_name, user_id, pk, include_features):
+        """
+        Renders a mask's retrieve body and stores it as a MaskDetail
+
+        Returns:
+            (bytes, str): (body, etag)
+        """
+        body = None
+        try:
+            # the render holds the write lock on purpose (transactions begin
+            # IMMEDIATE): no edit can commit between the reads and the insert,
+            # so the stored json is never stale. Other writers wait for one
+            # render, on the mask's first read only.
+            with serialized_write():
+                # one query for the mask and one per object list, however
+                # many objects are on it
+                objects = Object.objects.only(*self.DETAIL_OBJECT_FIELDS)
+                masks = Mask.objects.filter(
+                    project__name=proj_name, project__user_id=user_id
+                ).prefetch_related(
+                    Prefetch("objects_list", queryset=objects),
+                    Prefetch("excluded_obj_list", queryset=objects),
+                )
+                if not include_features:
+                    masks = masks.defer("feature_table")
+                mask = get_object_or_404(masks, name=pk)
+
+                body = JSONRenderer().render(
+                    {
+                        "name": pk,
+                        "status": mask.status,
+                        "center_ra": mask.center_ra,
+                        "center_dec": mask.center_dec,
+                        "instrument_version": mask.instrument_version,
+                        "instrument_setup": mask.instrument_setup,
+                        "objects_list": self._object_details(mask.objects_list.all()),
+                        "excluded_objects": self._object_details(
+                            mask.excluded_obj_list.all()
+                        ),
+                    }
+                    # the preview pages through /features/ instead
+                    | ({"features": mask.features} if include_features else {})
+                )
+                etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+                MaskDetail.objects.create(
+                    mask=mask, with_features=include_features, body=body, etag=etag
+                )
+        except IntegrityError:
+            # stored by a concurrent first read that had the lock first
+            if body is None:
+                raise
+        return body, etag
 
     def retrieve(self, request, pk=None):
+        """
+        Mask details, served from the MaskDetail rendered on first read. The
+        ETag lets clients revalidate with If-None-Match.
+        """
         proj_name = request.query_params.get("project_name")
         user_id = request.headers.get("user-id")
-        project = Project.objects.get(name=proj_name, user_id=user_id)
-        mask = project.masks.get(name=pk)
+        include_features = request.query_params.get("features") != "false"
+        detail = (
+            MaskDetail.objects.filter(
+                mask__name=pk,
+                mask__project__name=proj_name,
+                mask__project__user_id=user_id,
+                with_features=include_features,
+            )
+            .values_list("body", "etag")
+            .first()
+        )
+        if detail is None:
+            detail = self._render_detail(proj_name, user_id, pk, include_features)
+        body, etag = detail
 
+        if_none_match = request.headers.get("If-None-Match", "")
+        if etag in parse_etags(if_none_match) or if_none_match.strip() == "*":
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(bytes(body), content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    @staticmethod
+    def _box_param(params, names, errors):
+        if not any(params.get(name) is not None for name in names):
+            return None
+        try:
+            return tuple(float(params[name]) for name in names)
+        except (KeyError, ValueError):
+            errors.append(f"{', '.join(names)} must all be numbers")
+            return None
+
+    @action(detail=True, methods=["get"], url_path="features")
+    def get_features(self, request, pk=None):
+        """
+        Slits and holes of a mask inside a box, a page at a time
+
+        Query params:
+            project_name: project the mask belongs to
+            x_min, x_max, y_min, y_max: box in mask coordinates
+            ra_min, ra_max, dec_min, dec_max: box in degrees, ra_min > ra_max
+                wraps through 0
+            type: SLIT or HOLE
+            cursor: "next" of the previous page
+            limit: page size, MASK_FEATURES_PAGE_SIZE by default
+            lod: for wide views, if more than lod features match, return a
+                spatially even subset of at most lod of them in one page
+        """
+        params = request.query_params
+        user_id = request.headers.get("user-id")
+        errors = []
+        region = self._box_param(params, ("x_min", "x_max", "y_min", "y_max"), errors)
+        sky_box = self._box_param(
+            params, ("ra_min", "ra_max", "dec_min", "dec_max"), errors
+        )
+        feature_type = params.get("type")
+        if feature_type is not None and feature_type not in features.FEATURE_TYPES:
+            errors.append(f"type must be one of {', '.join(features.FEATURE_TYPES)}")
+        try:
+            cursor = int(params.get("cursor", 0))
+            limit = int(params.get("limit", settings.MASK_FEATURES_PAGE_SIZE))
+            lod = int(params["lod"]) if params.get("lod") else None
+        except ValueError:
+            errors.append("cursor, limit and lod must be integers")
+        else:
+            if cursor < 0 or not 0 < limit <= settings.MASK_FEATURES_PAGE_MAX:
+                errors.append(
+                    f"limit must be 1 to {settings.MASK_FEATURES_PAGE_MAX} and "
+                    "cursor not negative"
+                )
+            if lod is not None and not 0 < lod <= settings.MASK_FEATURES_PAGE_MAX:
+                errors.append(f"lod must be 1 to {settings.MASK_FEATURES_PAGE_MAX}")
+        if errors:
+            return Response(
+                {"error": "; ".join(errors)}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        project = get_object_or_404(
+            Project, name=params.get("project_name"), user_id=user_id
+        )
+        mask = get_object_or_404(project.masks, name=pk)
+        table = mask.feature_array
+        keep = features.matches(table, feature_type=feature_type, region=region)
+        if sky_box:
+            ra, dec, _ = to_deg_columns(
+                np.char.decode(table["ra"], "utf-8"),
+                np.char.decode(table["dec"], "utf-8"),
+            )
+            keep &= in_box(ra, dec, *sky_box)
+        rows = np.flatnonzero(keep)
+        total = len(rows)
+
+        decimated = lod is not None and total > lod
+        if decimated:
+            rows, next_cursor = rows[features.decimate(table[rows], lod)], None
+        else:
+            # cursors are row numbers in the mask's table, which never changes
+            rows = rows[rows >= cursor]
+            next_cursor = int(rows[limit]) if len(rows) > limit else None
+            rows = rows[:limit]
         return Response(
             {
                 "name": pk,
-                "status": mask.status,
-                "instrument_version": mask.instrument_version,
-                "instrument_setup": mask.instrument_setup,
-                "objects_list": [
-                    {
-                        "name": obj.name,
-                        "type": obj.type,
-                        "right_ascension": obj.right_ascension,
-                        "declination": obj.declination,
-                        "priority": obj.priority,
-                    }
-                    | (obj.aux or {})
-                    for obj in mask.objects_list.all()
-                ],
-                "excluded_objects": [
-                    {
-                        "name": obj.name,
-                        "type": obj.type,
-                        "right_ascension": obj.right_ascension,
-                        "declination": obj.declination,
-                        "priority": obj.priority,
-                    }
-                    | (obj.aux or {})
-                    for obj in mask.excluded_obj_list.all()
-                ],
-                "features": mask.features,
+                "total": total,
+                "decimated": decimated,
+                "next": next_cursor,
+                "features": features.to_dicts(table[rows]),
             }
         )
 
-    def _generate_single_mask(self, user_id, proj_name, data, project):
-        print(data)
-        filename = data["filename"]
+    def _prepare_mask(self, user_id, proj_name, data, on_event=None):
+        """
+        Writes the .obj and .obs inputs for one maskgen run
 
-        generate_obj_file(user_id, proj_name, filename, data["objects"])
-        generate_obs_file(user_id, proj_name, data, [f"{filename}.obj"])
-        os.environ["MGPATH"] = MASKGEN_DIRECTORY
-        shutil.copy(
-            f"{PROJECT_DIRECTORY}{API_FOLDER}obj_files/{user_id}/{proj_name}/{filename}.obj",
-            f"{MASKGEN_DIRECTORY}{filename}.obj",
-        )
-        shutil.copy(
-            f"{PROJECT_DIRECTORY}{API_FOLDER}obs_files/{user_id}/{proj_name}/{filename}.obs",
-            f"{MASKGEN_DIRECTORY}{filename}.obs",
-        )
+        Args:
+            on_event (callable): called with (event name, dict) as each file
+                is written, see async_views.generate_masks_stream
 
-        result, feedback = run_maskgen(
-            f"{MASKGEN_DIRECTORY}/maskgen -s {filename}.obs",
-            data["override"] == "true",
-        )
-        os.makedirs(
-            os.path.join(f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id),
-            exist_ok=True,
-        )
-        os.makedirs(
-            os.path.join(
-                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id, proj_name
-            ),
-            exist_ok=True,
-        )
-        result, feedback = run_maskgen(
-            f"{MASKGEN_DIRECTORY}/maskgen -s {filename}.obs",
-            data["override"] == "true",
+        Returns:
+            dict: what _finish_mask needs to know about the run
+        """
+        on_event = on_event or (lambda event, payload: None)
+        filename = data["filename"]
+
+        # next to the smf_files and nc_files that delete_mask cleans up
+        files_dir = f"{PROJECT_DIRECTORY}{API_FOLDER}"
+        obj_path, pruned = generate_obj_file(
+            user_id,
+            proj_name,
+            filename,
+            data["objects"],
+            instrument_field(data),
+            files_dir=files_dir,
         )
-        print(feedback)
-        os.makedirs(
-            os.path.join(f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id),
-            exist_ok=True,
+        obj_path = os.path.join(files_dir, obj_path)
+        on_event("obj_written", {"filename": filename, "pruned": pruned})
+        obs_path = generate_obs_file(
+            user_id, proj_name, data, [f"{filename}.obj"], files_dir=files_dir
         )
-        os.makedirs(
-            os.path.join(
-                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id, proj_name
+        on_event("obs_written", {"filename": filename})
+        return {
+            "filename": filename,
+            "inputs": [obj_path, obs_path],
+            "command": f"{MASKGEN_DIRECTORY}/maskgen -s {filename}.obs",
+            "cache_key": maskgen_cache.cache_key(
+                filename, obs_path, obj_path, f"{MASKGEN_DIRECTORY}maskgen"
             ),
-            exist_ok=True,
-        )
-        os.rename(
-            f"{PROJECT_DIRECTORY}{filename}.SMF",
-            f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{filename}.SMF",
-        )
+            "pruned": pruned,
+        }
+
+    def _finish_mask(
+        self,
+        user_id,
+        proj_name,
+        data,
+        project,
+        run,
+        work_dir,
+        result,
+        feedback,
+        on_event=None,
+    ):
+        """
+        Saves the mask from a finished maskgen run in work_dir
 
-        if result and "Writing object file with use counts to" in feedback:
-            # process features from SMF
-            filepath = os.path.join(
-                PROJECT_DIRECTORY,
-                API_FOLDER,
-                "smf_files",
-                user_id,
-                proj_name,
-                f"{filename}.SMF",
-                PROJECT_DIRECTORY,
-                API_FOLDER,
-                "smf_files",
-                user_id,
-                proj_name,
-                f"{filename}.SMF",
+        Args:
+            on_event (callable): as in _prepare_mask
+
+        Returns:
+            (bool, Response, int): (success, response, objects left off the mask)
+        """
+        filename = run["filename"]
+        if not (result and "Writing object file with use counts to" in feedback):
+            return (
+                False,
+                Response({"error": feedback}, status=status.HTTP_400_BAD_REQUEST),
+                0,
+            )
+        if not run.get("cached"):
+            maskgen_cache.store(run["cache_key"], filename, work_dir, feedback)
+
+        smf_dir = os.path.join(
+            f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files", user_id, proj_name
+        )
+        os.makedirs(smf_dir, exist_ok=True)
+
+        # process features from SMF
+        filepath = os.path.join(smf_dir, f"{filename}.SMF")
+        shutil.move(os.path.join(work_dir, f"{filename}.SMF"), filepath)
+        feature_table = features.parse_smf(filepath)
+        if on_event:
+            on_event(
+                "smf_parsed", {"filename": filename, "features": len(feature_table)}
             )
+        instrument_version = instrument_configs.get_config(data["instrument"]).version
+        # the mask, its object links and its place in the project commit
+        # together, in one turn at the write lock
+        with serialized_write():
             mask = Mask.objects.create(
                 name=filename,
                 user_id=user_id,
@@ -488,90 +811,203 @@ class MaskViewSet(viewsets.ViewSet):
                 center_ra=data["center_ra"],
                 center_dec=data["center_dec"],
                 instrument_setup=data,
-                instrument_version=InstrumentConfig.objects.filter(
-                    instrument=data["instrument"]
+                instrument_version=instrument_version,
+                feature_table=features.pack(feature_table),
+            )
+            result, feedback = categorize_objs(
+                mask,
+                os.path.join(work_dir, f"{filename}.obw"),
+                data["objects"],
+                proj_name,
+            )
+            # categorize_objs deleted the mask if it placed an unknown object
+            if result:
+                project.masks.add(mask)
+        if not result:
+            remove_file(filepath)
+            return (
+                False,
+                Response({"error": feedback}, status=status.HTTP_400_BAD_REQUEST),
+                0,
+            )
+
+        excluded = mask.excluded_obj_list.count()
+        if on_event:
+            placed = mask.objects_list.count()
+            on_event(
+                "objects_categorized",
+                {"filename": filename, "placed": placed, "excluded": excluded},
+            )
+        return (
+            True,
+            Response(
+                {"created": filepath, "pruned": run["pruned"]},
+                status=status.HTTP_201_CREATED,
+            ),
+            excluded,
+        )
+
+    def _generate_single_mask(self, user_id, proj_name, data, project):
+        run = self._prepare_mask(user_id, proj_name, data)
+
+        # maskgen writes into its working directory, run it in a private one
+        # so concurrent generations don't clobber each other's files
+        with maskgen_sandbox(MASKGEN_DIRECTORY, run["inputs"]) as (work_dir, env):
+            feedback = maskgen_cache.lookup(run["cache_key"], run["filename"], work_dir)
+            run["cached"] = result = feedback is not None
+            if not result:
+                result, feedback = run_maskgen(
+                    run["command"],
+                    data.get("override") == "true",
+                    cwd=work_dir,
+                    env=env,
+                    idle_timeout=settings.MASKGEN_IDLE_TIMEOUT,
+                    total_timeout=settings.MASKGEN_TIMEOUT,
                 )
-                .order_by("-version")
-                .first()
-                .version,
-                features=self._get_features(filepath),
+            return self._finish_mask(
+                user_id, proj_name, data, project, run, work_dir, result, feedback
             )
 
-            result, feedback = categorize_objs(
-                mask, f"{PROJECT_DIRECTORY}{filename}.obw", data["objects"], proj_name
+    def _check_generate(self, data, user_id):
+        """
+        Checks a generate request before any mask is made
+
+        Returns:
+            (Project, Response): the request's project, or None and the error
+        """
+        project = Project.objects.get(name=data["project_name"], user_id=user_id)
+        valid, feedback = validate(data)
+        if valid and data.get("sweep") is not None:
+            valid, feedback = validate_sweep(data)
+        if not valid:
+            return None, Response(
+                {"error": feedback},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            self._file_cleanup(filename)
 
-            project.masks.add(mask)
-            project.save()
-            return (
-                True,
-                Response(
-                    {
-                        "created": f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{filename}.SMF"
-                    },
-                    status=status.HTTP_201_CREATED,
-                ),
-                mask.excluded_obj_list.count(),
+        if project.masks.filter(self._mask_names(data)).exists():
+            return None, Response(
+                {"error": "mask name already exists for project"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        return project, None
+
+    def _mask_names(self, data):
+        # the names of the masks _generate makes for a request
+        filename = data["filename"]
+        if data.get("vary_rotator_range"):
+            configs = self._rotator_configs(filename, data["vary_rotator_range"])
+        elif data.get("sweep"):
+            configs = sweep_configs(filename, data["sweep"])
+        elif data.get("generate_until_all_included", False):
+            # as many _v{n} masks as it takes to place every object
+            return Q(name__regex=rf"^{re.escape(filename)}_v[0-9]+$")
         else:
-            self._file_cleanup(filename)
-            return False, Response(
-                {"error": feedback}, status=status.HTTP_400_BAD_REQUEST
+            return Q(name=filename)
+        return Q(name__in=[name for name, _ in configs])
+
+    def _submit_job(self, user_id, data, project):
+        job = MaskJob.objects.create(
+            user_id=user_id, project_name=data["project_name"], request=data
+        )
+        jobs.submit(
+            job,
+            partial(self._generate, user_id, data["project_name"], dict(data), project),
+        )
+        return Response({"job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+
+    @staticmethod
+    def _rotator_configs(filename, vary_rotator):
+        # a one-field sweep that keeps its _rot{angle} mask names
+        return [
+            (filename + f"_rot{angle}", {"rotator_angle": angle})
+            for angle in range(
+                vary_rotator["start"], vary_rotator["end"] + 1, vary_rotator["step"]
             )
+        ]
+
+    @staticmethod
+    def _rotator_response(configs, results):
+        generated = []
+        for (name, _), (result, response, _) in zip(configs, results):
+            if not result:
+                return response
+            generated.append(name)
+        return Response(
+            {"created": generated},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @staticmethod
+    def _sweep_response(user_id, configs, results):
+        table = comparison_table(user_id, configs, results)
+        generated = [row["filename"] for row in table if row["created"]]
+        if not generated:
+            return Response(
+                {"error": "no setup in the sweep produced a mask", "sweep": table},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
+            {"created": generated, "sweep": table},
+            status=status.HTTP_201_CREATED,
+        )
 
     @action(detail=False, methods=["post"], url_path="generate")
     def generate_masks(self, request):
         data = request.data
-        filename = data["filename"]
         proj_name = data["project_name"]
         user_id = request.headers.get("user-id")
-        project = Project.objects.get(name=proj_name, user_id=user_id)
+        project, error = self._check_generate(data, user_id)
+        if error:
+            return error
 
-        if project.masks.filter(name=filename).exists():
-            return Response(
-                {"error": "mask name already exists for project"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        if data.get("async") in (True, "true"):
+            return self._submit_job(user_id, data, project)
 
-        valid, feedback = validate(data)
-        if not valid:
-            return Response(
-                {"error": feedback},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        return self._generate(user_id, proj_name, data, project)
 
+    def _generate(self, user_id, proj_name, data, project, on_progress=None):
+        """
+        Generates the mask(s) a generate request asks for
+
+        Args:
+            on_progress (callable): called with (maskgen runs finished, total
+                runs) as runs finish; total is None when not known up front
+
+        Returns:
+            Response: the generate endpoint's response
+        """
+        on_progress = on_progress or (lambda completed, total=None: None)
+        filename = data["filename"]
         generate_until_all = data.get("generate_until_all_included", False)
         vary_rotator = data.get("vary_rotator_range")
         generated = []
+
+        def generate_one(setup):
+            return self._generate_single_mask(user_id, proj_name, setup, project)
+
         if vary_rotator:
-            for angle in range(
-                vary_rotator["start"], vary_rotator["end"] + 1, vary_rotator["step"]
-            ):
-                data["rotator_angle"] = angle
-                data["filename"] = filename + f"_rot{angle}"
-                result, response, _ = self._generate_single_mask(
-                    self, user_id, proj_name, data, project
-                )
-                if result:
-                    generated.append(data["filename"])
-                else:
-                    return response
-            return Response(
-                {"created": generated},
-                status=status.HTTP_201_CREATED,
+            configs = self._rotator_configs(filename, vary_rotator)
+            results = run_sweep(generate_one, configs, data, on_progress)
+            return self._rotator_response(configs, results)
+        elif data.get("sweep"):
+            configs = sweep_configs(filename, data["sweep"])
+            results = run_sweep(
+                generate_one, configs, data, on_progress, return_exceptions=True
             )
+            return self._sweep_response(user_id, configs, results)
         elif generate_until_all:
             suffix_count = 1
             excluded_count = 1
             while excluded_count > 0:
                 data["filename"] = filename + f"_v{suffix_count}"
                 result, response, excluded_count = self._generate_single_mask(
-                    self, user_id, proj_name, data, project
+                    user_id, proj_name, data, project
                 )
                 if not result:
                     return response
                 generated.append(data["filename"])
+                on_progress(len(generated))
                 suffix_count += 1
             return Response(
                 {"created": generated},
@@ -579,10 +1015,11 @@ class MaskViewSet(viewsets.ViewSet):
             )
         else:
             result, response, _ = self._generate_single_mask(
-                self, user_id, proj_name, data, project
+                user_id, proj_name, data, project
             )
             if result:
                 generated.append(data["filename"])
+                on_progress(1, 1)
             return response
 
     @action(detail=False, methods=["post"], url_path="finalize")
@@ -675,8 +1112,9 @@ class MaskViewSet(viewsets.ViewSet):
         for file_path in file_paths:
             remove_file(file_path)
 
-        project.masks.remove(mask)
-        mask.delete()
+        with serialized_write():
+            project.masks.remove(mask)
+            mask.delete()
 
         return Response(
             {"message": f"mask '{mask_name}' deleted successfully"},
@@ -688,93 +1126,106 @@ class MaskViewSet(viewsets.ViewSet):
         """
         Return all masks whose status is FINALIZED
         """
-        masks = Mask.objects.filter(status="finalized")
+        masks, next_cursor, error = keyset_page(
+            self._mask_list(Mask.objects.filter(status="finalized")),
+            request.query_params,
+            sorts=("name",),
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
         serializer = MaskSerializer(masks, many=True)
-        return Response(serializer.data)
+        return page_response(serializer.data, next_cursor)
 
     @action(detail=False, methods=["get"], url_path="completed_masks")
     def get_completed_masks(self, request):
         """
         Return all masks whose status is COMPLETED
         """
-        masks = Mask.objects.filter(status="completed")
+        masks, next_cursor, error = keyset_page(
+            self._mask_list(Mask.objects.filter(status="completed")),
+            request.query_params,
+            sorts=("name",),
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
         serializer = MaskSerializer(masks, many=True)
-        return Response(serializer.data)
+        return page_response(serializer.data, next_cursor)
 
     @action(detail=False, methods=["get"], url_path="get_project_masks")
     def get_project_masks(self, request):
         user_id = request.headers.get("user-id")
         proj_name = request.query_params.get("project_name")
         project = Project.objects.filter(name=proj_name, user_id=user_id).first()
-        serializer = MaskSerializer(project.masks, many=True)
+        serializer = MaskSerializer(self._mask_list(project.masks.all()), many=True)
         return Response(serializer.data)
 
 
 class MachineViewSet(viewsets.ViewSet):
-    @action(detail=False, methods=["post"], url_path="generate")
-    def generate_machine_code(self, request):
-        data = request.data
+    def _prepare_machine_code(self, data, user_id):
+        """
+        Checks a machine code request
+
+        Returns:
+            (dict, Response): the maskcut run to do, or None and the error
+        """
         proj_name = data["project_name"]
-        user_id = request.headers.get("user-id")
         mask_name = data["mask_name"]
         overwrite = data["overwrite"] == "true"
-        overwrite = data["overwrite"] == "true"
         project = Project.objects.get(name=proj_name, user_id=user_id)
         mask = project.masks.get(name=mask_name)
         file_path = f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files/{user_id}/{proj_name}/I{mask_name}.nc"
 
         if os.path.exists(file_path) and not overwrite:
-            return Response(
+            return None, Response(
                 {"error": "machine code already generated"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        if mask.status == Status.FINALIZED:
-            os.environ["MGPATH"] = MASKGEN_DIRECTORY
-            shutil.copy(
-                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{mask_name}.SMF",
-                f"{MASKGEN_DIRECTORY}{mask_name}.SMF",
-            )
-            result, feedback = run_maskcut(
-                f"{MASKGEN_DIRECTORY}/maskcut {mask_name}", overwrite
-            )
-            result, feedback = run_maskcut(
-                f"{MASKGEN_DIRECTORY}/maskcut {mask_name}", overwrite
-            )
-            if result and "Estimated cutting time" in feedback:
-                os.makedirs(
-                    os.path.join(
-                        f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files", user_id, proj_name
-                    ),
-                    exist_ok=True,
-                )
-                os.makedirs(
-                    os.path.join(f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files", user_id),
-                    exist_ok=True,
-                )
-                os.makedirs(
-                    os.path.join(
-                        f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files", user_id, proj_name
-                    ),
-                    exist_ok=True,
-                )
-                os.rename(
-                    f"{PROJECT_DIRECTORY}I{mask_name}.nc",
-                    f"{PROJECT_DIRECTORY}{API_FOLDER}nc_files/{user_id}/{proj_name}/I{mask_name}.nc",
-                )
-
-                mask.status = Status.COMPLETED
-                return Response(
-                    {"created": f"I{mask_name}.nc"},
-                    status=status.HTTP_201_CREATED,
-                )
-            else:
-                return Response({"error": feedback}, status=status.HTTP_400_BAD_REQUEST)
-        else:
-            return Response(
+        if mask.status != Status.FINALIZED:
+            return None, Response(
                 "error, mask has not been marked as completed",
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        return {
+            "mask": mask,
+            "file_path": file_path,
+            "overwrite": overwrite,
+            "inputs": [
+                f"{PROJECT_DIRECTORY}{API_FOLDER}smf_files/{user_id}/{proj_name}/{mask_name}.SMF"
+            ],
+            "command": f"{MASKGEN_DIRECTORY}/maskcut {mask_name}",
+        }, None
+
+    def _finish_machine_code(self, run, work_dir, result, feedback):
+        """
+        Saves the .nc file from a finished maskcut run in work_dir
+        """
+        if not (result and "Estimated cutting time" in feedback):
+            return Response({"error": feedback}, status=status.HTTP_400_BAD_REQUEST)
+
+        nc_name = os.path.basename(run["file_path"])
+        os.makedirs(os.path.dirname(run["file_path"]), exist_ok=True)
+        shutil.move(os.path.join(work_dir, nc_name), run["file_path"])
+        run["mask"].status = Status.COMPLETED
+        run["mask"].save(update_fields=["status"])
+        return Response({"created": nc_name}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="generate")
+    def generate_machine_code(self, request):
+        user_id = request.headers.get("user-id")
+        run, error = self._prepare_machine_code(request.data, user_id)
+        if error:
+            return error
+
+        with maskgen_sandbox(MASKGEN_DIRECTORY, run["inputs"]) as (work_dir, env):
+            result, feedback = run_maskcut(
+                run["command"],
+                run["overwrite"],
+                cwd=work_dir,
+                env=env,
+                idle_timeout=settings.MASKGEN_IDLE_TIMEOUT,
+                total_timeout=settings.MASKGEN_TIMEOUT,
+            )
+            return self._finish_machine_code(run, work_dir, result, feedback)
 
     @action(detail=False, methods=["get"], url_path="get-machine-code")
     def get_machine_code(self, request):
@@ -800,3 +1251,41 @@ class MachineViewSet(viewsets.ViewSet):
                 {"error": "Machine code has not been generated."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+
+
+class JobViewSet(viewsets.ViewSet):
+    def list(self, request):
+        user_id = request.headers.get("user-id")
+        queryset = MaskJob.objects.filter(user_id=user_id).order_by("-id")
+        job_status = request.query_params.get("status")
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        return Response(MaskJobSerializer(queryset, many=True).data)
+
+    def retrieve(self, request, pk=None):
+        user_id = request.headers.get("user-id")
+        job = get_object_or_404(MaskJob, id=pk, user_id=user_id)
+        return Response(MaskJobSerializer(job).data)
+
+    @action(detail=False, methods=["get"], url_path="wait")
+    def wait(self, request):
+        user_id = request.headers.get("user-id")
+        try:
+            ids = [int(i) for i in request.query_params.get("ids", "").split(",")]
+            timeout = float(request.query_params.get("timeout", 30))
+        except ValueError:
+            return Response(
+                {"error": "ids must be a comma separated list of job ids"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        queryset = MaskJob.objects.filter(id__in=ids, user_id=user_id).order_by("id")
+        if queryset.count() != len(set(ids)):
+            return Response(
+                {"error": "job(s) not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        timeout = min(max(timeout, 0), settings.MASKGEN_JOB_WAIT_MAX)
+        done, waited = jobs.wait(queryset, timeout)
+        return Response(
+            {"done": done, "jobs": MaskJobSerializer(waited, many=True).data}
+        )
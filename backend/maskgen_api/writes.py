@@ -0,0 +1,25 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+# SQLite takes one writer at a time. Threads of this process (requests, job
+# and sweep workers) line up for it here, blocked on a lock, instead of in
+# sqlite's busy handler, which sleeps and retries and can time a waiter out
+# behind a long catalog ingest. Other processes still meet at sqlite's lock,
+# see SQLITE_BUSY_TIMEOUT.
+_write_lock = threading.RLock()
+
+
+@contextmanager
+def serialized_write():
+    """
+    transaction.atomic() entered by one thread at a time, for the bulk and
+    multi-statement writes: catalog ingest and a new mask's bookkeeping
+
+    Enter it before any transaction is open. A thread already holding
+    sqlite's write lock and waiting here would block the thread ahead of it
+    until the busy timeout. Nesting is fine, the inner one is a savepoint.
+    """
+    with _write_lock, transaction.atomic():
+        yield
@@ -0,0 +1,106 @@
+import json
+import os
+from io import BytesIO
+
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api import async_views, instrument_configs, views
+from maskgen_api.models import InstrumentConfig, Project
+from backend.settings import BASE_DIR, TEST_OBJ_FILE_PATH
+
+SETUP_PATH = os.path.join(
+    BASE_DIR, "tests", "test_files", "instrum_setup_works_ex.json"
+)
+
+# stands in for maskgen -s name.obs: asks to go on like maskgen does, then
+# writes its outputs to the cwd, placing every object of name.obj. The .obs
+# it read and its $MGPATH are left in .loc_ files, as maskgen leaves its own.
+FAKE_MASKGEN = """#!/bin/sh
+name=$(basename "$2" .obs)
+printf "Do you wish to continue? "
+read answer
+cp "$2" .loc_obs
+echo "$MGPATH" > .loc_mgpath
+echo "SLIT 1 10:00:00 02:00:00 1.0 2.0 1.2 3.0 3.0 0.0" > "$name.SMF"
+if [ -f "$name.obj" ]; then
+    grep '^[@*]' "$name.obj" | sed 's/$/ Use=1/' > "$name.obw"
+else
+    touch "$name.obw"
+fi
+echo "Writing object file with use counts to $name.obw"
+"""
+# stands in for maskcut name
+FAKE_MASKCUT = """#!/bin/sh
+touch "I$1.nc"
+echo "Estimated cutting time 12 min"
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_instrument_configs():
+    # the in-memory config cache outlives each test's rolled back db
+    instrument_configs.invalidate()
+    yield
+    instrument_configs.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def project_directory(tmp_path, monkeypatch):
+    # generated .obj/.obs/.SMF/.nc files go here instead of the source tree
+    monkeypatch.setattr(views, "PROJECT_DIRECTORY", f"{tmp_path}/")
+    return tmp_path
+
+
+@pytest.fixture
+def maskgen(tmp_path, monkeypatch, settings):
+    """
+    A maskgen install holding FAKE_MASKGEN and FAKE_MASKCUT, used by the sync
+    and async views. Returns its directory.
+    """
+    maskgen_dir = tmp_path / "maskgen"
+    maskgen_dir.mkdir()
+    for name, body in (("maskgen", FAKE_MASKGEN), ("maskcut", FAKE_MASKCUT)):
+        (maskgen_dir / name).write_text(body)
+        (maskgen_dir / name).chmod(0o755)
+    (maskgen_dir / "mgvers.dat").write_text("2.14\n")
+    for module in (views, async_views):
+        monkeypatch.setattr(module, "MASKGEN_DIRECTORY", f"{maskgen_dir}/")
+    settings.MASKGEN_CACHE_DIR = tmp_path / "cache"
+    return maskgen_dir
+
+
+@pytest.fixture
+def setup():
+    """
+    Project "test" of user "test" and an IMACS_sc config. Returns the
+    generate request of instrum_setup_works_ex.json (mask001 from the
+    DCM5V5E_obj_1 list, see obj_list).
+    """
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    InstrumentConfig.objects.create(
+        instrument="IMACS_sc",
+        version=1,
+        filters={"filter1": "val"},
+        dispersers={"disp1": "val"},
+        aux={"aux1": "val"},
+    )
+    with open(SETUP_PATH) as fh:
+        return json.load(fh)
+
+
+@pytest.fixture
+def obj_list(setup):
+    """
+    The DCM5V5E_obj_1 list of project "test", uploaded from DCM5V5E.obj
+    """
+    with open(TEST_OBJ_FILE_PATH, "rb") as fh:
+        file = BytesIO(fh.read())
+    file.name = "DCM5V5E.obj"
+    response = APIClient().post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": setup["objects"], "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+    assert response.status_code == 201, response.content
+    return setup["objects"]
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from maskgen_api import async_views, views
+from maskgen_api.models import Mask, Project, Status
+from conftest import FAKE_MASKGEN
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def setup(setup, obj_list):
+    return setup | {"override": "true"}
+
+
+def _post(url, payload):
+    return async_to_sync(AsyncClient().post)(
+        url, payload, content_type="application/json", headers={"user-id": "test"}
+    )
+
+
+def test_async_generate(maskgen, setup, project_directory):
+    payload = setup | {"vary_rotator_range": {"start": 0, "end": 20, "step": 10}}
+    response = _post("/api/async/masks/generate/", payload)
+    assert response.status_code == 201, response.content
+    assert response.json() == {"created": [f"mask001_rot{a}" for a in (0, 10, 20)]}
+
+    mask = Mask.objects.get(name="mask001_rot10")
+    assert mask.features[0]["type"] == "SLIT"
+    assert os.path.exists(
+        project_directory
+        / "maskgen_api"
+        / "smf_files"
+        / "test"
+        / "test"
+        / "mask001_rot10.SMF"
+    )
+
+
+def test_async_generate_rejects_duplicate(maskgen, setup):
+    assert _post("/api/async/masks/generate/", setup).status_code == 201
+    response = _post("/api/async/masks/generate/", setup)
+    assert response.status_code == 400
+    assert response.json() == {"error": "mask name already exists for project"}
+
+
+def test_generate_rejects_unknown_object(maskgen, setup, project_directory):
+    # maskgen placed an object that isn't in the list
+    (maskgen / "maskgen").write_text(
+        FAKE_MASKGEN + 'echo "@ghost 10:00:00 02:00:00 Use=1" >> "$name.obw"\n'
+    )
+    response = _post("/api/async/masks/generate/", setup)
+    assert response.status_code == 400
+    assert response.json() == {"error": "warning: object with name 'ghost' not found."}
+    assert not Mask.objects.exists()
+    assert not Project.objects.get(name="test").masks.exists()
+    assert not os.path.exists(
+        project_directory
+        / "maskgen_api"
+        / "smf_files"
+        / "test"
+        / "test"
+        / "mask001.SMF"
+    )
+
+
+def test_async_machine_code(maskgen, setup, project_directory):
+    _post("/api/async/masks/generate/", setup)
+    mask = Mask.objects.get(name="mask001")
+    mask.status = Status.FINALIZED
+    mask.save()
+
+    response = _post(
+        "/api/async/machine/generate/",
+        {"project_name": "test", "mask_name": "mask001", "overwrite": "false"},
+    )
+    assert response.status_code == 201, response.content
+    assert response.json() == {"created": "Imask001.nc"}
+    mask.refresh_from_db()
+    assert mask.status == Status.COMPLETED
+    assert os.path.exists(
+        project_directory / "maskgen_api" / "nc_files" / "test" / "test" / "Imask001.nc"
+    )
+
+
+def _stream(payload):
+    async def post():
+        response = await AsyncClient().post(
+            "/api/async/masks/generate/stream/",
+            payload,
+            content_type="application/json",
+            headers={"user-id": "test"},
+        )
+        if not response.streaming:
+            return response, []
+        body = "".join([chunk.decode() async for chunk in response.streaming_content])
+        events = []
+        for block in body.strip().split("\n\n"):
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data[6:])))
+        return response, events
+
+    return async_to_sync(post)()
+
+
+def test_stream_events(maskgen, setup):
+    response, events = _stream(setup)
+    assert response["Content-Type"] == "text/event-stream"
+    assert [name for name, _ in events] == [
+        "started",
+        "obj_written",
+        "obs_written",
+        "maskgen_started",
+        "maskgen_output",
+        "maskgen_finished",
+        "smf_parsed",
+        "objects_categorized",
+        "done",
+    ]
+    events = dict(events)
+    # the answered prompt has no newline of its own, as on a terminal
+    assert events["maskgen_output"]["line"] == (
+        "Do you wish to continue? Writing object file with use counts to mask001.obw"
+    )
+    assert events["smf_parsed"] == {"filename": "mask001", "features": 1}
+    assert events["done"]["status"] == 201
+    assert events["done"]["body"]["created"].endswith("mask001.SMF")
+
+
+def test_stream_iterations(maskgen, setup, monkeypatch):
+    # leaves one object off the first two masks, then fits everything
+    counts = iter([1, 1, 0])
+    finish = views.MaskViewSet._finish_mask
+
+    def finish_mask(self, *args, **kwargs):
+        result, response, _ = finish(self, *args, **kwargs)
+        return result, response, next(counts)
+
+    monkeypatch.setattr(views.MaskViewSet, "_finish_mask", finish_mask)
+    _, events = _stream(setup | {"generate_until_all_included": True})
+    iterations = [payload for name, payload in events if name == "iteration"]
+    assert [(i["iteration"], i["filename"], i["excluded"]) for i in iterations] == [
+        (1, "mask001_v1", 1),
+        (2, "mask001_v2", 1),
+        (3, "mask001_v3", 0),
+    ]
+    assert events[-1][1]["body"] == {
+        "created": ["mask001_v1", "mask001_v2", "mask001_v3"]
+    }
+
+
+def test_stream_not_read(maskgen, setup):
+    # the generation runs and releases the mask even if nobody reads the stream
+    async def post():
+        response = await AsyncClient().post(
+            "/api/async/masks/generate/stream/",
+            setup,
+            content_type="application/json",
+            headers={"user-id": "test"},
+        )
+        await asyncio.gather(*async_views._running)
+        return response
+
+    response = async_to_sync(post)()
+    assert response.streaming
+    assert not async_views._streaming
+    assert Mask.objects.filter(name="mask001").exists()
+
+
+def test_stream_rejects_in_progress(maskgen, setup):
+    async_views._streaming.add(("test", "test", "mask001"))
+    try:
+        response, _ = _stream(setup)
+    finally:
+        async_views._streaming.clear()
+    assert response.status_code == 409
+    assert not Mask.objects.exists()
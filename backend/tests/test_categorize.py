@@ -0,0 +1,76 @@
+import pytest
+from maskgen_api.models import Mask, MaskDetail, Object, ObjectList
+from maskgen_api.obs_file_formatting import categorize_objs
+
+pytestmark = pytest.mark.django_db
+
+
+def _setup(tmp_path, count):
+    obj_list = ObjectList.objects.create(
+        user_id="test", project_name="test", name="list"
+    )
+    objs = Object.objects.bulk_create(
+        Object(
+            name=f"obj{i}",
+            user_id="test",
+            type="TARGET",
+            right_ascension=150.0,
+            declination=2.0,
+        )
+        for i in range(count)
+    )
+    obj_list.objects_list.add(*objs)
+    mask = Mask.objects.create(
+        name="mask001",
+        user_id="test",
+        center_ra="10:00:00",
+        center_dec="02:00:00",
+        instrument_version=1,
+        instrument_setup={},
+    )
+    # maskgen marks the objects it used with a use count
+    obw = tmp_path / "mask001.obw"
+    obw.write_text(
+        "&RADEGREE\n"
+        + "".join(
+            f"@obj{i} 150.0 2.0 Pri=1.0" + (" Use=1" if i % 3 else "") + "\n"
+            for i in range(count)
+        )
+    )
+    return mask, obw
+
+
+@pytest.mark.parametrize("count", [3, 300])
+def test_categorize(tmp_path, django_assert_num_queries, count):
+    mask, obw = _setup(tmp_path, count)
+    # list, names -> ids, savepoint, two inserts, detail cleanup, release
+    with django_assert_num_queries(7):
+        assert categorize_objs(mask, obw, "list", "test") == (True, "yay it worked")
+    placed = {f"obj{i}" for i in range(count) if i % 3}
+    assert set(mask.objects_list.values_list("name", flat=True)) == placed
+    assert mask.excluded_obj_list.count() == count - len(placed)
+
+
+def test_categorize_twice(tmp_path):
+    mask, obw = _setup(tmp_path, 6)
+    categorize_objs(mask, obw, "list", "test")
+    assert categorize_objs(mask, obw, "list", "test")[0]
+    assert mask.objects_list.count() == 4
+    assert mask.excluded_obj_list.count() == 2
+
+
+def test_categorize_unknown_object(tmp_path):
+    mask, obw = _setup(tmp_path, 3)
+    obw.write_text(obw.read_text() + "*ghost 150.0 2.0\n")
+    assert categorize_objs(mask, obw, "list", "test") == (
+        False,
+        "warning: object with name 'ghost' not found.",
+    )
+    assert not Mask.objects.exists()
+
+
+def test_categorize_drops_stored_details(tmp_path):
+    mask, obw = _setup(tmp_path, 3)
+    MaskDetail.objects.create(mask=mask, with_features=True, body=b"{}", etag='"x"')
+    categorize_objs(mask, obw, "list", "test")
+    assert not MaskDetail.objects.exists()
@@ -0,0 +1,191 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api import features
+from maskgen_api.models import Mask, Project
+from backend.settings import BASE_DIR
+
+SMF_PATH = os.path.join(BASE_DIR, "tests", "data", "DCM5V5E.SMF")
+
+
+def _smf_dicts(path):
+    # the list of dicts masks used to store, straight from the file
+    parsed = []
+    with open(path) as fh:
+        for line in fh:
+            parts = line.split()
+            if not parts or parts[0] not in features.FEATURE_TYPES:
+                continue
+            names = (
+                features.SLIT_COLUMNS if parts[0] == "SLIT" else features.HOLE_COLUMNS
+            )
+            feature = {"type": parts[0]}
+            for name, value in zip(names, parts[1:]):
+                if name in features.FLOAT_COLUMNS:
+                    value = float(value)
+                elif name == "shape_code":
+                    value = int(value)
+                feature[name] = value
+            parsed.append(feature)
+    return parsed
+
+
+@pytest.fixture(scope="module")
+def table():
+    return features.parse_smf(SMF_PATH)
+
+
+def test_parse_smf(table):
+    assert len(table) == 1834
+    assert features.to_dicts(table) == _smf_dicts(SMF_PATH)
+
+
+def test_pack_round_trip(table):
+    blob = features.pack(table)
+    assert np.array_equal(features.unpack(blob), table)
+    assert len(features.unpack(None)) == 0
+    assert features.to_dicts(features.unpack(b"")) == []
+
+
+def test_from_dicts(table):
+    assert np.array_equal(features.from_dicts(features.to_dicts(table)), table)
+
+
+def test_select(table):
+    holes = features.select(table, feature_type="HOLE")
+    assert len(holes) == 10
+    assert all(f["type"] == "HOLE" for f in features.to_dicts(holes))
+
+    rows = features.select(table, ids=["DC-1006811", "DC-1229306"])
+    assert [f["id"] for f in features.to_dicts(rows)] == ["DC-1006811", "DC-1229306"]
+
+    rows = features.select(table, region=(-10, 10, -50, 50))
+    assert len(rows) > 0
+    assert ((rows["x"] >= -10) & (rows["x"] <= 10)).all()
+    assert ((rows["y"] >= -50) & (rows["y"] <= 50)).all()
+
+    rows = features.select(table, feature_type="SLIT", region=(-300, 300, -300, 300))
+    assert len(rows) == len(table) - 10
+
+
+@pytest.mark.django_db
+def test_large_mask_loads_fast(table):
+    big = np.concatenate([table] * 5)  # ~9000 slits
+    Mask.objects.create(
+        name="big",
+        user_id="test",
+        center_ra="10:00:00",
+        center_dec="02:00:00",
+        instrument_version=1,
+        instrument_setup={},
+        feature_table=features.pack(big),
+    )
+    start = time.perf_counter()
+    mask = Mask.objects.get(name="big")
+    loaded = mask.feature_array
+    assert time.perf_counter() - start < 0.1
+    assert np.array_equal(loaded, big)
+    assert len(features.select(loaded, feature_type="HOLE")) == 50
+
+
+@pytest.fixture
+def mask(table):
+    project = Project.objects.create(
+        name="test", user_id="test", center_ra=150.0, center_dec=2.3
+    )
+    mask = Mask.objects.create(
+        name="DCM5V5E",
+        user_id="test",
+        center_ra="10:00:00",
+        center_dec="02:23:00",
+        instrument_version=1,
+        instrument_setup={},
+        feature_table=features.pack(table),
+    )
+    project.masks.add(mask)
+    return mask
+
+
+def _get_features(**params):
+    return APIClient().get(
+        "/api/masks/DCM5V5E/features/",
+        {"project_name": "test"} | params,
+        HTTP_USER_ID="test",
+    )
+
+
+@pytest.mark.django_db
+def test_features_pages(mask, table):
+    seen = []
+    params = {"limit": 500}
+    while True:
+        body = _get_features(**params).json()
+        assert body["total"] == len(table)
+        assert not body["decimated"]
+        assert len(body["features"]) <= 500
+        seen += body["features"]
+        if body["next"] is None:
+            break
+        params["cursor"] = body["next"]
+    assert seen == features.to_dicts(table)
+
+
+@pytest.mark.django_db
+def test_features_xy_box(mask, table):
+    response = _get_features(x_min=-10, x_max=10, y_min=-50, y_max=50, type="SLIT")
+    assert response.status_code == 200
+    expected = features.select(table, feature_type="SLIT", region=(-10, 10, -50, 50))
+    assert response.json()["features"] == features.to_dicts(expected)
+
+
+@pytest.mark.django_db
+def test_features_sky_box(mask):
+    # a few arcmin around the first slit, DC-1006811 at 10:00:31.07 +02:12:25.9
+    ra, dec = 150.1294583, 2.2071944
+    body = _get_features(
+        ra_min=ra - 0.02, ra_max=ra + 0.02, dec_min=dec - 0.02, dec_max=dec + 0.02
+    ).json()
+    assert 0 < body["total"] < 1834
+    assert "DC-1006811" in [f["id"] for f in body["features"]]
+    for f in body["features"]:
+        h, m, sec = map(float, f["ra"].split(":"))
+        assert abs((h + m / 60 + sec / 3600) * 15 - ra) <= 0.02
+
+
+@pytest.mark.django_db
+def test_features_lod(mask, table):
+    body = _get_features(lod=100).json()
+    assert body["decimated"]
+    assert body["total"] == len(table)
+    assert body["next"] is None
+    assert 0 < len(body["features"]) <= 100
+    # spread over the mask, not just its first rows
+    xs = [f["x"] for f in body["features"]]
+    assert max(xs) - min(xs) > 0.8 * (table["x"].max() - table["x"].min())
+
+
+@pytest.mark.django_db
+def test_features_bad_params(mask):
+    assert _get_features(x_min=0).status_code == 400
+    assert _get_features(type="SQUARE").status_code == 400
+    assert _get_features(limit=0).status_code == 400
+    assert _get_features(cursor="abc").status_code == 400
+    response = APIClient().get(
+        "/api/masks/nope/features/", {"project_name": "test"}, HTTP_USER_ID="test"
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_retrieve_without_features(mask):
+    response = APIClient().get(
+        "/api/masks/DCM5V5E/",
+        {"project_name": "test", "features": "false"},
+        HTTP_USER_ID="test",
+    )
+    assert response.status_code == 200
+    assert "features" not in response.json()
+    assert response.json()["center_ra"] == "10:00:00"
@@ -93,3 +93,30 @@ class InstrumentViewSetTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["filters"], {"R": "info"})
         self.assertEqual(response.data["dispersers"], {"IMACS_direct_grism": "direct"})
+
+    def test_latest_cached_until_upload(self):
+        InstrumentConfig.objects.create(
+            instrument="IMACS_sc",
+            version=1,
+            filters={"R": "info"},
+            dispersers={"IMACS_direct_grism": "direct"},
+            aux={"note": "v1"},
+        )
+        self.client.get(self.retrieve_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.retrieve_url)
+        self.assertEqual(response.data["filters"], {"R": "info"})
+
+        data = {"instrument": "IMACS_sc", "filters": {"I": "info"}, "dispersers": {}}
+        self.client.post(self.upload_url, data, format="json")
+        response = self.client.get(self.retrieve_url)
+        self.assertEqual(response.data["filters"], {"I": "info"})
+        # the old version is still there by number
+        response = self.client.get(self.retrieve_url + "?version=1")
+        self.assertEqual(response.data["filters"], {"R": "info"})
+
+    def test_retrieve_missing(self):
+        response = self.client.get("/api/instruments/IMACS_lc/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(self.retrieve_url + "?version=two")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
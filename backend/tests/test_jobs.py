@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from maskgen_api.models import JobStatus, MaskJob
+from maskgen_api.views import MaskViewSet
+
+client = APIClient()
+
+
+@pytest.fixture
+def setup(setup):
+    return setup | {"async": True}
+
+
+@pytest.fixture
+def fake_maskgen(monkeypatch):
+    # stands in for a maskgen run; "fail" in the filename makes it fail
+    def generate(self, user_id, proj_name, data, project):
+        time.sleep(0.05)
+        if "fail" in data["filename"]:
+            return False, Response({"error": "maskgen failed"}, status=400), 0
+        return True, Response({"created": data["filename"]}, status=201), 0
+
+    monkeypatch.setattr(MaskViewSet, "_generate_single_mask", generate)
+
+
+def _post(payload):
+    return client.post(
+        "/api/masks/generate/", payload, format="json", **{"HTTP_USER_ID": "test"}
+    )
+
+
+def _get(url):
+    return client.get(url, **{"HTTP_USER_ID": "test"})
+
+
+@pytest.mark.django_db
+def test_inline_job(setup, fake_maskgen, settings):
+    settings.MASKGEN_JOB_WORKERS = 0
+    response = _post(setup)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+
+    job = _get(f"/api/jobs/{response.data['job_id']}/").data
+    assert job["status"] == JobStatus.SUCCEEDED
+    assert job["filename"] == "mask001"
+    assert (job["completed"], job["total"]) == (1, 1)
+    assert job["result"] == {"created": "mask001"}
+
+
+@pytest.mark.django_db
+def test_failed_job(setup, fake_maskgen, settings):
+    settings.MASKGEN_JOB_WORKERS = 0
+    response = _post(setup | {"filename": "mask_fail"})
+    job = MaskJob.objects.get(id=response.data["job_id"])
+    assert job.status == JobStatus.FAILED
+    assert job.result == {"error": "maskgen failed"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_wait_for_batch(setup, fake_maskgen, settings):
+    settings.MASKGEN_JOB_WORKERS = 2
+    sweep = setup | {"vary_rotator_range": {"start": 0, "end": 20, "step": 10}}
+    ids = [
+        _post(sweep | {"filename": name}).data["job_id"]
+        for name in ("maskA", "maskB", "maskC")
+    ]
+
+    response = _get(f"/api/jobs/wait/?ids={','.join(map(str, ids))}&timeout=10")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data["done"]
+    for job, name in zip(response.data["jobs"], ("maskA", "maskB", "maskC")):
+        assert job["status"] == JobStatus.SUCCEEDED
+        assert (job["completed"], job["total"]) == (3, 3)
+        assert job["result"]["created"] == [f"{name}_rot{a}" for a in (0, 10, 20)]
+
+    listed = _get("/api/jobs/?status=succeeded").data
+    assert sorted(job["id"] for job in listed) == sorted(ids)
+
+
+@pytest.mark.django_db
+def test_wait_unknown_job(setup):
+    assert _get("/api/jobs/wait/?ids=12345").status_code == 404
+    assert _get("/api/jobs/wait/?ids=abc").status_code == 400
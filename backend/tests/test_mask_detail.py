@@ -0,0 +1,126 @@
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api.models import Mask, MaskDetail, Object, ObjectList, Project
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+
+
+@pytest.fixture
+def mask():
+    project = Project.objects.create(
+        name="test", user_id="test", center_ra=1.0, center_dec=1.0
+    )
+    mask = Mask.objects.create(
+        name="mask001",
+        user_id="test",
+        center_ra="10:00:00",
+        center_dec="02:00:00",
+        instrument_version=1,
+        instrument_setup={},
+    )
+    project.masks.add(mask)
+    obj_list = ObjectList.objects.create(
+        user_id="test", project_name="test", name="list"
+    )
+    on, off = (
+        Object.objects.create(
+            name=name,
+            user_id="test",
+            type="TARGET",
+            right_ascension=150.0,
+            declination=2.0,
+        )
+        for name in ("on", "off")
+    )
+    obj_list.objects_list.add(on, off)
+    mask.objects_list.add(on)
+    mask.excluded_obj_list.add(off)
+    return mask
+
+
+def _get(**headers):
+    return client.get(
+        "/api/masks/mask001/", {"project_name": "test"}, HTTP_USER_ID="test", **headers
+    )
+
+
+def test_etag(mask):
+    response = _get()
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert MaskDetail.objects.filter(mask=mask).count() == 1
+
+    response = _get(HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response["ETag"] == etag
+    assert _get(HTTP_IF_NONE_MATCH='"other"').status_code == 200
+
+
+def test_variants_cached_separately(mask):
+    full = _get().json()
+    summary = client.get(
+        "/api/masks/mask001/",
+        {"project_name": "test", "features": "false"},
+        HTTP_USER_ID="test",
+    ).json()
+    assert "features" in full
+    assert "features" not in summary
+    assert MaskDetail.objects.filter(mask=mask).count() == 2
+
+
+def test_status_change_invalidates(mask):
+    etag = _get()["ETag"]
+    response = client.post(
+        "/api/masks/finalize/",
+        {"project_name": "test", "mask_name": "mask001"},
+        format="json",
+        HTTP_USER_ID="test",
+    )
+    assert response.status_code == 200, response.content
+    response = _get(HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["status"] == "finalized"
+    assert response["ETag"] != etag
+
+
+def test_object_edit_invalidates(mask):
+    etag = _get()["ETag"]
+    response = client.patch(
+        "/api/objects/edit/",
+        {"list_name": "list", "obj_name": "on", "priority": 5},
+        format="json",
+        HTTP_USER_ID="test",
+    )
+    assert response.status_code == 200, response.content
+    response = _get(HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()["objects_list"][0]["priority"] == 5
+
+
+def test_object_delete_invalidates(mask):
+    _get()
+    response = client.delete(
+        "/api/objects/delete_obj/?list_name=list&obj_name=off", HTTP_USER_ID="test"
+    )
+    assert response.status_code == 200, response.content
+    assert _get().json()["excluded_objects"] == []
+
+
+def test_other_edits_keep_cache(mask):
+    _get()
+    Object.objects.create(
+        name="elsewhere",
+        user_id="test",
+        type="TARGET",
+        right_ascension=10.0,
+        declination=2.0,
+    ).save()
+    assert MaskDetail.objects.filter(mask=mask).exists()
+
+
+def test_mask_delete(mask):
+    _get()
+    mask.delete()
+    assert not MaskDetail.objects.exists()
+    assert _get().status_code == 404
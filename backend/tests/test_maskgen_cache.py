@@ -0,0 +1,96 @@
+import pytest
+from maskgen_api import maskgen_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, settings):
+    settings.MASKGEN_CACHE_DIR = tmp_path / "cache"
+    settings.MASKGEN_CACHE_MAX_BYTES = 1024 * 1024
+    return settings.MASKGEN_CACHE_DIR
+
+
+def _run(tmp_path, filename, body="slit 1 2 3"):
+    # fake maskgen inputs/outputs that mention the mask filename
+    work = tmp_path / filename
+    work.mkdir()
+    (work / f"{filename}.obs").write_text(f"OBJFILE {filename}.obj\n")
+    (work / f"{filename}.obj").write_text("@star1 1.0 2.0\n")
+    (work / f"{filename}.SMF").write_text(f"NAME {filename}\n{body}\n")
+    (work / f"{filename}.obw").write_text(f"{filename}.SMF written\n")
+    return work
+
+
+def test_store_and_lookup_under_new_filename(tmp_path, cache_dir):
+    work = _run(tmp_path, "mask1")
+    key = maskgen_cache.cache_key(
+        "mask1", work / "mask1.obs", work / "mask1.obj", "/no/maskgen"
+    )
+    assert maskgen_cache.lookup(key, "mask1", work) is None
+    maskgen_cache.store(key, "mask1", work, "wrote mask1.SMF")
+
+    other = _run(tmp_path, "mask2", body="")
+    key2 = maskgen_cache.cache_key(
+        "mask2", other / "mask2.obs", other / "mask2.obj", "/no/maskgen"
+    )
+    assert key2 == key
+    assert maskgen_cache.lookup(key2, "mask2", other) == "wrote mask2.SMF"
+    assert (other / "mask2.SMF").read_text() == "NAME mask2\nslit 1 2 3\n"
+    assert (other / "mask2.obw").read_text() == "mask2.SMF written\n"
+
+
+def test_object_named_like_the_mask(tmp_path, cache_dir):
+    # object and slit "mask1" are data, only the headers and file names change
+    work = tmp_path / "mask1"
+    work.mkdir()
+    (work / "mask1.obs").write_text("FILENAME  mask1\nOBJFILE  mask1.obj\n")
+    (work / "mask1.obj").write_text("@mask1 1.0 2.0\n")
+    (work / "mask1.SMF").write_text("NAME mask1\nSLIT mask1 1.0 2.0\n")
+    (work / "mask1.obw").write_text("@mask1 1.0 2.0 Use=1\n")
+    key = maskgen_cache.cache_key(
+        "mask1", work / "mask1.obs", work / "mask1.obj", "/no/maskgen"
+    )
+    maskgen_cache.store(key, "mask1", work, "Writing mask1.obw")
+
+    other = tmp_path / "mask2"
+    other.mkdir()
+    (other / "mask2.obs").write_text("FILENAME  mask2\nOBJFILE  mask2.obj\n")
+    (other / "mask2.obj").write_text("@mask1 1.0 2.0\n")
+    key2 = maskgen_cache.cache_key(
+        "mask2", other / "mask2.obs", other / "mask2.obj", "/no/maskgen"
+    )
+    assert key2 == key
+    assert maskgen_cache.lookup(key2, "mask2", other) == "Writing mask2.obw"
+    assert (other / "mask2.SMF").read_text() == "NAME mask2\nSLIT mask1 1.0 2.0\n"
+    assert (other / "mask2.obw").read_text() == "@mask1 1.0 2.0 Use=1\n"
+
+    # an object named like the new mask is a different catalog
+    (other / "mask2.obj").write_text("@mask2 1.0 2.0\n")
+    assert key != maskgen_cache.cache_key(
+        "mask2", other / "mask2.obs", other / "mask2.obj", "/no/maskgen"
+    )
+
+
+def test_different_inputs_different_keys(tmp_path, cache_dir):
+    work = _run(tmp_path, "mask1")
+    key = maskgen_cache.cache_key(
+        "mask1", work / "mask1.obs", work / "mask1.obj", "/no/maskgen"
+    )
+    (work / "mask1.obj").write_text("@star1 1.0 2.5\n")
+    assert key != maskgen_cache.cache_key(
+        "mask1", work / "mask1.obs", work / "mask1.obj", "/no/maskgen"
+    )
+
+
+def test_eviction(tmp_path, cache_dir, settings):
+    settings.MASKGEN_CACHE_MAX_BYTES = 1
+    work = _run(tmp_path, "mask1")
+    maskgen_cache.store("a" * 64, "mask1", work, "out")
+    assert maskgen_cache.lookup("a" * 64, "mask1", work) is None
+    assert not any(cache_dir.iterdir())
+
+
+def test_disabled(tmp_path, cache_dir, settings):
+    settings.MASKGEN_CACHE_MAX_BYTES = 0
+    work = _run(tmp_path, "mask1")
+    maskgen_cache.store("b" * 64, "mask1", work, "out")
+    assert not cache_dir.exists()
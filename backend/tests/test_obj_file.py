@@ -0,0 +1,104 @@
+import os
+import pytest
+from io import BytesIO
+from rest_framework.test import APIClient
+from maskgen_api.models import Object, ObjectList, Project
+from maskgen_api.obs_file_formatting import generate_obj_file, instrument_field
+from maskgen_api.sky_index import angular_separation
+
+pytestmark = pytest.mark.django_db
+script_dir = os.path.dirname(__file__)
+TEST_OBJ_FILE_PATH = os.path.join(script_dir, "data", "DCM5V5E.obj")
+client = APIClient()
+
+
+@pytest.fixture
+def obj_list():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    with open(TEST_OBJ_FILE_PATH, "rb") as fh:
+        file = BytesIO(fh.read())
+    file.name = "upload.obj"
+    client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "ObjFileList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+    return ObjectList.objects.get(name="ObjFileList")
+
+
+@pytest.fixture
+def obj_file_path(tmp_path):
+    return tmp_path / "obj_files" / "pytest" / "test" / "pytest_mask.obj"
+
+
+def _object_lines(path):
+    with open(path) as fh:
+        return [line.split() for line in fh.read().splitlines()[1:]]
+
+
+def test_generate_obj_file_without_prefilter(obj_list, obj_file_path, tmp_path):
+    _, pruned = generate_obj_file(
+        "pytest", "test", "pytest_mask", obj_list.name, files_dir=tmp_path
+    )
+
+    assert pruned == 0
+    assert len(_object_lines(obj_file_path)) == 1936
+
+
+def test_generate_obj_file_prunes_out_of_field(obj_list, obj_file_path, tmp_path):
+    setup = {
+        "fov_prefilter": True,
+        "instrument": "IMACS_lc",
+        "center_ra": "10:00:18.500",
+        "center_dec": "02:22:04.00",
+    }
+    field = instrument_field(setup)
+
+    _, pruned = generate_obj_file(
+        "pytest", "test", "pytest_mask", obj_list.name, field, files_dir=tmp_path
+    )
+
+    lines = _object_lines(obj_file_path)
+    ra, dec, radius = field
+    objs = list(obj_list.objects_list.values_list("right_ascension", "declination"))
+    separation = angular_separation(ra, dec, *zip(*objs))
+    expected = int((separation <= radius).sum())
+    assert 0 < len(lines) == expected < 1936
+    assert pruned == 1936 - expected
+    assert all(
+        angular_separation(ra, dec, float(line[1]), float(line[2])) <= radius
+        for line in lines
+    )
+
+
+@pytest.mark.parametrize("size", [5, 500])
+def test_generate_obj_file_query_count(
+    size, obj_file_path, tmp_path, django_assert_num_queries
+):
+    objs = Object.objects.bulk_create(
+        Object(
+            name=f"obj{i}",
+            user_id="pytest",
+            type="ALIGN" if i % 10 == 0 else "TARGET",
+            right_ascension=150.0 + i / 1000,
+            declination=2.0,
+            priority=1,
+            aux={},
+        )
+        for i in range(size)
+    )
+    obj_list = ObjectList.objects.create(
+        name="CountList", user_id="pytest", project_name="test"
+    )
+    obj_list.objects_list.set(objs)
+
+    # list lookup + one chunked select, whatever the list size
+    with django_assert_num_queries(2):
+        generate_obj_file(
+            "pytest", "test", "pytest_mask", obj_list.name, files_dir=tmp_path
+        )
+
+    lines = _object_lines(obj_file_path)
+    assert len(lines) == size
+    assert lines[0][0] == "*obj0" and lines[1][0] == "@obj1"
@@ -2,8 +2,11 @@ import json
 import os
 import pytest
 from io import BytesIO
+from astropy.table import Table
 from rest_framework.test import APIClient
 from maskgen_api.models import Object, ObjectList, Project
+from maskgen_api.catalogs import iter_csv_batches, iter_lines, parse_obj_lines
+from maskgen_api.sky_index import angular_separation
 
 pytestmark = pytest.mark.django_db  # ensures each test uses a test DB
 script_dir = os.path.dirname(__file__)
@@ -102,3 +105,332 @@ def test_view_object_list():
     names = [obj["name"] for obj in group["objects"]]
     assert "obj1" in names
     assert "obj2" in names
+
+
+def test_failed_upload_leaves_no_list(sample_object_data):
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    list_name = "BrokenList"
+    del sample_object_data[1]["priority"]
+    file = BytesIO(json.dumps(sample_object_data).encode("utf-8"))
+    file.name = "upload.json"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": list_name, "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 400
+    assert not ObjectList.objects.filter(name=list_name).exists()
+    assert Object.objects.count() == 0
+    assert Project.objects.get(name="test").obj_list is None
+
+
+def test_upload_mixed_coordinates(sample_object_data):
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    sample_object_data[0]["ra"] = "10:00:18.5"
+    sample_object_data[0]["dec"] = "-02:22:04.0"
+    file = BytesIO(json.dumps(sample_object_data).encode("utf-8"))
+    file.name = "upload.json"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "MixedList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 201
+    obj = Object.objects.get(name="a")
+    assert obj.right_ascension == pytest.approx(150.0770833)
+    assert obj.declination == pytest.approx(-2.3677778)
+    assert Object.objects.get(name="b").right_ascension == pytest.approx(30.1)
+
+
+def test_upload_malformed_coordinates(sample_object_data):
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    sample_object_data[1]["dec"] = "02:61:00"
+    file = BytesIO(json.dumps(sample_object_data).encode("utf-8"))
+    file.name = "upload.json"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "BadCoords", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 400
+    assert "row 2: invalid dec '02:61:00'" in response.data["error"]
+    assert not ObjectList.objects.filter(name="BadCoords").exists()
+
+
+def test_upload_obj_reports_malformed_lines():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    file = BytesIO(
+        b"&RADEGREE\n"
+        b"@good 150.1 2.2 Pri=1.0 alen=3.00 blen=2.00\n"
+        b"@bad 150.1 Pri=1.0\n"
+        b"unmarked 150.1 2.2 Pri=1.0\n"
+        b"*star 10:00:00 +02:00:00 Pri=-2.0\n"
+    )
+    file.name = "upload.obj"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "ObjErrors", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 400
+    assert "line 3:" in response.data["error"]
+    assert "line 4:" in response.data["error"]
+    assert "line 2" not in response.data["error"]
+    assert not ObjectList.objects.filter(name="ObjErrors").exists()
+
+
+def test_iter_obj_batches_across_chunks():
+    with open(TEST_OBJ_FILE_PATH) as fh:
+        expected = [line.split()[0][1:] for line in fh.read().splitlines()[1:]]
+
+    errors = []
+    with open(TEST_OBJ_FILE_PATH, "rb") as fh:
+        lines = iter_lines(fh, chunk_size=37)
+        batches = list(parse_obj_lines(lines, errors, batch_size=500))
+
+    assert errors == []
+    assert [len(batch["name"]) for batch in batches] == [500, 500, 500, 436]
+    assert [name for batch in batches for name in batch["name"]] == expected
+    assert batches[0]["labels"][0] == "line 2"
+    assert batches[0]["a_len"][0] == 3.4
+
+
+def test_upload_objects_from_csv():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    csv_path = os.path.join(script_dir, "test_files", "test_objs.csv")
+    with open(csv_path, "rb") as fh:
+        file = BytesIO(fh.read())
+    file.name = "upload.csv"
+
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "CsvList", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 201
+    obj_list = ObjectList.objects.get(name="CsvList")
+    assert obj_list.objects_list.count() == 10
+    obj = obj_list.objects_list.get(name="DC-1006811")
+    assert obj.type == "TARGET"
+    assert obj.right_ascension == 150.0
+    assert obj.priority == -2
+    assert obj.aux == {"a_len": 3.4, "b_len": 2.1}
+
+
+def test_csv_quoted_newlines():
+    data = (
+        b"name,type,ra,dec,priority,note\r\n"
+        b'a,TARGET,150.0,2.0,1,"multi\r\nline"\r\n'
+        b'b,TARGET,150.1,2.1,1,"# not a comment\n\nstill b"\n'
+        b"c,TARGET,150.2,2.2,1,plain\n"
+    )
+    errors = []
+    batches = list(iter_csv_batches(BytesIO(data), errors))
+    assert errors == []
+    assert batches[0]["name"] == ["a", "b", "c"]
+    assert batches[0]["note"] == [
+        "multi\r\nline",
+        "# not a comment\n\nstill b",
+        "plain",
+    ]
+    assert batches[0]["labels"] == ["line 3", "line 6", "line 7"]
+
+
+def test_upload_csv_reports_unreadable_rows():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    file = BytesIO(
+        b"name,type,ra,dec,priority\n"
+        b"a,TARGET,150.0,2.0,1\n"
+        b"b,TARGET,150.1,2.1," + b"9" * (1024 * 1024) + b"\n"
+        b"c,TARGET,150.2,2.2,1,extra\n"
+    )
+    file.name = "upload.csv"
+    response = client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": "CsvErrors", "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 400
+    # the oversized field is reported like any bad row, and parsing goes on
+    assert "line 3: field larger than field limit" in response.data["error"]
+    assert "line 4: expected 5 fields, got 6" in response.data["error"]
+    assert not ObjectList.objects.filter(name="CsvErrors").exists()
+
+
+def _catalog_columns():
+    return {
+        "ID": ["fits1", "fits2", "fits3"],
+        "RA": [150.1, 150.2, 150.3],
+        "DEC": [2.1, 2.2, -2.3],
+        "PRIORITY": [3, 1, -2],
+        "ALEN": [3.0, 3.5, 4.0],
+        "MAG": [20.1, 21.2, 22.3],
+    }
+
+
+def _upload_catalog(file, list_name):
+    return client.post(
+        "/api/objects/upload/",
+        {"file": file, "list_name": list_name, "project_name": "test"},
+        format="multipart",
+        **{"HTTP_USER_ID": "test"},
+    )
+
+
+def test_upload_objects_from_fits():
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    table = Table(_catalog_columns())
+    file = BytesIO()
+    # FITS is big-endian on disk
+    table.write(file, format="fits")
+    file.seek(0)
+    file.name = "upload.fits"
+
+    response = _upload_catalog(file, "FitsList")
+
+    assert response.status_code == 201
+    obj_list = ObjectList.objects.get(name="FitsList")
+    assert obj_list.objects_list.count() == 3
+    obj = obj_list.objects_list.get(name="fits3")
+    assert obj.type == "TARGET"
+    assert obj.declination == pytest.approx(-2.3)
+    assert obj.priority == -2
+    assert obj.aux == {"a_len": 4.0}
+
+
+def test_upload_objects_from_parquet():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    file = BytesIO()
+    pq.write_table(pa.table(_catalog_columns()), file)
+    file.seek(0)
+    file.name = "upload.parquet"
+
+    response = _upload_catalog(file, "ParquetList")
+
+    assert response.status_code == 201
+    obj_list = ObjectList.objects.get(name="ParquetList")
+    assert obj_list.objects_list.count() == 3
+    obj = obj_list.objects_list.get(name="fits1")
+    assert obj.right_ascension == pytest.approx(150.1)
+    assert obj.priority == 3
+    assert obj.aux == {"a_len": 3.0}
+
+
+def test_upload_obj_parallel(settings):
+    settings.CATALOG_PARSE_WORKERS = 2
+    settings.CATALOG_PARALLEL_THRESHOLD = 0
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    with open(TEST_OBJ_FILE_PATH, "rb") as fh:
+        file = BytesIO(fh.read())
+    file.name = "upload.obj"
+
+    response = _upload_catalog(file, "ParallelList")
+
+    assert response.status_code == 201
+    obj_list = ObjectList.objects.get(name="ParallelList")
+    assert obj_list.objects_list.count() == 1936
+    # inserted in file order
+    names = list(obj_list.objects_list.order_by("id").values_list("name", flat=True))
+    assert names[:2] == ["DC-1006811", "DC-1033218"]
+    assert obj_list.objects_list.get(name="DC-1006811").aux == {
+        "a_len": 3.4,
+        "b_len": 2.1,
+    }
+
+
+def test_upload_csv_parallel_reports_line_numbers(settings):
+    settings.CATALOG_PARSE_WORKERS = 2
+    settings.CATALOG_PARALLEL_THRESHOLD = 0
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    rows = [f"obj{i},TARGET,150.{i},2.{i},1" for i in range(2000)]
+    rows[1500] = "obj1500,TARGET,150.1"
+    file = BytesIO(("name,type,ra,dec,priority\n" + "\n".join(rows)).encode())
+    file.name = "upload.csv"
+
+    response = _upload_catalog(file, "ParallelCsv")
+
+    assert response.status_code == 400
+    assert response.data["error"].endswith("line 1502: expected 5 fields, got 3")
+    assert not ObjectList.objects.filter(name="ParallelCsv").exists()
+
+
+def _upload_test_obj(list_name):
+    Project.objects.create(name="test", user_id="test", center_ra=1.00, center_dec=1.00)
+    with open(TEST_OBJ_FILE_PATH, "rb") as fh:
+        file = BytesIO(fh.read())
+    file.name = "upload.obj"
+    assert _upload_catalog(file, list_name).status_code == 201
+    return ObjectList.objects.get(name=list_name)
+
+
+def test_cone_search_matches_brute_force():
+    obj_list = _upload_test_obj("ConeList")
+    center_ra, center_dec, radius = 150.1, 2.3, 4.0
+
+    response = client.get(
+        "/api/objects/cone/",
+        {
+            "list_name": "ConeList",
+            "ra": "10:00:24",
+            "dec": center_dec,
+            "radius": radius,
+        },
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 200
+    objs = list(obj_list.objects_list.all())
+    separation = angular_separation(
+        center_ra,
+        center_dec,
+        [obj.right_ascension for obj in objs],
+        [obj.declination for obj in objs],
+    )
+    expected = {obj.name for obj, sep in zip(objs, separation) if sep * 60 <= radius}
+    found = [obj["name"] for obj in response.data["objects"]]
+    assert expected and set(found) == expected
+    seps = [obj["separation"] for obj in response.data["objects"]]
+    assert seps == sorted(seps) and seps[-1] <= radius
+
+
+def test_box_search():
+    obj_list = _upload_test_obj("BoxList")
+
+    response = client.get(
+        "/api/objects/box/",
+        {
+            "list_name": "BoxList",
+            "ra_min": 150.0,
+            "ra_max": 150.1,
+            "dec_min": 2.2,
+            "dec_max": 2.25,
+        },
+        **{"HTTP_USER_ID": "test"},
+    )
+
+    assert response.status_code == 200
+    expected = set(
+        obj_list.objects_list.filter(
+            right_ascension__range=(150.0, 150.1), declination__range=(2.2, 2.25)
+        ).values_list("name", flat=True)
+    )
+    assert expected
+    assert {obj["name"] for obj in response.data["objects"]} == expected
@@ -0,0 +1,140 @@
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api.models import Mask, Object, ObjectList, Project, Status
+from maskgen_api.pagination import NEXT_CURSOR_HEADER
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+
+
+@pytest.fixture
+def obj_list():
+    obj_list = ObjectList.objects.create(
+        user_id="test", project_name="test", name="list"
+    )
+    objs = Object.objects.bulk_create(
+        Object(
+            name=f"{'star' if i % 2 else 'gal'}{i:03d}",
+            user_id="test",
+            type="TARGET" if i % 5 else "GUIDE",
+            right_ascension=150.0,
+            declination=2.0,
+            priority=i % 7,
+        )
+        for i in range(250)
+    )
+    obj_list.objects_list.add(*objs)
+    # not on the list, never returned
+    Object.objects.create(
+        name="star999",
+        user_id="test",
+        type="TARGET",
+        right_ascension=1.0,
+        declination=1.0,
+    )
+    return obj_list
+
+
+def _pages(url, params):
+    rows = []
+    while True:
+        response = client.get(url, params, HTTP_USER_ID="test")
+        assert response.status_code == 200, response.content
+        rows.append(response.json())
+        cursor = response.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return rows
+        params = params | {"cursor": cursor}
+
+
+def _objects(**params):
+    pages = _pages("/api/objects/viewlist/", {"list_name": "list"} | params)
+    assert all(page[0]["list_name"] == "list" for page in pages)
+    return [obj for page in pages for obj in page[0]["objects"]], len(pages)
+
+
+def test_view_list_pages(obj_list):
+    objs, pages = _objects(limit=100)
+    assert pages == 3
+    assert [obj["id"] for obj in objs] == sorted(
+        obj_list.objects_list.values_list("id", flat=True)
+    )
+
+
+@pytest.mark.parametrize("sort", ["name", "-name", "priority", "-priority"])
+def test_view_list_sorted(obj_list, sort):
+    objs, _ = _objects(limit=40, sort=sort)
+    field = sort.removeprefix("-")
+    keys = [(obj[field], obj["id"]) for obj in objs]
+    assert len(keys) == 250
+    assert keys == sorted(keys, reverse=sort.startswith("-"))
+
+
+def test_view_list_filters(obj_list):
+    objs, _ = _objects(
+        limit=10, type="TARGET", priority_min=2, priority_max=4, name_prefix="star"
+    )
+    assert objs
+    expected = obj_list.objects_list.filter(
+        type="TARGET", priority__gte=2, priority__lte=4, name__startswith="star"
+    )
+    assert {obj["name"] for obj in objs} == set(expected.values_list("name", flat=True))
+
+
+def test_view_list_bad_params(obj_list):
+    for params in (
+        {"sort": "declination"},
+        {"limit": 0},
+        {"limit": "all"},
+        {"cursor": "nope"},
+        {"priority_min": "high"},
+    ):
+        response = client.get(
+            "/api/objects/viewlist/",
+            {"list_name": "list"} | params,
+            HTTP_USER_ID="test",
+        )
+        assert response.status_code == 400, params
+
+
+def test_cursor_from_other_sort(obj_list):
+    response = client.get(
+        "/api/objects/viewlist/",
+        {"list_name": "list", "limit": 10},
+        HTTP_USER_ID="test",
+    )
+    response = client.get(
+        "/api/objects/viewlist/",
+        {"list_name": "list", "sort": "name", "cursor": response[NEXT_CURSOR_HEADER]},
+        HTTP_USER_ID="test",
+    )
+    assert response.status_code == 400
+
+
+def test_other_lists_paged():
+    for i in range(5):
+        Project.objects.create(
+            name=f"p{i}", user_id="test", center_ra=1.0, center_dec=1.0
+        )
+        ObjectList.objects.create(user_id="test", project_name=f"p{i}", name=f"l{i}")
+        Mask.objects.create(
+            name=f"m{i}",
+            user_id="test",
+            center_ra="10:00:00",
+            center_dec="02:00:00",
+            status=Status.FINALIZED if i % 2 else Status.COMPLETED,
+            instrument_version=1,
+            instrument_setup={},
+        )
+
+    pages = _pages("/api/project/list/", {"limit": 2, "sort": "-name"})
+    assert [p["name"] for page in pages for p in page["projects"]] == [
+        f"p{i}" for i in range(4, -1, -1)
+    ]
+    pages = _pages("/api/objects/list_all/", {"limit": 2})
+    assert len(pages) == 3
+    assert sum(len(page["object lists"]) for page in pages) == 5
+    pages = _pages("/api/masks/completed_masks/", {"limit": 2, "sort": "name"})
+    assert [m["name"] for page in pages for m in page] == ["m0", "m2", "m4"]
+    pages = _pages("/api/masks/finalized_masks/", {"limit": 1})
+    assert [m["name"] for page in pages for m in page] == ["m1", "m3"]
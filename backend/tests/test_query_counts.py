@@ -0,0 +1,106 @@
+import pytest
+from rest_framework.test import APIClient
+from maskgen_api.models import Mask, Object, Project, Status
+
+pytestmark = pytest.mark.django_db
+client = APIClient()
+
+
+def _make_masks(count, objects_per_mask=5, status=Status.FINALIZED):
+    project = Project.objects.create(
+        name="test", user_id="test", center_ra=1.0, center_dec=1.0
+    )
+    for i in range(count):
+        mask = Mask.objects.create(
+            name=f"mask{i}",
+            user_id="test",
+            center_ra="10:00:00",
+            center_dec="02:00:00",
+            status=status,
+            instrument_version=1,
+            instrument_setup={},
+        )
+        project.masks.add(mask)
+        objs = [
+            Object.objects.create(
+                name=f"obj{i}_{j}",
+                user_id="test",
+                type="TARGET",
+                right_ascension=150.0,
+                declination=2.0,
+                aux={"a_len": 1.0, "b_len": 1.0},
+            )
+            for j in range(objects_per_mask)
+        ]
+        mask.objects_list.add(*objs[1:])
+        mask.excluded_obj_list.add(objs[0])
+
+
+@pytest.mark.parametrize("objects_per_mask", [2, 50])
+def test_retrieve_queries(django_assert_num_queries, objects_per_mask):
+    _make_masks(1, objects_per_mask)
+    # cached detail lookup, then rendering it in a savepoint: mask, objects
+    # on it, objects left off, and storing it
+    with django_assert_num_queries(7):
+        response = client.get(
+            "/api/masks/mask0/", {"project_name": "test"}, HTTP_USER_ID="test"
+        )
+    assert response.status_code == 200
+    # served as stored from then on
+    with django_assert_num_queries(1):
+        cached = client.get(
+            "/api/masks/mask0/", {"project_name": "test"}, HTTP_USER_ID="test"
+        )
+    assert cached.content == response.content
+    body = response.json()
+    assert len(body["objects_list"]) == objects_per_mask - 1
+    assert body["excluded_objects"] == [
+        {
+            "name": "obj0_0",
+            "type": "TARGET",
+            "right_ascension": 150.0,
+            "declination": 2.0,
+            "priority": 0,
+            "a_len": 1.0,
+            "b_len": 1.0,
+        }
+    ]
+
+
+def test_retrieve_missing_mask():
+    _make_masks(1)
+    response = client.get(
+        "/api/masks/nope/", {"project_name": "test"}, HTTP_USER_ID="test"
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("count", [1, 20])
+@pytest.mark.parametrize(
+    "url,status",
+    [
+        ("/api/masks/finalized_masks/", Status.FINALIZED),
+        ("/api/masks/completed_masks/", Status.COMPLETED),
+    ],
+)
+def test_mask_list_queries(django_assert_num_queries, count, url, status):
+    _make_masks(count, status=status)
+    with django_assert_num_queries(1):
+        response = client.get(url)
+    assert len(response.json()) == count
+    assert {mask["project_name"] for mask in response.json()} == {"test"}
+
+
+@pytest.mark.parametrize("count", [1, 20])
+def test_project_masks_queries(django_assert_num_queries, count):
+    _make_masks(count)
+    # project, then its masks
+    with django_assert_num_queries(2):
+        response = client.get(
+            "/api/masks/get_project_masks/",
+            {"project_name": "test"},
+            HTTP_USER_ID="test",
+        )
+    assert sorted(mask["name"] for mask in response.json()) == sorted(
+        f"mask{i}" for i in range(count)
+    )
@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.terminal_helper import maskgen_sandbox, run_maskgen
+
+
+def _generate(maskgen_dir, obs_path):
+    with maskgen_sandbox(str(maskgen_dir), [obs_path]) as (work_dir, env):
+        assert os.path.islink(os.path.join(work_dir, "mgvers.dat"))
+        result, feedback = run_maskgen(
+            f"{maskgen_dir}/maskgen -s mask.obs", False, cwd=work_dir, env=env
+        )
+        assert os.path.exists(os.path.join(work_dir, "mask.SMF"))
+        with open(os.path.join(work_dir, ".loc_obs")) as fh:
+            obs = fh.read()
+        with open(os.path.join(work_dir, ".loc_mgpath")) as fh:
+            mgpath = fh.read().strip()
+        assert mgpath == work_dir + os.sep
+    assert not os.path.exists(work_dir)
+    return result, obs
+
+
+def test_concurrent_runs_are_isolated(tmp_path, maskgen):
+    obs_paths = []
+    for i in range(8):
+        (tmp_path / f"job{i}").mkdir()
+        obs_path = tmp_path / f"job{i}" / "mask.obs"
+        obs_path.write_text(f"job {i}\n")
+        obs_paths.append(str(obs_path))
+
+    environ = dict(os.environ)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda p: _generate(maskgen, p), obs_paths))
+
+    # same mask name in every job, each still sees its own output
+    assert results == [(True, f"job {i}\n") for i in range(8)]
+    assert dict(os.environ) == environ
+    assert sorted(os.listdir(maskgen)) == ["maskcut", "maskgen", "mgvers.dat"]
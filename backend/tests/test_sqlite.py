@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from maskgen_api.catalogs import iter_row_batches
+from maskgen_api.ingest import bulk_ingest
+from maskgen_api.models import Object, ObjectList, Project
+from maskgen_api.writes import serialized_write
+
+
+def _pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+def test_connection_pragmas():
+    assert _pragma("journal_mode") == "wal"
+    assert _pragma("synchronous") == 1  # NORMAL
+    assert _pragma("temp_store") == 2  # MEMORY
+    assert _pragma("busy_timeout") > 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_writers():
+    # ingests, which hold the write lock for a while, racing single-row
+    # writes from other threads: everything lands, nothing sees "locked"
+    def ingest(i):
+        try:
+            with serialized_write():
+                obj_list = ObjectList.objects.create(
+                    name=f"list{i}", user_id="test", project_name="test"
+                )
+                rows = [
+                    {
+                        "name": f"obj{i}_{j}",
+                        "type": "TARGET",
+                        "ra": 150.0,
+                        "dec": 2.0,
+                        "priority": 1,
+                    }
+                    for j in range(500)
+                ]
+                return bulk_ingest(obj_list, "test", iter_row_batches(rows))
+        finally:
+            connection.close()
+
+    def create_project(i):
+        try:
+            Project.objects.create(
+                name=f"p{i}", user_id="test", center_ra=1.0, center_dec=1.0
+            )
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ingested = pool.map(ingest, range(8))
+        created = pool.map(create_project, range(20))
+        assert list(ingested) == [500] * 8
+        list(created)
+    assert Object.objects.count() == 4000
+    assert Project.objects.count() == 20
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_ingest_rolls_back_list():
+    # the first batch is written, the second has a bad priority
+    rows = [
+        {"name": f"obj{i}", "type": "TARGET", "ra": 150.0, "dec": 2.0, "priority": 1}
+        for i in range(20)
+    ]
+    rows[15]["priority"] = "high"
+    with pytest.raises(ValueError, match="row 16: invalid priority"):
+        with serialized_write():
+            obj_list = ObjectList.objects.create(
+                name="l", user_id="test", project_name="p"
+            )
+            bulk_ingest(obj_list, "test", iter_row_batches(rows, batch_size=10))
+    assert not ObjectList.objects.exists()
+    assert not Object.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_command():
+    out = StringIO()
+    call_command(
+        "bench_db", workers=2, requests=15, objects=50, write_ratio=0.5, stdout=out
+    )
+    report = out.getvalue()
+    assert "2 workers, 30 requests" in report
+    assert "failed requests" not in report
+    # cleans up after itself
+    assert not Project.objects.filter(user_id__startswith="bench-").exists()
+    assert not Object.objects.filter(user_id__startswith="bench-").exists()
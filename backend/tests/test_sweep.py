@@ -0,0 +1,180 @@
+import pytest
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from maskgen_api.models import Mask, Object, Project
+from maskgen_api.sweep import sweep_configs
+from maskgen_api.views import MaskViewSet
+
+client = APIClient()
+
+
+@pytest.fixture
+def setup(setup):
+    for i in range(10):
+        Object.objects.create(
+            name=f"obj{i}",
+            user_id="test",
+            type="TARGET",
+            right_ascension=i,
+            declination=0,
+        )
+    return setup
+
+
+@pytest.fixture
+def fake_maskgen(monkeypatch):
+    # stands in for a maskgen run: wider slits and more overlap place fewer
+    # objects, a 2.0" slit fails and a 3.0" slit crashes
+    def generate(self, user_id, proj_name, data, project):
+        if data.get("slit_width") == 2.0:
+            return False, Response({"error": "slits collide"}, status=400), 0
+        if data.get("slit_width") == 3.0:
+            raise OSError("maskgen: no space left on device")
+        placed = 10 - int(data.get("slit_width", 1) * 2) - data.get("overlap", 0)
+        mask = Mask.objects.create(
+            name=data["filename"],
+            user_id=user_id,
+            center_ra="0",
+            center_dec="0",
+            instrument_version=1,
+            instrument_setup=data,
+        )
+        objs = list(Object.objects.order_by("id"))
+        mask.objects_list.add(*objs[:placed])
+        mask.excluded_obj_list.add(*objs[placed:])
+        project.masks.add(mask)
+        return True, Response({"created": data["filename"]}, status=201), 10 - placed
+
+    monkeypatch.setattr(MaskViewSet, "_generate_single_mask", generate)
+
+
+def _post(payload):
+    return client.post(
+        "/api/masks/generate/", payload, format="json", **{"HTTP_USER_ID": "test"}
+    )
+
+
+def test_sweep_configs():
+    configs = sweep_configs("m", {"slit_width": [1.0, 1.5], "overlap": [0, 1, 2]})
+    assert len(configs) == 6
+    assert configs[0] == ("m_s1", {"slit_width": 1.0, "overlap": 0})
+    assert configs[-1] == ("m_s6", {"slit_width": 1.5, "overlap": 2})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sweep_table(setup, fake_maskgen, settings):
+    settings.MASKGEN_SWEEP_WORKERS = 3
+    response = _post(
+        setup | {"sweep": {"slit_width": [1.0, 1.5, 2.0], "overlap": [0, 2]}}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["created"] == [
+        "mask001_s1",
+        "mask001_s2",
+        "mask001_s3",
+        "mask001_s4",
+    ]
+
+    rows = {row["filename"]: row for row in response.data["sweep"]}
+    assert rows["mask001_s1"] == {
+        "filename": "mask001_s1",
+        "config": {"slit_width": 1.0, "overlap": 0},
+        "created": True,
+        "placed": 8,
+        "excluded": 2,
+        "error": None,
+    }
+    assert (rows["mask001_s4"]["placed"], rows["mask001_s4"]["excluded"]) == (5, 5)
+    assert rows["mask001_s5"]["created"] is False
+    assert rows["mask001_s5"]["error"] == "slits collide"
+    assert Mask.objects.filter(name__startswith="mask001_s").count() == 4
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize("workers", [1, 3])
+def test_sweep_config_raising(setup, fake_maskgen, settings, workers):
+    settings.MASKGEN_SWEEP_WORKERS = workers
+    response = _post(setup | {"sweep": {"slit_width": [1.0, 3.0, 1.5]}})
+    # the masks made before and after the crash are kept and reported
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["created"] == ["mask001_s1", "mask001_s3"]
+    assert response.data["sweep"][1] == {
+        "filename": "mask001_s2",
+        "config": {"slit_width": 3.0},
+        "created": False,
+        "placed": None,
+        "excluded": None,
+        "error": "maskgen: no space left on device",
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_vary_rotator_runs_as_sweep(setup, fake_maskgen, settings):
+    settings.MASKGEN_SWEEP_WORKERS = 4
+    response = _post(
+        setup | {"vary_rotator_range": {"start": 0, "end": 90, "step": 30}}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data["created"] == [f"mask001_rot{a}" for a in (0, 30, 60, 90)]
+    assert (
+        Mask.objects.get(name="mask001_rot60").instrument_setup["rotator_angle"] == 60
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "sweep",
+    [
+        {"filename": ["a", "b"]},
+        {"slit_width": []},
+        {"slit_width": 1.0},
+        [1.0, 2.0],
+        {"slit_width": list(range(10)), "overlap": list(range(10))},
+    ],
+)
+def test_invalid_sweep(setup, sweep):
+    response = _post(setup | {"sweep": sweep})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert not Mask.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize(
+    "request_fields",
+    [
+        {"sweep": {"slit_width": [1.0, 1.5]}},
+        {"vary_rotator_range": {"start": 0, "end": 20, "step": 10}},
+    ],
+)
+def test_resubmitted_sweep(setup, fake_maskgen, request_fields):
+    assert _post(setup | request_fields).status_code == status.HTTP_201_CREATED
+    count = Mask.objects.count()
+    response = _post(setup | request_fields)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data == {"error": "mask name already exists for project"}
+    assert Mask.objects.count() == count
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "request_fields, existing",
+    [
+        ({"sweep": {"slit_width": [1.0, 1.5]}}, "mask001_s2"),
+        ({"vary_rotator_range": {"start": 0, "end": 20, "step": 10}}, "mask001_rot10"),
+        ({"generate_until_all_included": True}, "mask001_v3"),
+    ],
+)
+def test_derived_name_taken(setup, fake_maskgen, request_fields, existing):
+    mask = Mask.objects.create(
+        name=existing,
+        user_id="test",
+        center_ra="0",
+        center_dec="0",
+        instrument_version=1,
+        instrument_setup={},
+    )
+    Project.objects.get(name="test").masks.add(mask)
+    response = _post(setup | request_fields)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert list(Mask.objects.values_list("name", flat=True)) == [existing]
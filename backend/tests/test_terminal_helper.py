@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+
+import pytest
+from backend.terminal_helper import (
+    arun_interactive,
+    arun_maskgen,
+    run_interactive,
+    run_maskgen,
+)
+
+PROMPTING = """#!/bin/sh
+# asks two questions without a trailing newline, like maskgen does
+echo run >> runs.txt
+printf "m.SMF exists. Overwrite? "
+read answer
+[ "$answer" = "yes" ] || exit 1
+echo "WARNING: 3 objects off the field" >&2
+printf "Do you wish to continue? "
+read answer
+[ "$answer" = "yes" ] || exit 1
+echo "Writing object file with use counts to m.obw"
+"""
+
+
+def _script(tmp_path, body, name="maskgen"):
+    path = tmp_path / name
+    path.write_text(body)
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_prompts_answered_in_one_run(tmp_path):
+    command = f"{_script(tmp_path, PROMPTING)} -s m.obs"
+    chunks = []
+    success, output = run_maskgen(command, True, cwd=tmp_path, on_output=chunks.append)
+    assert success
+    assert output.endswith("Writing object file with use counts to m.obw")
+    assert "WARNING: 3 objects off the field" in output
+    assert "".join(chunks).strip() == output
+    assert (tmp_path / "runs.txt").read_text() == "run\n"
+
+
+def test_prompt_without_override(tmp_path):
+    command = f"{_script(tmp_path, PROMPTING)} -s m.obs"
+    success, output = run_maskgen(command, False, cwd=tmp_path)
+    assert not success
+    assert output.endswith("Overwrite?")
+    assert (tmp_path / "runs.txt").read_text() == "run\n"
+
+
+def test_idle_timeout(tmp_path):
+    command = _script(tmp_path, "#!/bin/sh\necho working\nsleep 10\n")
+    start = time.monotonic()
+    success, output = run_interactive(command, idle_timeout=0.3)
+    assert not success
+    assert output == f"working\n{command} hung, killed"
+    assert time.monotonic() - start < 5
+
+
+def test_total_timeout(tmp_path):
+    # keeps printing, so only the overall limit stops it
+    command = _script(tmp_path, "#!/bin/sh\nwhile true; do echo .; sleep 0.05; done\n")
+    success, output = run_interactive(command, idle_timeout=5, total_timeout=0.5)
+    assert not success
+    assert output.endswith(f"{command} took too long, killed")
+
+
+def test_raising_callback_kills_run(tmp_path):
+    def on_output(text):
+        raise RuntimeError("client went away")
+
+    command = _script(
+        tmp_path, "#!/bin/sh\necho $$ > pid.txt\necho working\nexec sleep 30\n"
+    )
+    with pytest.raises(RuntimeError, match="client went away"):
+        run_interactive(command, cwd=tmp_path, on_output=on_output)
+    pid = int((tmp_path / "pid.txt").read_text())
+    # killed and reaped, not left running in the background
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        pass
+    else:
+        raise AssertionError(f"process {pid} still running")
+
+
+def test_missing_binary(tmp_path):
+    success, output = run_interactive(str(tmp_path / "nope"))
+    assert not success
+    assert "No such file" in output
+
+
+def test_async_prompts_answered(tmp_path):
+    command = f"{_script(tmp_path, PROMPTING)} -s m.obs"
+    success, output = asyncio.run(arun_maskgen(command, True, cwd=tmp_path))
+    assert success
+    assert output.endswith("Writing object file with use counts to m.obw")
+    assert (tmp_path / "runs.txt").read_text() == "run\n"
+
+
+def test_async_runs_overlap(tmp_path):
+    command = _script(tmp_path, "#!/bin/sh\nsleep 0.5\necho done\n")
+
+    async def run_all():
+        return await asyncio.gather(*(arun_interactive(command) for _ in range(20)))
+
+    start = time.monotonic()
+    results = asyncio.run(run_all())
+    assert results == [(True, "done")] * 20
+    assert time.monotonic() - start < 5
+
+
+def test_async_idle_timeout(tmp_path):
+    command = _script(tmp_path, "#!/bin/sh\necho working\nsleep 10\n")
+    success, output = asyncio.run(arun_interactive(command, idle_timeout=0.3))
+    assert not success
+    assert output == f"working\n{command} hung, killed"
+
+
+def test_async_cancel_kills_run(tmp_path):
+    command = _script(tmp_path, "#!/bin/sh\necho $$ > pid.txt\nexec sleep 30\n")
+
+    async def cancel():
+        run = asyncio.create_task(arun_interactive(command, cwd=tmp_path))
+        while not (tmp_path / "pid.txt").exists():
+            await asyncio.sleep(0.05)
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(cancel())
+    pid = int((tmp_path / "pid.txt").read_text())
+    # killed and reaped, not left running in the background
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        pass
+    else:
+        raise AssertionError(f"process {pid} still running")
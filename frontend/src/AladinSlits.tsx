@@ -27,11 +27,21 @@ interface ObjectRecords {
 interface ApiResponse {
   excluded_obj_list: ObjectRecords[];
   obj_list: ObjectRecords[];
-  features: Slit[];
   center_ra: string;
   center_dec: string;
 }
 
+// a page of /api/masks/{name}/features/
+interface FeaturePage {
+  total: number;
+  decimated: boolean;
+  next: number | null;
+  features: Slit[];
+}
+
+// most slits drawn at once; wider views get a thinned-out subset
+const MAX_RENDERED = 2000;
+
 type Slit = {
   type: string;
   id: string;
@@ -102,16 +112,16 @@ export default function AladinSlits({ userId, projectName, maskName }: AladinSli
     center_dec: "+02 23 00",
   });
 
-  const [slits, setSlits] = useState<Slit[]>([]);
+  const [maskLoaded, setMaskLoaded] = useState(false);
   const [objList, setObjList] = useState<ObjectRecords[]>([]);
   const [excludedList, setExcludedList] = useState<ObjectRecords[]>([]);
   const [error, setError] = useState(false);
 
-  // Fetch slits, obj_list, and excluded_obj_list
+  // Fetch obj_list and excluded_obj_list, slits are fetched per view below
   useEffect(() => {
     async function fetchData() {
       try {
-        const url = `/api/masks/${maskName}?project_name=${encodeURIComponent(projectName)}`;
+        const url = `/api/masks/${maskName}?project_name=${encodeURIComponent(projectName)}&features=false`;
         const response = await fetch(url, {
           headers: {
             "Content-Type": "application/json",
@@ -128,10 +138,12 @@ export default function AladinSlits({ userId, projectName, maskName }: AladinSli
         }
 
         const data: ApiResponse = await response.json();
-        maskDataRef.current = data;
-        setSlits(data.features || []);
+        if (data.center_ra && data.center_dec) {
+          maskDataRef.current = data;
+        }
         setObjList(data.obj_list || []);
         setExcludedList(data.excluded_obj_list || []);
+        setMaskLoaded(true);
         setError(false);
       } catch (err) {
         console.error("Failed to fetch mask data:", err);
@@ -141,15 +153,52 @@ export default function AladinSlits({ userId, projectName, maskName }: AladinSli
     fetchData();
   }, [projectName, userId, maskName]);
 
+  // Only the slits in view are fetched, thinned out server side when the
+  // view is wide enough to hold more than MAX_RENDERED of them
+  const fetchSlitsInView = async (aladin: any, signal: AbortSignal): Promise<Slit[]> => {
+    const [ra, dec] = aladin.getRaDec();
+    const [fovRa, fovDec] = aladin.getFov();
+    const halfDec = fovDec / 2;
+    const halfRa = fovRa / 2 / Math.max(Math.cos((dec * Math.PI) / 180), 0.01);
+    const allRa = halfRa >= 180;
+    const params = new URLSearchParams({
+      project_name: projectName,
+      ra_min: String(allRa ? 0 : (ra - halfRa + 360) % 360),
+      ra_max: String(allRa ? 360 : (ra + halfRa) % 360),
+      dec_min: String(Math.max(dec - halfDec, -90)),
+      dec_max: String(Math.min(dec + halfDec, 90)),
+      lod: String(MAX_RENDERED),
+      limit: String(MAX_RENDERED),
+    });
+
+    const found: Slit[] = [];
+    let cursor: number | null = null;
+    do {
+      if (cursor !== null) params.set("cursor", String(cursor));
+      const response = await fetch(`/api/masks/${maskName}/features/?${params}`, {
+        headers: { "user-id": userId },
+        signal,
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      const page: FeaturePage = await response.json();
+      found.push(...page.features);
+      cursor = page.next;
+    } while (cursor !== null);
+    return found;
+  };
+
   // Draw slits on Aladin Lite
   useEffect(() => {
-    if (!containerRef.current || slits.length === 0) return;
+    if (!containerRef.current || !maskLoaded) return;
     if (!window.A || !window.A.init) {
       console.error("Aladin Lite not loaded");
       return;
     }
 
     let disposed = false;
+    let pending: AbortController | null = null;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+
     window.A.init.then(() => {
       if (disposed || !containerRef.current) return;
 
@@ -165,29 +214,55 @@ export default function AladinSlits({ userId, projectName, maskName }: AladinSli
       const overlay = window.A.graphicOverlay({ color: "#ee2345", lineWidth: 1.5 });
       aladin.addOverlay(overlay);
 
-      slits.forEach((slit) => {
-        const raDeg = raStringToDeg(slit.ra);
-        const decDeg = decStringToDeg(slit.dec);
-        const widthDeg = arcminToDeg(slit.width);
-        const heightDeg = arcminToDeg(slit.a_len);
-
-        const corners = computeRectangleCorners(raDeg, decDeg, widthDeg, heightDeg, slit.angle);
-        const poly = window.A.polygon(corners, {
-          strokeColor: "blue",
-          fillColor: "rgba(0,0,255,0.2)",
-          lineWidth: 2,
+      const drawView = async () => {
+        pending?.abort();
+        const controller = new AbortController();
+        pending = controller;
+        let slits: Slit[];
+        try {
+          slits = await fetchSlitsInView(aladin, controller.signal);
+        } catch (err) {
+          if (!controller.signal.aborted) console.error("Failed to fetch slits:", err);
+          return;
+        }
+        if (disposed || controller.signal.aborted) return;
+
+        overlay.removeAll();
+        slits.forEach((slit) => {
+          const raDeg = raStringToDeg(slit.ra);
+          const decDeg = decStringToDeg(slit.dec);
+          const widthDeg = arcminToDeg(slit.width);
+          const heightDeg = arcminToDeg(slit.a_len);
+
+          const corners = computeRectangleCorners(raDeg, decDeg, widthDeg, heightDeg, slit.angle);
+          const poly = window.A.polygon(corners, {
+            strokeColor: "blue",
+            fillColor: "rgba(0,0,255,0.2)",
+            lineWidth: 2,
+          });
+          overlay.add(poly);
+
+          const label = window.A.label(raDeg, decDeg, slit.id, { fontSize: 10, color: "#fff" });
+          overlay.add(label);
         });
-        overlay.add(poly);
-
-        const label = window.A.label(raDeg, decDeg, slit.id, { fontSize: 10, color: "#fff" });
-        overlay.add(label);
-      });
+      };
+
+      // refetch once panning/zooming settles
+      const scheduleDraw = () => {
+        clearTimeout(timer);
+        timer = setTimeout(drawView, 250);
+      };
+      aladin.on("positionChanged", scheduleDraw);
+      aladin.on("zoomChanged", scheduleDraw);
+      drawView();
     });
 
     return () => {
       disposed = true;
+      clearTimeout(timer);
+      pending?.abort();
     };
-  }, [slits]);
+  }, [maskLoaded, projectName, userId, maskName]);
 
   // Render rows helper
   const renderRows = (data: ObjectRecords[]) =>
@@ -208,7 +283,7 @@ export default function AladinSlits({ userId, projectName, maskName }: AladinSli
   
 
 return (<div style={{ width: "100%", height: "100%", display: "flex", flexDirection: "column" }}>
-  {error || slits.length === 0 ? (
+  {error || !maskLoaded ? (
     <div
       style={{
         height: "70vh",       // 70% of the viewport height
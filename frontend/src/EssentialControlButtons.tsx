@@ -6,11 +6,12 @@ interface ButtonProps {
     icon?: React.ReactNode;
     onClick: () => void;
     text: string;
+    disabled?: boolean;
 }
 
-function EssentialControlButtons({ icon, text, onClick }: ButtonProps) {
+function EssentialControlButtons({ icon, text, onClick, disabled }: ButtonProps) {
     return (
-        <Button onClick={onClick} className="ecb" fullWidth>
+        <Button onClick={onClick} className="ecb" fullWidth disabled={disabled}>
             {/* stack icon above label */}
             <div className="ecb-stack">
                 {icon && <span className="ecb-icon">{icon}</span>}
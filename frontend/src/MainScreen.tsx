@@ -54,6 +54,67 @@ import {
 } from '@tabler/icons-react';
 
 
+// object list table: rows per request to /api/objects/viewlist/, and its
+// server-side filters and sort (see the "Table" tab)
+const TABLE_PAGE_SIZE = 500;
+type TableQuery = {
+    type: string;
+    priority_min: string;
+    priority_max: string;
+    name_prefix: string;
+    sort: string;
+};
+const EMPTY_TABLE_QUERY: TableQuery = { type: '', priority_min: '', priority_max: '', name_prefix: '', sort: 'id' };
+
+// show generate progress from /api/async/masks/generate/stream/, only for ASGI
+// deployments: under WSGI Django buffers the stream until the mask is done
+const STREAM_GENERATE = process.env.REACT_APP_STREAM_GENERATE === 'true';
+
+// one line of status text for a progress event from /api/async/masks/generate/stream/
+function describeGenerateEvent(event: string, data: any): string | null {
+    switch (event) {
+        case 'obj_written': return `Wrote object file for ${data.filename}`;
+        case 'obs_written': return `Wrote obs file for ${data.filename}`;
+        case 'maskgen_started':
+            return data.cached ? `Reusing earlier maskgen result for ${data.filename}` : `Running maskgen for ${data.filename}`;
+        case 'maskgen_output': return data.line;
+        case 'smf_parsed': return `${data.filename}: ${data.features} slits and holes`;
+        case 'objects_categorized': return `${data.filename}: ${data.placed} objects placed, ${data.excluded} left out`;
+        case 'iteration': return `Mask ${data.iteration} done, ${data.excluded} objects still left out`;
+        case 'progress': return data.total ? `${data.completed} of ${data.total} masks done` : null;
+        default: return null;
+    }
+}
+
+// reads the server-sent events of a generate stream, returns the final {status, body}
+async function readGenerateStream(res: Response, onEvent: (event: string, data: any) => void) {
+    const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    let result: { status: number; body: any } | null = null;
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            const payload = data ? JSON.parse(data) : null;
+            if (event === 'done') result = payload;
+            else onEvent(event, payload);
+        }
+    }
+    if (!result) throw new Error('Generate failed: connection closed before the mask was done');
+    return result;
+}
+
+
 function MainScreen() {
 
 
@@ -61,9 +122,13 @@ function MainScreen() {
 
     const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
     const [loading, setLoading] = useState(false);
+    const [generateStatus, setGenerateStatus] = useState<string | null>(null);
+    const generatingRef = useRef(false); // blocks double clicks before the overlay renders
     const [error,   setError]   = useState<string | null>(null);
     const [lastListName, setLastListName] = useState<string | null>(null);
     const [tableRowsData, setTableRowsData] = useState<any[]>([]);
+    const [tableQuery, setTableQuery] = useState<TableQuery>(EMPTY_TABLE_QUERY);
+    const [tableCursor, setTableCursor] = useState<string | null>(null); // next page, null on the last
     const [activeTab, setActiveTab] = useState<'home' | 'mask' | 'table' | 'settings' | 'finalize'>('home');
     const [editing, setEditing] = useState(false);
     const [draftRows, setDraftRows] = useState(tableRowsData);
@@ -245,16 +310,23 @@ function MainScreen() {
         }
     }
 
-    // creating a chart based off object list data received from API, opened as a table in new tab
-    async function getTableData(name: string) {
+    // creating a chart based off object list data received from API, opened as a table in new tab.
+    // Loads one page; pass the cursor from the previous page to append the next one
+    async function getTableData(name: string, cursor: string | null = null, query: TableQuery = tableQuery) {
         console.log('Getting table data…');
         const cleanName = name.trim();
         if (!cleanName) return;
 
+        const params = new URLSearchParams({ list_name: cleanName, limit: String(TABLE_PAGE_SIZE) });
+        (Object.keys(query) as (keyof TableQuery)[]).forEach((key) => {
+            if (query[key] !== '') params.set(key, query[key]);
+        });
+        if (cursor) params.set('cursor', cursor);
+
         try {
             // request
             const res = await fetch(
-                `/api/objects/viewlist/?list_name=${encodeURIComponent(cleanName)}`, {
+                `/api/objects/viewlist/?${params}`, {
                     method: 'GET',
                     headers: {"user-id": userId},
                 }
@@ -276,7 +348,8 @@ function MainScreen() {
                 return { ...rest, ...aux };
             });
 
-            setTableRowsData(flatRows);
+            setTableRowsData(prev => (cursor ? [...prev, ...flatRows] : flatRows));
+            setTableCursor(res.headers.get('X-Next-Cursor'));
             setTableReady(true);
             setLastListName(typeof entry.list_name === 'string' ? entry.list_name : cleanName);
             console.log(`Rows stored: ${flatRows.length}`);
@@ -295,8 +368,10 @@ function MainScreen() {
         uploadObjectFiles(selectedFiles, objectListTitle);
 
         setTimeout(() => {
+            // a new list starts unfiltered
+            setTableQuery(EMPTY_TABLE_QUERY);
             // @ts-ignore
-            getTableData(objectListTitle);
+            getTableData(objectListTitle, null, EMPTY_TABLE_QUERY);
             setShowTableTab(true);
             setActiveTab('table');
         }, 2000);
@@ -750,6 +825,8 @@ function MainScreen() {
     }
 
     async function handleGenerateMask() {
+        if (generatingRef.current) return;
+        generatingRef.current = true;
         try {
             setLoading(true);
 
@@ -815,8 +892,8 @@ function MainScreen() {
                 }
             }
 
-            // Fetch API call
-            const res = await fetch('/api/masks/generate/', {
+            // Fetch API call, streams progress events while maskgen runs if enabled
+            const res = await fetch(STREAM_GENERATE ? '/api/async/masks/generate/stream/' : '/api/masks/generate/', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json', 'user-id': userId },
                 body: JSON.stringify(payload),
@@ -827,25 +904,29 @@ function MainScreen() {
                 throw new Error(`Generate failed: ${res.status} ${t}`);
             }
 
-            const ct = res.headers.get('Content-Type') || '';
-            let blob: Blob;
-            let filename = `${payload.filename || 'mask'}.smf`;
-
-            if (ct.includes('application/json')) {
-                const j = await res.json();
-                const fileUrl = j?.path || j?.file || j?.url;
-                if (!fileUrl || typeof fileUrl !== 'string') throw new Error('Generate succeeded but no file path returned');
-                const fileRes = await fetch(fileUrl, { headers: { 'user-id': userId } });
-                if (!fileRes.ok) throw new Error(`Download failed: ${fileRes.status}`);
-                blob = await fileRes.blob();
-                const cd = fileRes.headers.get('Content-Disposition');
-                if (cd && cd.includes('filename=')) filename = cd.split('filename=')[1].replace(/["']/g, '');
+            let j;
+            if (STREAM_GENERATE) {
+                const result = await readGenerateStream(res, (event, data) => {
+                    const text = describeGenerateEvent(event, data);
+                    if (text) setGenerateStatus(text);
+                });
+                if (result.status >= 400) {
+                    throw new Error(`Generate failed: ${result.status} ${result.body?.error ?? JSON.stringify(result.body)}`);
+                }
+                j = result.body;
             } else {
-                blob = await res.blob();
-                const cd = res.headers.get('Content-Disposition');
-                if (cd && cd.includes('filename=')) filename = cd.split('filename=')[1].replace(/["']/g, '');
+                j = await res.json();
             }
 
+            let filename = `${payload.filename || 'mask'}.smf`;
+            const fileUrl = j?.path || j?.file || j?.url;
+            if (!fileUrl || typeof fileUrl !== 'string') throw new Error('Generate succeeded but no file path returned');
+            const fileRes = await fetch(fileUrl, { headers: { 'user-id': userId } });
+            if (!fileRes.ok) throw new Error(`Download failed: ${fileRes.status}`);
+            const blob = await fileRes.blob();
+            const cd = fileRes.headers.get('Content-Disposition');
+            if (cd && cd.includes('filename=')) filename = cd.split('filename=')[1].replace(/["']/g, '');
+
             const url = URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = url;
@@ -861,6 +942,8 @@ function MainScreen() {
             alert((err as Error).message || 'Failed to generate mask');
         } finally {
             setLoading(false);
+            setGenerateStatus(null);
+            generatingRef.current = false;
         }
     }
 
@@ -1018,8 +1101,9 @@ function MainScreen() {
                         zIndex={1000}
                         style={{pointerEvents: 'auto'}} // block clicks while loading
                     />
-                    <Center style={{position: 'absolute', inset: 0, zIndex: 1001}}>
+                    <Center style={{position: 'absolute', inset: 0, zIndex: 1001, flexDirection: 'column'}}>
                         <Loader color="#586072" size="xl" type="dots" />
+                        {generateStatus && <Text c="white" fw={600} mt="md">{generateStatus}</Text>}
                     </Center>
                 </>
             )}
@@ -1980,6 +2064,7 @@ function MainScreen() {
                                 <EssentialControlButtons
                                     text="Generate Mask"
                                     onClick={handleGenerateMask}
+                                    disabled={loading}
                                 />
                                 <EssentialControlButtons
                                     text="Mark as Complete"
@@ -2028,6 +2113,68 @@ function MainScreen() {
                             </Button>
                         </Group>
 
+                        {/*server-side filters and sort, applied from the first page*/}
+                        <Group justify='center' mt="xs" align="flex-end">
+                            <TextInput
+                                label="Name starts with"
+                                value={tableQuery.name_prefix}
+                                onChange={(e) => {
+                                    const name_prefix = e.currentTarget.value;
+                                    setTableQuery(q => ({ ...q, name_prefix }));
+                                }}
+                                w={150}
+                            />
+                            <Select
+                                label="Type"
+                                data={[
+                                    { value: '', label: 'Any' },
+                                    { value: 'TARGET', label: 'Target' },
+                                    { value: 'GUIDE', label: 'Guider' },
+                                    { value: 'ALIGN', label: 'Alignment' },
+                                ]}
+                                value={tableQuery.type}
+                                onChange={(type) => setTableQuery(q => ({ ...q, type: type ?? '' }))}
+                                w={120}
+                            />
+                            <TextInput
+                                label="Priority from"
+                                value={tableQuery.priority_min}
+                                onChange={(e) => {
+                                    const priority_min = e.currentTarget.value;
+                                    setTableQuery(q => ({ ...q, priority_min }));
+                                }}
+                                w={100}
+                            />
+                            <TextInput
+                                label="to"
+                                value={tableQuery.priority_max}
+                                onChange={(e) => {
+                                    const priority_max = e.currentTarget.value;
+                                    setTableQuery(q => ({ ...q, priority_max }));
+                                }}
+                                w={100}
+                            />
+                            <Select
+                                label="Sort by"
+                                data={[
+                                    { value: 'id', label: 'Upload order' },
+                                    { value: 'name', label: 'Name' },
+                                    { value: '-name', label: 'Name (Z-A)' },
+                                    { value: 'priority', label: 'Priority' },
+                                    { value: '-priority', label: 'Priority (high first)' },
+                                ]}
+                                value={tableQuery.sort}
+                                onChange={(sort) => setTableQuery(q => ({ ...q, sort: sort ?? 'id' }))}
+                                w={170}
+                            />
+                            <Button
+                                onClick={() => lastListName && getTableData(lastListName)}
+                                disabled={!lastListName || editing}
+                            >
+                                Apply
+                            </Button>
+                        </Group>
+
                         {/*actual table*/}
                         {tableRowsData.length === 0 ? (
                             <Text c="dimmed" ta="center" mt="md">
@@ -2090,6 +2237,17 @@ function MainScreen() {
                                 </Table>
                             </Table.ScrollContainer>
                         )}
+                        {tableCursor && lastListName && (
+                            <Group justify='center' mt="xs">
+                                <Button
+                                    variant="light"
+                                    onClick={() => getTableData(lastListName, tableCursor)}
+                                    disabled={editing}
+                                >
+                                    Load {TABLE_PAGE_SIZE} more
+                                </Button>
+                            </Group>
+                        )}
                     </Tabs.Panel>
 
                     {/*stuff that goes in the Settings tab*/}
@@ -2164,7 +2322,7 @@ function MainScreen() {
                         </Group>
 
                         <Group justify="center">
-                            <Button onClick={handleGenerateMask}>Generate Mask</Button>
+                            <Button onClick={handleGenerateMask} disabled={loading}>Generate Mask</Button>
                             <Button onClick={handleFinalizeMask} disabled={!isMaskGenerated}>Mark as Complete</Button>
                             <Button onClick={handleBackFromFinalize}>Back</Button>
                         </Group>
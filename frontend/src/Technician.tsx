@@ -24,6 +24,20 @@ interface MaskDetailProps {
   mask: Mask;
 }
 
+// mask lists come a page at a time, the next page's cursor in X-Next-Cursor
+async function fetchAllPages(url: string): Promise<Mask[]> {
+  const masks: Mask[] = [];
+  let cursor: string | null = null;
+  do {
+    const params: string = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const response = await fetch(url + params);
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    masks.push(...(await response.json()));
+    cursor = response.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return masks;
+}
+
 export default function MaskManager() {
   const [finalizedMasks, setFinalizedMasks] = useState<Mask[]>([]);
   const [completedMasks, setCompletedMasks] = useState<Mask[]>([]);
@@ -37,8 +51,7 @@ export default function MaskManager() {
     async function fetchFinalizedMasks() {
       setLoading(true);
       try {
-        const response = await fetch("/api/masks/finalized_masks");
-        const data = await response.json();
+        const data = await fetchAllPages("/api/masks/finalized_masks/");
         console.log(data)
         setFinalizedMasks(data);
       } catch (err) {
@@ -54,8 +67,7 @@ export default function MaskManager() {
     async function fetchCompletedMasks() {
       setLoading(true);
       try {
-        const response = await fetch("/api/masks/completed_masks");
-        const data = await response.json();
+        const data = await fetchAllPages("/api/masks/completed_masks/");
         console.log(data)
         setCompletedMasks(data);
       } catch (err) {